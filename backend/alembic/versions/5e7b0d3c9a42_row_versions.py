@@ -0,0 +1,38 @@
+"""row versions for optimistic concurrency
+
+Revision ID: 5e7b0d3c9a42
+Revises: c61b7e04d2a9
+Create Date: 2026-10-18 19:12:08.634170
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e7b0d3c9a42'
+down_revision: Union[str, None] = 'c61b7e04d2a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('incidents', 'resources', 'teams')
+
+
+def upgrade() -> None:
+    for table in VERSIONED_TABLES:
+        op.add_column(
+            table,
+            sa.Column('version', sa.Integer(), nullable=False, server_default='1')
+        )
+
+
+def downgrade() -> None:
+    for table in VERSIONED_TABLES:
+        if op.get_bind().dialect.name == 'sqlite':
+            # Native DROP COLUMN (SQLite 3.35+); a batch copy of the table
+            # would lose the R*Tree triggers on incidents and resources
+            op.execute(f'ALTER TABLE {table} DROP COLUMN version')
+        else:
+            op.drop_column(table, 'version')
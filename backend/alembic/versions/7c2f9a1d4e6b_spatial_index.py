@@ -0,0 +1,70 @@
+"""spatial index for incidents and resources
+
+Revision ID: 7c2f9a1d4e6b
+Revises: 593f4648d383
+Create Date: 2026-10-18 10:52:11.204318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2f9a1d4e6b'
+down_revision: Union[str, None] = '593f4648d383'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SPATIAL_TABLES = ('incidents', 'resources')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_index('ix_incidents_lat_lon', 'incidents', ['latitude', 'longitude'])
+        op.create_index('ix_resources_lat_lon', 'resources', ['latitude', 'longitude'])
+        return
+
+    for table in SPATIAL_TABLES:
+        index = f'{table}_rtree'
+        point = 'NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude'
+        has_point = 'NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL'
+        op.execute(
+            f'CREATE VIRTUAL TABLE {index} '
+            f'USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+        )
+        op.execute(
+            f'INSERT INTO {index} '
+            f'SELECT id, latitude, latitude, longitude, longitude FROM {table} '
+            f'WHERE latitude IS NOT NULL AND longitude IS NOT NULL'
+        )
+        op.execute(
+            f'CREATE TRIGGER {index}_insert AFTER INSERT ON {table} '
+            f'WHEN {has_point} '
+            f'BEGIN INSERT INTO {index} VALUES ({point}); END'
+        )
+        op.execute(
+            f'CREATE TRIGGER {index}_update '
+            f'AFTER UPDATE OF latitude, longitude ON {table} '
+            f'BEGIN DELETE FROM {index} WHERE id = OLD.id; '
+            f'INSERT INTO {index} SELECT {point} WHERE {has_point}; END'
+        )
+        op.execute(
+            f'CREATE TRIGGER {index}_delete AFTER DELETE ON {table} '
+            f'BEGIN DELETE FROM {index} WHERE id = OLD.id; END'
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_index('ix_resources_lat_lon', table_name='resources')
+        op.drop_index('ix_incidents_lat_lon', table_name='incidents')
+        return
+
+    for table in SPATIAL_TABLES:
+        index = f'{table}_rtree'
+        op.execute(f'DROP TRIGGER IF EXISTS {index}_delete')
+        op.execute(f'DROP TRIGGER IF EXISTS {index}_update')
+        op.execute(f'DROP TRIGGER IF EXISTS {index}_insert')
+        op.execute(f'DROP TABLE IF EXISTS {index}')
@@ -0,0 +1,34 @@
+"""organization change counters for list ETags
+
+Revision ID: 8b3f61e2d7c4
+Revises: 5e7b0d3c9a42
+Create Date: 2026-10-18 20:03:51.174622
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3f61e2d7c4'
+down_revision: Union[str, None] = '5e7b0d3c9a42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHANGE_COUNTERS = ('incident_changes', 'resource_changes', 'team_changes')
+
+
+def upgrade() -> None:
+    for name in CHANGE_COUNTERS:
+        op.add_column(
+            'organization_stats',
+            sa.Column(name, sa.Integer(), nullable=False, server_default='0')
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('organization_stats') as batch_op:
+        for name in CHANGE_COUNTERS:
+            batch_op.drop_column(name)
@@ -0,0 +1,69 @@
+"""full-text search index for incidents
+
+Revision ID: a9d4e2c7f610
+Revises: f3a8d6c2b915
+Create Date: 2026-10-18 16:05:37.918244
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e2c7f610'
+down_revision: Union[str, None] = 'f3a8d6c2b915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE incident_fts USING fts5("
+            "title, description, location_description, updates_text, "
+            "tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "INSERT INTO incident_fts "
+            "(rowid, title, description, location_description, updates_text) "
+            "SELECT i.id, i.title, i.description, i.location_description, "
+            "(SELECT group_concat(content, char(10)) FROM ("
+            "SELECT u.content FROM incident_updates u WHERE u.incident_id = i.id "
+            "ORDER BY u.created_at, u.id)) "
+            "FROM incidents i"
+        )
+    elif dialect == 'postgresql':
+        op.create_table(
+            'incident_search',
+            sa.Column('incident_id', sa.Integer(), nullable=False),
+            sa.Column('document', sa.dialects.postgresql.TSVECTOR(), nullable=False),
+            sa.ForeignKeyConstraint(['incident_id'], ['incidents.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('incident_id')
+        )
+        op.create_index(
+            'ix_incident_search_document', 'incident_search', ['document'],
+            postgresql_using='gin'
+        )
+        op.execute(
+            "INSERT INTO incident_search (incident_id, document) "
+            "SELECT i.id, "
+            "setweight(to_tsvector('english', coalesce(i.title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(i.description, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(i.location_description, '')), 'C') || "
+            "setweight(to_tsvector('english', coalesce(("
+            "SELECT string_agg(u.content, ' ' ORDER BY u.created_at, u.id) "
+            "FROM incident_updates u WHERE u.incident_id = i.id), '')), 'D') "
+            "FROM incidents i"
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS incident_fts')
+    elif dialect == 'postgresql':
+        op.drop_index('ix_incident_search_document', table_name='incident_search')
+        op.drop_table('incident_search')
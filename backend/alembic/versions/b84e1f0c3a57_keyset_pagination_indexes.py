@@ -0,0 +1,38 @@
+"""keyset pagination indexes
+
+Revision ID: b84e1f0c3a57
+Revises: 7c2f9a1d4e6b
+Create Date: 2026-10-18 11:20:43.918204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b84e1f0c3a57'
+down_revision: Union[str, None] = '7c2f9a1d4e6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_incidents_created_id', 'incidents', ['created_at', 'id'], unique=False)
+    op.create_index('ix_incidents_org_created_id', 'incidents', ['organization_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_incident_updates_incident_created_id', 'incident_updates', ['incident_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_resources_org_id', 'resources', ['organization_id', 'id'], unique=False)
+    op.create_index('ix_resource_assignments_resource_assigned_id', 'resource_assignments', ['resource_id', 'assigned_at', 'id'], unique=False)
+    op.create_index('ix_teams_org_id', 'teams', ['organization_id', 'id'], unique=False)
+    op.create_index('ix_organization_memberships_org_status_user', 'organization_memberships', ['organization_id', 'status', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_organization_memberships_org_status_user', table_name='organization_memberships')
+    op.drop_index('ix_teams_org_id', table_name='teams')
+    op.drop_index('ix_resource_assignments_resource_assigned_id', table_name='resource_assignments')
+    op.drop_index('ix_resources_org_id', table_name='resources')
+    op.drop_index('ix_incident_updates_incident_created_id', table_name='incident_updates')
+    op.drop_index('ix_incidents_org_created_id', table_name='incidents')
+    op.drop_index('ix_incidents_created_id', table_name='incidents')
@@ -0,0 +1,40 @@
+"""incident analytics rollups
+
+Revision ID: c61b7e04d2a9
+Revises: a9d4e2c7f610
+Create Date: 2026-10-18 16:48:02.553190
+
+Fill the new table afterwards with `python -m app.crud.analytics`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c61b7e04d2a9'
+down_revision: Union[str, None] = 'a9d4e2c7f610'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'incident_rollups',
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('priority', sa.String(length=20), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('type', sa.String(length=20), nullable=False),
+        sa.Column('created_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('resolved_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('resolve_seconds', sa.Float(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+        sa.PrimaryKeyConstraint('organization_id', 'granularity', 'bucket_start', 'priority', 'status', 'type')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('incident_rollups')
@@ -0,0 +1,34 @@
+"""resource available quantity ledger
+
+Revision ID: d21a6b9e5f08
+Revises: b84e1f0c3a57
+Create Date: 2026-10-18 12:05:37.551290
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd21a6b9e5f08'
+down_revision: Union[str, None] = 'b84e1f0c3a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('resources', sa.Column('available_quantity', sa.Integer(), nullable=True))
+    op.execute(
+        'UPDATE resources SET available_quantity = COALESCE(quantity, 1) - COALESCE(('
+        'SELECT SUM(resource_assignments.quantity) FROM resource_assignments '
+        'WHERE resource_assignments.resource_id = resources.id '
+        'AND resource_assignments.returned_at IS NULL'
+        '), 0)'
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('resources') as batch_op:
+        batch_op.drop_column('available_quantity')
@@ -0,0 +1,47 @@
+"""organization stats counters
+
+Revision ID: e5c93f27a1b4
+Revises: d21a6b9e5f08
+Create Date: 2026-10-18 13:41:09.118264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c93f27a1b4'
+down_revision: Union[str, None] = 'd21a6b9e5f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('organization_stats',
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.Column('member_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('team_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('resource_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('active_incidents', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+    sa.PrimaryKeyConstraint('organization_id')
+    )
+    op.execute(
+        "INSERT INTO organization_stats "
+        "(organization_id, member_count, team_count, resource_count, active_incidents) "
+        "SELECT o.id, "
+        "(SELECT COUNT(*) FROM organization_memberships m "
+        "WHERE m.organization_id = o.id AND m.status = 'active'), "
+        "(SELECT COUNT(*) FROM teams t WHERE t.organization_id = o.id), "
+        "(SELECT COUNT(*) FROM resources r WHERE r.organization_id = o.id), "
+        "(SELECT COUNT(*) FROM incidents i "
+        "WHERE i.organization_id = o.id AND i.status IN ('open', 'in_progress')) "
+        "FROM organizations o"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('organization_stats')
@@ -0,0 +1,46 @@
+"""workload indexes for crud queries
+
+Revision ID: f3a8d6c2b915
+Revises: e5c93f27a1b4
+Create Date: 2026-10-18 14:22:51.604127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d6c2b915'
+down_revision: Union[str, None] = 'e5c93f27a1b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_incidents_org_status_created_id', 'incidents', ['organization_id', 'status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_incidents_team_created_id', 'incidents', ['assigned_team_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_organizations_visibility_id', 'organizations', ['visibility', 'id'], unique=False)
+    op.create_index('ix_organization_memberships_user_org_status', 'organization_memberships', ['user_id', 'organization_id', 'status'], unique=False)
+    op.create_index('ix_team_memberships_team_user', 'team_memberships', ['team_id', 'user_id'], unique=False)
+    op.create_index('ix_team_memberships_user_team', 'team_memberships', ['user_id', 'team_id'], unique=False)
+    op.create_index('ix_resources_team_id', 'resources', ['team_id', 'id'], unique=False)
+    op.create_index('ix_resource_assignments_incident_id', 'resource_assignments', ['incident_id'], unique=False)
+    op.create_index(
+        'ix_resource_assignments_open_resource', 'resource_assignments', ['resource_id'], unique=False,
+        sqlite_where=sa.text('returned_at IS NULL'),
+        postgresql_where=sa.text('returned_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_resource_assignments_open_resource', table_name='resource_assignments')
+    op.drop_index('ix_resource_assignments_incident_id', table_name='resource_assignments')
+    op.drop_index('ix_resources_team_id', table_name='resources')
+    op.drop_index('ix_team_memberships_user_team', table_name='team_memberships')
+    op.drop_index('ix_team_memberships_team_user', table_name='team_memberships')
+    op.drop_index('ix_organization_memberships_user_org_status', table_name='organization_memberships')
+    op.drop_index('ix_organizations_visibility_id', table_name='organizations')
+    op.drop_index('ix_incidents_team_created_id', table_name='incidents')
+    op.drop_index('ix_incidents_org_status_created_id', table_name='incidents')
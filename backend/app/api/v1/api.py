@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import users, auth, organizations, teams, incidents, resources
+from .endpoints import users, auth, organizations, teams, incidents, resources, stream, analytics
 
 api_router = APIRouter()
 
@@ -8,4 +8,6 @@ api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(organizations.router, prefix="/organizations", tags=["organizations"])
 api_router.include_router(teams.router, prefix="/teams", tags=["teams"])
 api_router.include_router(incidents.router, prefix="/incidents", tags=["incidents"])
-api_router.include_router(resources.router, prefix="/resources", tags=["resources"]) 
\ No newline at end of file
+api_router.include_router(resources.router, prefix="/resources", tags=["resources"])
+api_router.include_router(stream.router, prefix="/stream", tags=["stream"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
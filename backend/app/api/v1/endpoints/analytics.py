@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends
+from typing import Optional
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+from ....core.deps import (
+    get_read_db,
+    run_db,
+    get_current_active_user,
+    get_auth_context
+)
+from ....crud import analytics as crud
+from ....schemas import analytics as schemas
+from ....models import User
+from ....core.authz import AuthContext
+
+router = APIRouter()
+
+@router.get("/incidents", response_model=schemas.IncidentAnalytics)
+async def get_incident_analytics(
+    organization_id: int,
+    granularity: schemas.Granularity = schemas.Granularity.DAY,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    priority: Optional[str] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_read_db)
+):
+    """Incidents created and resolved per hour or day, with counts by
+    priority/status/type and mean time to resolve.
+
+    Served from rollups, so the cost depends on the number of buckets
+    (default: the last 30 days, or 48 hours by hour), not on history.
+    """
+    return await run_db(
+        db, crud.get_incident_analytics,
+        organization_id,
+        auth,
+        granularity=granularity,
+        since=since,
+        until=until,
+        priority=priority,
+        status=status,
+        type=type
+    )
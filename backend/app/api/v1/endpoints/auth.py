@@ -20,7 +20,7 @@ async def login_for_access_token(
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud_user.authenticate_user(
+    user = await crud_user.authenticate_user_async(
         db, email=form_data.username, password=form_data.password
     )
     if not user:
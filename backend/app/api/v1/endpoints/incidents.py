@@ -1,16 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from typing import Any, List, Optional
 from sqlalchemy.orm import Session
 
 from ....core.deps import (
     get_db,
+    get_read_db,
+    run_db,
     get_current_active_user,
+    get_auth_context,
     get_organization_member,
     get_team_member
 )
 from ....crud import incident as crud
+from ....crud import recommendation as crud_recommendation
+from ....crud import resource as crud_resource
+from ....crud import versioning
+from ....crud.pagination import set_next_cursor
 from ....schemas import incident as schemas
+from ....schemas import resource as resource_schemas
 from ....models import User
+from ....core.authz import AuthContext
+from ....core.config import settings
+from ....core.serialization import json_rows
 
 router = APIRouter()
 
@@ -18,69 +31,297 @@ router = APIRouter()
 async def create_incident(
     incident_in: schemas.IncidentCreate,
     current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     """Create a new incident"""
-    return crud.create_incident(db, incident_in, current_user.id)
+    return await run_db(
+        db, crud.create_incident, incident_in, current_user.id, auth=auth
+    )
+
+def _parse_bulk_body(body: bytes, content_type: str) -> List[Any]:
+    """Split a bulk body into rows: NDJSON lines are left as raw JSON so a
+    malformed line fails on its own, a JSON array is decoded up front."""
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        return [line for line in body.splitlines() if line.strip()]
+
+    try:
+        rows = json.loads(body)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array or NDJSON"
+        )
+    if not isinstance(rows, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array or NDJSON"
+        )
+    return rows
+
+@router.post("/bulk", response_model=schemas.IncidentBulkResponse)
+async def create_incidents_bulk(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+):
+    """Create many incidents from a JSON array or NDJSON body.
+
+    Rows are validated and inserted in chunks; the response reports the new
+    id or the errors for every row, in input order.
+    """
+    rows = _parse_bulk_body(
+        await request.body(), request.headers.get("content-type", "")
+    )
+    if len(rows) > settings.INCIDENT_BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.INCIDENT_BULK_MAX_ROWS} incidents per request"
+        )
+    return await run_db(
+        db, crud.create_incidents_bulk, rows, current_user.id,
+        auth=auth, chunk_size=settings.INCIDENT_BULK_CHUNK_SIZE
+    )
 
-@router.get("/", response_model=List[schemas.Incident])
+@router.get("/", response_model=List[schemas.IncidentSummary])
 async def list_incidents(
+    response: Response,
     organization_id: Optional[int] = None,
     team_id: Optional[int] = None,
     status: Optional[str] = None,
     priority: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(
+        None, description="Comma-separated subset of fields to return, e.g. id,title,status"
+    ),
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List incidents with optional filters"""
-    return crud.get_incidents(
-        db,
+    """List incidents with optional filters, newest first.
+
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the
+    next page; `skip` is still honoured when no cursor is given. Updates
+    are not included; use /incidents/{incident_id} or its /updates.
+
+    With organization_id, the ETag changes on any write to the
+    organization's incidents; send it in If-None-Match to get an empty 304
+    while nothing changed.
+    """
+    if organization_id is not None:
+        tag = await run_db(
+            db, versioning.organization_list_etag, organization_id, "incident_changes"
+        )
+        if versioning.none_match(if_none_match, tag):
+            return versioning.not_modified(tag)
+        versioning.set_cache_headers(response, tag)
+
+    selected = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+    incidents = await run_db(
+        db, crud.get_incidents,
         organization_id=organization_id,
         team_id=team_id,
         status=status,
         priority=priority,
         skip=skip,
+        limit=limit,
+        cursor=cursor,
+        fields=selected
+    )
+    set_next_cursor(response, incidents, limit, crud.INCIDENT_ORDER)
+    return json_rows(crud.INCIDENT_PROJECTION.as_dicts(incidents, selected), response)
+
+@router.get("/search", response_model=List[schemas.IncidentSearchResult])
+async def search_incidents(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    organization_id: Optional[int] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    limit: int = Query(20, gt=0, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_read_db)
+):
+    """Full-text search over incident titles, descriptions, locations and
+    updates, best match first.
+
+    Searches every organization the user belongs to unless organization_id
+    is given. Pass the X-Next-Cursor response header back as `cursor` to
+    fetch the next page.
+    """
+    rows = await run_db(
+        db, crud.search_incidents,
+        q,
+        auth,
+        organization_id=organization_id,
+        status=status,
+        priority=priority,
+        limit=limit,
+        cursor=cursor
+    )
+    set_next_cursor(response, rows, limit, crud.INCIDENT_SEARCH_ORDER)
+    return json_rows([
+        {**incident, "score": row.score, "snippet": row.snippet}
+        for incident, row in zip(crud.INCIDENT_PROJECTION.as_dicts(rows), rows)
+    ], response)
+
+@router.get("/nearby", response_model=List[schemas.IncidentNearby])
+async def list_nearby_incidents(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10.0, gt=0, le=500),
+    organization_id: Optional[int] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: int = Query(50, gt=0, le=500),
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_read_db)
+):
+    """List incidents within radius_km of a point, nearest first, from the
+    organizations the user belongs to (or just organization_id)"""
+    return await run_db(
+        db, crud.get_nearby_incidents,
+        latitude=latitude,
+        longitude=longitude,
+        radius_km=radius_km,
+        auth=auth,
+        organization_id=organization_id,
+        status=status,
+        type=type,
         limit=limit
     )
 
 @router.get("/{incident_id}", response_model=schemas.IncidentDetail)
 async def get_incident(
     incident_id: int,
+    response: Response,
+    updates_limit: int = Query(50, ge=0, le=500),
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get detailed incident information.
+
+    Includes the newest updates_limit updates; continue with
+    /incidents/{incident_id}/updates using updates_next_cursor. Send the
+    ETag back in If-None-Match to get an empty 304 while nothing changed,
+    or in If-Match when updating the incident.
+    """
+    tag = await run_db(db, crud.get_incident_etag, incident_id)
+    if tag is not None:
+        if versioning.none_match(if_none_match, tag):
+            return versioning.not_modified(tag)
+        versioning.set_cache_headers(response, tag)
+    return await run_db(
+        db, crud.get_incident_detail, incident_id, updates_limit=updates_limit
+    )
+
+@router.get(
+    "/{incident_id}/recommendations",
+    response_model=List[resource_schemas.ResourceRecommendation]
+)
+async def recommend_resources(
+    incident_id: int,
+    mutual_aid_organization_ids: List[int] = Query([]),
+    max_distance_km: Optional[float] = Query(None, gt=0),
+    limit: int = Query(10, gt=0, le=100),
     current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
+    # Primary, not a replica: the shared resource snapshot is reloaded and
+    # patched through this session and keeps what it reads until the next
+    # write to the same resource
     db: Session = Depends(get_db)
 ):
-    """Get detailed incident information"""
-    return crud.get_incident(db, incident_id)
+    """Rank the available resources of the incident's organization (and of
+    mutual_aid_organization_ids) by distance, type fit, remaining quantity,
+    condition and owning team, best first"""
+    return await run_db(
+        db, crud_recommendation.recommend_resources,
+        incident_id,
+        auth,
+        mutual_aid_organization_ids=mutual_aid_organization_ids,
+        max_distance_km=max_distance_km,
+        limit=limit
+    )
 
-@router.put("/{incident_id}", response_model=schemas.Incident)
+@router.post(
+    "/{incident_id}/assignments:batch",
+    response_model=List[resource_schemas.ResourceAssignment]
+)
+async def assign_resources_batch(
+    incident_id: int,
+    batch: resource_schemas.ResourceAssignmentBatch,
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_db)
+):
+    """Assign many resources to an incident at once (team dispatcher or org
+    admin of each). Nothing is assigned unless every resource has enough
+    quantity available."""
+    if len(batch.assignments) > settings.ASSIGNMENT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.ASSIGNMENT_BATCH_MAX_ITEMS} assignments per request"
+        )
+    return await run_db(
+        db, crud_resource.assign_resources_batch,
+        incident_id, batch.assignments, current_user.id, auth=auth
+    )
+
+@router.put("/{incident_id}", response_model=schemas.IncidentSummary)
 async def update_incident(
     incident_id: int,
     incident_update: schemas.IncidentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
-    """Update incident details"""
-    return crud.update_incident(db, incident_id, incident_update, current_user.id)
+    """Update incident details; returns the incident without its updates.
+    With the ETag of the last read in If-Match, fails with 412 instead of
+    overwriting a concurrent update."""
+    incident = await run_db(
+        db, crud.update_incident, incident_id, incident_update, current_user.id,
+        auth=auth, expected_version=versioning.parse_if_match(if_match)
+    )
+    versioning.set_etag(response, incident)
+    return incident
 
 @router.post("/{incident_id}/updates", response_model=schemas.IncidentUpdateRead)
 async def create_incident_update(
     incident_id: int,
     update_in: schemas.IncidentUpdateCreate,
     current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     """Add an update to an incident"""
-    return crud.create_incident_update(db, incident_id, current_user.id, update_in)
+    return await run_db(
+        db, crud.create_incident_update, incident_id, current_user.id, update_in,
+        auth=auth
+    )
 
 @router.get("/{incident_id}/updates", response_model=List[schemas.IncidentUpdateRead])
 async def list_incident_updates(
     incident_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List all updates for an incident"""
-    return crud.get_incident_updates(db, incident_id, skip=skip, limit=limit) 
\ No newline at end of file
+    """List all updates for an incident, newest first"""
+    updates = await run_db(
+        db, crud.get_incident_updates,
+        incident_id, skip=skip, limit=limit, cursor=cursor
+    )
+    set_next_cursor(response, updates, limit, crud.INCIDENT_UPDATE_ORDER)
+    return json_rows(crud.INCIDENT_UPDATE_PROJECTION.as_dicts(updates), response) 
\ No newline at end of file
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from typing import List, Optional
 from sqlalchemy.orm import Session
 
 from ....core.deps import (
     get_db,
+    get_read_db,
+    run_db,
     get_current_active_user,
+    get_auth_context,
     get_organization_admin,
     get_organization_member
 )
 from ....crud import organization as crud
+from ....crud import versioning
+from ....crud.pagination import NEXT_CURSOR_HEADER, encode_cursor
 from ....schemas import organization as schemas
+from ....schemas.user import UserWithOrgRole
+from ....core.authz import AuthContext
+from ....core.config import settings
+from ....core.serialization import FastJSONResponse, type_adapter
 
 router = APIRouter()
 
@@ -20,36 +29,90 @@ async def create_organization(
     db: Session = Depends(get_db)
 ):
     """Create a new organization"""
-    return crud.create_organization(db, org_in, current_user.id)
+    return await run_db(db, crud.create_organization, org_in, current_user.id)
 
 @router.get("/", response_model=List[schemas.Organization])
 async def list_organizations(
     skip: int = 0,
     limit: int = 100,
+    visibility: Optional[schemas.OrganizationVisibility] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List all public organizations and private ones user is member of"""
-    return crud.get_organizations(db, current_user.id, skip=skip, limit=limit)
+    """List all public organizations and private ones user is member of.
+
+    Cacheable for ORGANIZATION_LIST_MAX_AGE_SECONDS, by shared caches too
+    with visibility=public (the same list for every user); revalidate with
+    the ETag in If-None-Match.
+    """
+    organizations = await run_db(
+        db, crud.get_organizations, current_user.id, skip=skip, limit=limit,
+        visibility=visibility.value if visibility else None
+    )
+    adapter = type_adapter(List[schemas.Organization])
+    body = adapter.dump_json(adapter.validate_python(organizations, from_attributes=True))
+    tag = versioning.content_etag(body)
+    scope = "public" if visibility == schemas.OrganizationVisibility.PUBLIC else "private"
+    cache_control = f"{scope}, max-age={settings.ORGANIZATION_LIST_MAX_AGE_SECONDS}"
+    if versioning.none_match(if_none_match, tag):
+        return versioning.not_modified(tag, cache_control)
+    return FastJSONResponse(body, headers={
+        versioning.ETAG_HEADER: tag, versioning.CACHE_CONTROL_HEADER: cache_control
+    })
 
 @router.get("/{org_id}", response_model=schemas.OrganizationDetail)
 async def get_organization(
     org_id: int,
+    members_limit: int = Query(50, ge=0, le=500),
+    teams_limit: int = Query(50, ge=0, le=500),
     current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_read_db)
+):
+    """Get organization details.
+
+    Includes the first page of members and teams; continue with
+    /organizations/{org_id}/members and /teams/organization/{org_id} using
+    members_next_cursor and teams_next_cursor.
+    """
+    return await run_db(
+        db, crud.get_organization, org_id, current_user.id, auth=auth,
+        members_limit=members_limit, teams_limit=teams_limit
+    )
+
+@router.get("/{org_id}/members", response_model=List[UserWithOrgRole])
+async def list_organization_members(
+    org_id: int,
+    response: Response,
+    limit: int = Query(100, gt=0, le=500),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_read_db)
 ):
-    """Get organization details"""
-    return crud.get_organization(db, org_id, current_user.id)
+    """List active members of an organization, by user id"""
+    members = await run_db(
+        db, crud.get_organization_members, org_id, current_user.id,
+        limit=limit, cursor=cursor, auth=auth
+    )
+    if len(members) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([members[-1].id])
+    return members
 
 @router.put("/{org_id}", response_model=schemas.Organization)
 async def update_organization(
     org_id: int,
     org_update: schemas.OrganizationUpdate,
     current_user = Depends(get_organization_admin),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     """Update organization details (admin only)"""
-    return crud.update_organization(db, org_id, org_update)
+    return await run_db(
+        db, crud.update_organization, org_id, org_update, current_user.id,
+        auth=auth
+    )
 
 @router.post("/{org_id}/members/request", response_model=schemas.OrganizationMembership)
 async def request_membership(
@@ -58,7 +121,7 @@ async def request_membership(
     db: Session = Depends(get_db)
 ):
     """Request to join an organization"""
-    return crud.create_membership_request(db, org_id, current_user.id)
+    return await run_db(db, crud.create_membership_request, org_id, current_user.id)
 
 @router.post("/{org_id}/members/{user_id}/approve")
 async def approve_membership(
@@ -68,5 +131,5 @@ async def approve_membership(
     db: Session = Depends(get_db)
 ):
     """Approve a membership request (admin only)"""
-    crud.approve_membership_request(db, org_id, user_id)
+    await run_db(db, crud.approve_membership_request, org_id, user_id)
     return {"status": "approved"} 
\ No newline at end of file
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from typing import List, Optional
 from sqlalchemy.orm import Session
 
 from ....core.deps import (
     get_db,
+    get_read_db,
+    run_db,
     get_current_active_user,
-    get_organization_admin,
-    get_team_dispatcher
+    get_auth_context
 )
+from ....core.authz import AuthContext
+from ....core.serialization import json_rows
 from ....crud import resource as crud
+from ....crud import versioning
+from ....crud.pagination import set_next_cursor
 from ....schemas import resource as schemas
 from ....models import User
 
@@ -17,80 +22,160 @@ router = APIRouter()
 @router.post("/", response_model=schemas.Resource)
 async def create_resource(
     resource_in: schemas.ResourceCreate,
-    current_user: User = Depends(get_organization_admin),
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     """Create a new resource (org admin only)"""
-    return crud.create_resource(db, resource_in)
+    return await run_db(
+        db, crud.create_resource, resource_in, current_user.id, auth=auth
+    )
 
 @router.get("/", response_model=List[schemas.Resource])
 async def list_resources(
+    response: Response,
     organization_id: Optional[int] = None,
     team_id: Optional[int] = None,
     status: Optional[str] = None,
     type: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List resources with optional filters"""
-    return crud.get_resources(
-        db,
+    """List resources with optional filters. With organization_id, send the
+    ETag back in If-None-Match to get an empty 304 while none of the
+    organization's resources changed."""
+    if organization_id is not None:
+        tag = await run_db(
+            db, versioning.organization_list_etag, organization_id, "resource_changes"
+        )
+        if versioning.none_match(if_none_match, tag):
+            return versioning.not_modified(tag)
+        versioning.set_cache_headers(response, tag)
+
+    resources = await run_db(
+        db, crud.get_resources,
         organization_id=organization_id,
         team_id=team_id,
         status=status,
         type=type,
         skip=skip,
+        limit=limit,
+        cursor=cursor
+    )
+    set_next_cursor(response, resources, limit, crud.RESOURCE_ORDER)
+    return json_rows(crud.RESOURCE_PROJECTION.as_dicts(resources), response)
+
+@router.get("/nearby", response_model=List[schemas.ResourceNearby])
+async def list_nearby_resources(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10.0, gt=0, le=500),
+    organization_id: Optional[int] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: int = Query(50, gt=0, le=500),
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
+    db: Session = Depends(get_read_db)
+):
+    """List resources within radius_km of a point, nearest first, from the
+    organizations the user belongs to (or just organization_id)"""
+    return await run_db(
+        db, crud.get_nearby_resources,
+        latitude=latitude,
+        longitude=longitude,
+        radius_km=radius_km,
+        auth=auth,
+        organization_id=organization_id,
+        status=status,
+        type=type,
         limit=limit
     )
 
 @router.get("/{resource_id}", response_model=schemas.ResourceDetail)
 async def get_resource(
     resource_id: int,
+    response: Response,
+    history_limit: int = Query(50, ge=0, le=500),
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get detailed resource information"""
-    return crud.get_resource(db, resource_id)
+    """Get detailed resource information: open assignments and the newest
+    history_limit returned ones"""
+    tag = await run_db(db, crud.get_resource_etag, resource_id)
+    if tag is not None:
+        if versioning.none_match(if_none_match, tag):
+            return versioning.not_modified(tag)
+        versioning.set_cache_headers(response, tag)
+    return await run_db(db, crud.get_resource_detail, resource_id, history_limit=history_limit)
 
 @router.put("/{resource_id}", response_model=schemas.Resource)
 async def update_resource(
     resource_id: int,
     resource_update: schemas.ResourceUpdate,
-    current_user: User = Depends(get_organization_admin),
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
-    """Update resource details (org admin only)"""
-    return crud.update_resource(db, resource_id, resource_update)
+    """Update resource details (team leader or org admin). With the ETag of
+    the last read in If-Match, fails with 412 instead of overwriting a
+    concurrent update or assignment."""
+    resource = await run_db(
+        db, crud.update_resource, resource_id, resource_update, current_user.id,
+        auth=auth, expected_version=versioning.parse_if_match(if_match)
+    )
+    versioning.set_etag(response, resource)
+    return resource
 
 @router.post("/{resource_id}/assign", response_model=schemas.ResourceAssignment)
 async def assign_resource(
     resource_id: int,
     assignment_in: schemas.ResourceAssignmentCreate,
-    current_user: User = Depends(get_team_dispatcher),
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
-    """Assign a resource to an incident (team dispatcher only)"""
-    return crud.assign_resource(db, resource_id, assignment_in)
+    """Assign a resource to an incident (team dispatcher or org admin)"""
+    return await run_db(
+        db, crud.assign_resource,
+        resource_id, assignment_in.incident_id, assignment_in.quantity,
+        current_user.id, auth=auth
+    )
 
 @router.post("/{resource_id}/return", response_model=schemas.ResourceAssignment)
 async def return_resource(
     resource_id: int,
     assignment_id: int,
-    current_user: User = Depends(get_team_dispatcher),
+    current_user: User = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
-    """Mark a resource as returned (team dispatcher only)"""
-    return crud.return_resource(db, assignment_id, current_user.id)
+    """Mark a resource as returned (team dispatcher or org admin)"""
+    return await run_db(
+        db, crud.return_resource, assignment_id, current_user.id, auth=auth
+    )
 
 @router.get("/{resource_id}/assignments", response_model=List[schemas.ResourceAssignment])
 async def list_resource_assignments(
     resource_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List all assignments for a resource"""
-    return crud.get_resource_assignments(db, resource_id, skip=skip, limit=limit) 
\ No newline at end of file
+    """List all assignments for a resource, most recent first"""
+    assignments = await run_db(
+        db, crud.get_resource_assignments,
+        resource_id, skip=skip, limit=limit, cursor=cursor
+    )
+    set_next_cursor(response, assignments, limit, crud.ASSIGNMENT_ORDER)
+    return json_rows(crud.ASSIGNMENT_PROJECTION.as_dicts(assignments), response) 
\ No newline at end of file
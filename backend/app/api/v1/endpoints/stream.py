@@ -0,0 +1,100 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ....core.authz import AuthContext, load_auth_context
+from ....core.config import settings
+from ....core.deps import get_db, get_stream_user, release_db, run_db
+from ....core.events import Subscription, event_bus
+from ....models import User
+
+router = APIRouter()
+
+async def _subscribe(
+    db: Session,
+    user: User,
+    organization_id: Optional[int],
+    team_id: Optional[int]
+) -> Subscription:
+    auth: AuthContext = await run_db(db, load_auth_context, user.id)
+    # Streams stay open for hours; don't hold a pooled connection meanwhile
+    await release_db(db)
+
+    if organization_id is not None and not auth.is_org_member(organization_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not a member of this organization"
+        )
+    if team_id is not None and not auth.is_team_member(team_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User is not a member of this team"
+        )
+    return event_bus.subscribe(auth, organization_id=organization_id, team_id=team_id)
+
+@router.get("/")
+async def stream_events(
+    organization_id: Optional[int] = None,
+    team_id: Optional[int] = None,
+    current_user: User = Depends(get_stream_user),
+    db: Session = Depends(get_db)
+):
+    """Server-Sent Events feed of incident and resource changes.
+
+    Only changes in the caller's organizations are sent, optionally narrowed
+    to one organization or team. An `overflow` event means the client fell
+    behind and should refetch before reconnecting.
+    """
+    subscription = await _subscribe(db, current_user, organization_id, team_id)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await subscription.get(settings.STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    yield "event: overflow\ndata: {}\n\n"
+                    return
+                yield event.to_sse()
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws")
+async def stream_events_ws(
+    websocket: WebSocket,
+    organization_id: Optional[int] = None,
+    team_id: Optional[int] = None,
+    current_user: User = Depends(get_stream_user),
+    db: Session = Depends(get_db)
+):
+    """WebSocket variant of the change feed; each message is one event as
+    JSON: {"id", "type", "organization_id", "data"}"""
+    subscription = await _subscribe(db, current_user, organization_id, team_id)
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                event = await subscription.get(settings.STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_text('{"type":"keepalive"}')
+                continue
+            if event is None:
+                await websocket.close(code=1013, reason="overflow")
+                return
+            await websocket.send_text(event.to_json())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        event_bus.unsubscribe(subscription)
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from typing import List, Optional
 from sqlalchemy.orm import Session
 
 from ....core.deps import (
     get_db,
+    get_read_db,
+    run_db,
     get_current_active_user,
-    get_organization_admin,
+    get_auth_context,
     get_team_leader,
     get_organization_member
 )
+from ....core.authz import AuthContext
 from ....crud import team as crud
+from ....crud import versioning
+from ....crud.pagination import set_next_cursor
 from ....schemas import team as schemas
 
 router = APIRouter()
@@ -17,52 +22,78 @@ router = APIRouter()
 @router.post("/", response_model=schemas.Team)
 async def create_team(
     team_in: schemas.TeamCreate,
-    current_user = Depends(get_organization_admin),
+    current_user = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
     """Create a new team (org admin only)"""
-    return crud.create_team(db, team_in, current_user.id)
+    return await run_db(db, crud.create_team, team_in, current_user.id, auth=auth)
 
 @router.get("/organization/{org_id}", response_model=List[schemas.Team])
 async def list_organization_teams(
     org_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user = Depends(get_organization_member),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """List all teams in an organization"""
-    return crud.get_organization_teams(db, org_id, skip=skip, limit=limit)
+    """List all teams in an organization. Send the ETag back in
+    If-None-Match to get an empty 304 while none of its teams changed."""
+    tag = await run_db(db, versioning.organization_list_etag, org_id, "team_changes")
+    if versioning.none_match(if_none_match, tag):
+        return versioning.not_modified(tag)
+    versioning.set_cache_headers(response, tag)
+
+    teams = await run_db(db, crud.get_teams, org_id, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, teams, limit, crud.TEAM_ORDER)
+    return teams
 
 @router.get("/{team_id}", response_model=schemas.TeamDetail)
 async def get_team(
     team_id: int,
     current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get team details"""
-    return crud.get_team(db, team_id, current_user.id)
+    return await run_db(db, crud.get_team_detail, team_id)
 
 @router.put("/{team_id}", response_model=schemas.Team)
 async def update_team(
     team_id: int,
     team_update: schemas.TeamUpdate,
-    current_user = Depends(get_team_leader),
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
-    """Update team details (team leader only)"""
-    return crud.update_team(db, team_id, team_update)
+    """Update team details (team leader or org admin). With the ETag of the
+    last read in If-Match, fails with 412 instead of overwriting a
+    concurrent update."""
+    team = await run_db(
+        db, crud.update_team, team_id, team_update, current_user.id,
+        auth=auth, expected_version=versioning.parse_if_match(if_match)
+    )
+    versioning.set_etag(response, team)
+    return team
 
 @router.post("/{team_id}/members/{user_id}", response_model=schemas.TeamMembership)
 async def add_team_member(
     team_id: int,
     user_id: int,
     role: schemas.TeamRole,
-    current_user = Depends(get_team_leader),
+    current_user = Depends(get_current_active_user),
+    auth: AuthContext = Depends(get_auth_context),
     db: Session = Depends(get_db)
 ):
-    """Add a member to the team (team leader only)"""
-    return crud.add_team_member(db, team_id, user_id, role, current_user.id)
+    """Add a member to the team (team leader or org admin)"""
+    return await run_db(
+        db, crud.add_team_member, team_id, user_id, current_user.id, role,
+        auth=auth
+    )
 
 @router.delete("/{team_id}/members/{user_id}")
 async def remove_team_member(
@@ -72,5 +103,5 @@ async def remove_team_member(
     db: Session = Depends(get_db)
 ):
     """Remove a member from the team (team leader only)"""
-    crud.remove_team_member(db, team_id, user_id)
+    await run_db(db, crud.remove_team_member, team_id, user_id)
     return {"status": "removed"} 
\ No newline at end of file
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import List, Optional
 from sqlalchemy.orm import Session
 
 from ....core.deps import (
     get_db,
+    get_read_db,
+    run_db,
     get_current_user,
     get_current_active_user,
     get_organization_admin,
@@ -12,8 +14,9 @@ from ....core.deps import (
 )
 from ....crud import user as crud_user
 from ....crud import organization as crud_org
+from ....crud.pagination import NEXT_CURSOR_HEADER, encode_cursor
 from ....schemas import user as schemas
-from ....core.security import create_access_token
+from ....core.security import create_access_token, get_password_hash_async
 from ....models import User, Organization, OrganizationMembership, Team, TeamMembership
 
 router = APIRouter()
@@ -24,77 +27,18 @@ async def create_user(
     db: Session = Depends(get_db)
 ):
     """Create new user - public endpoint for registration"""
-    return crud_user.create_user(db, user_in)
+    hashed_password = await get_password_hash_async(user_in.password)
+    return await run_db(
+        db, crud_user.create_user, user_in, hashed_password=hashed_password
+    )
 
 @router.get("/me", response_model=schemas.UserWithMemberships)
 async def read_users_me(
     current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get current user's profile with their organization memberships"""
-    # Get organization memberships with organization names
-    org_memberships = (
-        db.query(OrganizationMembership)
-        .join(Organization)
-        .filter(OrganizationMembership.user_id == current_user.id)
-        .with_entities(
-            OrganizationMembership.id,
-            OrganizationMembership.organization_id,
-            Organization.name,
-            OrganizationMembership.role,
-            OrganizationMembership.status,
-            OrganizationMembership.join_date,
-            OrganizationMembership.last_active
-        )
-        .all()
-    )
-
-    # Convert to OrganizationMemberInfo objects
-    organizations = [
-        schemas.OrganizationMemberInfo(
-            organization_id=membership.organization_id,
-            name=membership.name,
-            role=membership.role,
-            status=membership.status,
-            join_date=membership.join_date
-        )
-        for membership in org_memberships
-    ]
-
-    # Get team memberships
-    team_memberships = (
-        db.query(TeamMembership)
-        .join(Team)
-        .filter(TeamMembership.user_id == current_user.id)
-        .with_entities(
-            TeamMembership.id,
-            TeamMembership.team_id,
-            Team.name,
-            Team.organization_id,
-            TeamMembership.role,
-            TeamMembership.join_date
-        )
-        .all()
-    )
-
-    # Convert to TeamMemberInfo objects
-    teams = [
-        schemas.TeamMemberInfo(
-            team_id=membership.team_id,
-            name=membership.name,
-            organization_id=membership.organization_id,
-            role=membership.role,
-            join_date=membership.join_date
-        )
-        for membership in team_memberships
-    ]
-
-    # Create UserWithMemberships response
-    return schemas.UserWithMemberships(
-        **current_user.__dict__,
-        organizations=organizations,
-        teams=teams
-    )
+    return await run_db(db, crud_user.get_user_with_memberships, current_user)
 
 @router.put("/me", response_model=schemas.User)
 async def update_current_user(
@@ -103,21 +47,32 @@ async def update_current_user(
     db: Session = Depends(get_db)
 ):
     """Update current user's profile"""
-    return crud_user.update_user(db, current_user.id, user_update)
+    hashed_password = None
+    if user_update.password:
+        hashed_password = await get_password_hash_async(user_update.password)
+    return await run_db(
+        db, crud_user.update_user, current_user.id, user_update,
+        hashed_password=hashed_password
+    )
 
 @router.get("/organizations/{org_id}/members", response_model=List[schemas.UserWithOrgRole])
 async def read_organization_members(
     org_id: int,
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    limit: int = Query(100, gt=0, le=500),
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get all members of an organization (must be a member to view)"""
     # Authorization is handled in the crud operation
-    return crud_org.get_organization_members(
-        db, org_id, current_user.id, skip=skip, limit=limit
+    members = await run_db(
+        db, crud_org.get_organization_members,
+        org_id, current_user.id, limit=limit, cursor=cursor
     )
+    if len(members) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([members[-1].id])
+    return members
 
 @router.post("/organizations/{org_id}/members/{user_id}/role", response_model=schemas.UserWithOrgRole)
 async def update_organization_member_role(
@@ -128,7 +83,7 @@ async def update_organization_member_role(
     db: Session = Depends(get_db)
 ):
     """Update a member's role in an organization (admin only)"""
-    return crud_org.update_organization_member_role(db, org_id, user_id, role_update.role)
+    return await run_db(db, crud_org.update_organization_member_role, org_id, user_id, role_update.role)
 
 @router.post("/teams/{team_id}/members/{user_id}/role", response_model=schemas.UserWithTeamRole)
 async def update_team_member_role(
@@ -139,4 +94,4 @@ async def update_team_member_role(
     db: Session = Depends(get_db)
 ):
     """Update a member's role in a team (team leader only)"""
-    return crud_org.update_team_member_role(db, team_id, user_id, role_update.role) 
\ No newline at end of file
+    return await run_db(db, crud_org.update_team_member_role, team_id, user_id, role_update.role) 
\ No newline at end of file
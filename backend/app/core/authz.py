@@ -0,0 +1,87 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import String, cast, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from ..models.organization import OrganizationMembership
+from ..models.team import TeamMembership
+
+class AuthContext:
+    """The caller's organization and team roles, loaded once per request.
+
+    Every role check in deps and crud is answered from these maps instead of
+    re-querying the membership tables.
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        org_roles: Dict[int, Tuple[str, str]],
+        team_roles: Dict[int, str]
+    ):
+        self.user_id = user_id
+        self.org_roles = org_roles  # organization_id -> (role, status)
+        self.team_roles = team_roles  # team_id -> role
+
+    def org_role(self, org_id: int) -> Optional[str]:
+        """Role in an organization, only if the membership is active"""
+        role, membership_status = self.org_roles.get(org_id, (None, None))
+        return role if membership_status == "active" else None
+
+    def is_org_member(self, org_id: int) -> bool:
+        return self.org_role(org_id) is not None
+
+    def member_org_ids(self) -> List[int]:
+        """Organizations with an active membership"""
+        return [org_id for org_id in self.org_roles if self.is_org_member(org_id)]
+
+    def is_org_admin(self, org_id: int) -> bool:
+        return self.org_role(org_id) == "admin"
+
+    def team_role(self, team_id: Optional[int]) -> Optional[str]:
+        return self.team_roles.get(team_id) if team_id else None
+
+    def is_team_member(self, team_id: Optional[int]) -> bool:
+        return self.team_role(team_id) is not None
+
+    def has_team_role(self, team_id: Optional[int], *roles: str) -> bool:
+        return self.team_role(team_id) in roles
+
+    def can_lead(self, team_id: Optional[int], org_id: int) -> bool:
+        """Team leader or admin of the owning organization"""
+        return self.has_team_role(team_id, "leader") or self.is_org_admin(org_id)
+
+    def can_dispatch(self, team_id: Optional[int], org_id: int) -> bool:
+        """Team leader/dispatcher or admin of the owning organization"""
+        return (
+            self.has_team_role(team_id, "leader", "dispatcher")
+            or self.is_org_admin(org_id)
+        )
+
+def load_auth_context(db: Session, user_id: int) -> AuthContext:
+    """Load every organization and team membership of a user in one query"""
+    org_memberships = select(
+        literal("org").label("kind"),
+        OrganizationMembership.organization_id.label("scope_id"),
+        cast(OrganizationMembership.role, String).label("role"),
+        cast(OrganizationMembership.status, String).label("status"),
+    ).where(OrganizationMembership.user_id == user_id)
+
+    team_memberships = select(
+        literal("team"),
+        TeamMembership.team_id,
+        cast(TeamMembership.role, String),
+        cast(literal(None), String),
+    ).where(TeamMembership.user_id == user_id)
+
+    org_roles = {}
+    team_roles = {}
+    for kind, scope_id, role, membership_status in db.execute(
+        union_all(org_memberships, team_memberships)
+    ):
+        if kind == "org":
+            org_roles[scope_id] = (role, membership_status)
+        else:
+            team_roles[scope_id] = role
+
+    return AuthContext(user_id, org_roles, team_roles)
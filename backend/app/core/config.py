@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import secrets
 
 class Settings(BaseSettings):
@@ -26,6 +26,99 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = "emre"
     SQLALCHEMY_DATABASE_URI: str = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}/{POSTGRES_DB}"
 
+    # Engine used by the app; set it to SQLALCHEMY_DATABASE_URI to run on
+    # Postgres. app.db.engine applies the backend-specific settings below.
+    DATABASE_URL: str = "sqlite:///./emre.db"
+
+    # SQLite: applied to every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 15000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+
+    # Server databases: connection pool and per-statement time limit
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_TIMEOUT_MS: int = 15000
+
+    # Read-only endpoints use these replicas round-robin (same driver as the
+    # primary, so async URLs when USE_ASYNC_DB). A replica lagging by more
+    # than READ_REPLICA_MAX_LAG_SECONDS is skipped; its lag is re-measured at
+    # most every READ_REPLICA_CHECK_INTERVAL_SECONDS. After committing a
+    # write, a user reads from the primary for READ_YOUR_WRITES_SECONDS.
+    READ_REPLICA_URLS: List[str] = []
+    READ_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    READ_REPLICA_CHECK_INTERVAL_SECONDS: float = 2.0
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Serve requests from an AsyncSession (aiosqlite / asyncpg) instead of
+    # running the synchronous session in a worker thread
+    USE_ASYNC_DB: bool = False
+    ASYNC_DATABASE_URL: str = "sqlite+aiosqlite:///./emre.db"
+
+    # Token subject -> user cache used by get_current_user
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_ENTRIES: int = 10000
+
+    # Password hashing runs on its own bounded pool; hashes with fewer than
+    # BCRYPT_ROUNDS are upgraded on the next successful login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # POST /incidents/bulk: rows per validate/insert/commit chunk, and the
+    # largest batch accepted in one request
+    INCIDENT_BULK_CHUNK_SIZE: int = 500
+    INCIDENT_BULK_MAX_ROWS: int = 10000
+
+    # POST /incidents/{id}/assignments:batch: most resources in one request
+    ASSIGNMENT_BATCH_MAX_ITEMS: int = 500
+
+    # /stream change feed: events buffered per subscriber before it is cut
+    # off, and the idle interval between keepalives
+    STREAM_QUEUE_SIZE: int = 256
+    STREAM_HEARTBEAT_SECONDS: int = 15
+
+    # /metrics: a request that runs the same SELECT more than this many
+    # times is counted (and logged) as a likely N+1
+    METRICS_N_PLUS_ONE_THRESHOLD: int = 10
+
+    # /analytics/incidents: most time buckets one request may cover
+    ANALYTICS_MAX_BUCKETS: int = 1000
+
+    # GET /organizations/: how long clients (and, for ?visibility=public,
+    # shared caches) may reuse a listing without revalidating it
+    ORGANIZATION_LIST_MAX_AGE_SECONDS: int = 60
+
+    # Token-bucket rate limits (app.core.ratelimit): "METHOD /path/template"
+    # -> "<requests>/<period> per <user|ip>". Buckets live in
+    # RATE_LIMIT_STORE_URL: memory:// (per process, at most
+    # RATE_LIMIT_MAX_KEYS buckets), redis://... or sqlite:///... (shared).
+    # Behind a reverse proxy, trust the address it appends to
+    # X-Forwarded-For for "per ip" limits.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMITS: Dict[str, str] = {
+        # bcrypt-bound, and the caller is not known yet
+        "POST /api/v1/auth/login": "10/minute per ip",
+        "POST /api/v1/users/": "5/minute per ip",
+        "POST /api/v1/incidents/bulk": "10/minute per user",
+        "GET /api/v1/incidents/": "300/minute per user",
+        "GET /api/v1/incidents/search": "120/minute per user",
+        "GET /api/v1/incidents/{incident_id}/recommendations": "120/minute per user",
+        "GET /api/v1/resources/": "300/minute per user",
+        "GET /api/v1/analytics/incidents": "60/minute per user",
+    }
+    RATE_LIMIT_STORE_URL: str = "memory://"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+
+    # /incidents/{id}/recommendations: the in-memory resource snapshot is
+    # patched on this process's resource writes and fully reloaded after
+    # this long, to pick up writes made by other workers
+    RECOMMENDATION_SNAPSHOT_MAX_AGE_SECONDS: int = 60
+
     class Config:
         case_sensitive = True
         env_file = ".env"
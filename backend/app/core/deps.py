@@ -1,14 +1,17 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from jose import JWTError, jwt
 
-from ..db.base import get_db
+from ..db.base import get_db, release_db, replica_router, run_db
 from ..models import (
     User, Organization, OrganizationMembership, 
     Team, TeamMembership
 )
+from ..crud import user as crud_user
+from .authz import AuthContext, load_auth_context
+from .cache import user_cache
 from .config import settings
 
 # Define OAuth2 scheme
@@ -16,15 +19,14 @@ oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="api/v1/auth/login"  # Updated to match the actual login endpoint
 )
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+async def _user_from_token(token: Optional[str], db: Session) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = jwt.decode(
             token, 
@@ -37,11 +39,51 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        user = await run_db(db, crud_user.get_detached_user, user_id)
+        if user is None:
+            raise credentials_exception
+        user_cache.set(user_id, user)
     return user
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    user = await _user_from_token(token, db)
+    # Commits on this session count as the user's writes (read-your-writes)
+    db.info["user_id"] = user.id
+    return user
+
+async def get_read_db(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Session for read-only endpoints: a read replica when one is usable
+    and the user has not written recently, otherwise the request's primary
+    session"""
+    factory = await replica_router.choose(current_user.id)
+    if factory is None:
+        yield db
+        return
+    replica_db = factory()
+    try:
+        yield replica_db
+    finally:
+        await release_db(replica_db)
+
+async def get_stream_user(
+    token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+) -> User:
+    """Like get_current_user, but also accepts the token as a `token` query
+    parameter since EventSource and browser WebSockets cannot set headers"""
+    if not token and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    return await _user_from_token(token, db)
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -52,19 +94,20 @@ async def get_current_active_user(
         )
     return current_user
 
+async def get_auth_context(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> AuthContext:
+    """Memberships of the caller; FastAPI caches this per request, so every
+    dependency and crud call below shares a single membership query"""
+    return await run_db(db, load_auth_context, current_user.id)
+
 async def get_organization_admin(
     org_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    auth: AuthContext = Depends(get_auth_context)
 ) -> User:
-    membership = db.query(OrganizationMembership).filter(
-        OrganizationMembership.organization_id == org_id,
-        OrganizationMembership.user_id == current_user.id,
-        OrganizationMembership.role == "admin",
-        OrganizationMembership.status == "active"
-    ).first()
-    
-    if not membership:
+    if not auth.is_org_admin(org_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User is not an admin of this organization"
@@ -74,15 +117,9 @@ async def get_organization_admin(
 async def get_team_leader(
     team_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    auth: AuthContext = Depends(get_auth_context)
 ) -> User:
-    membership = db.query(TeamMembership).filter(
-        TeamMembership.team_id == team_id,
-        TeamMembership.user_id == current_user.id,
-        TeamMembership.role == "leader"
-    ).first()
-    
-    if not membership:
+    if not auth.has_team_role(team_id, "leader"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User is not a leader of this team"
@@ -92,15 +129,9 @@ async def get_team_leader(
 async def get_team_dispatcher(
     team_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    auth: AuthContext = Depends(get_auth_context)
 ) -> User:
-    membership = db.query(TeamMembership).filter(
-        TeamMembership.team_id == team_id,
-        TeamMembership.user_id == current_user.id,
-        TeamMembership.role.in_(["leader", "dispatcher"])
-    ).first()
-    
-    if not membership:
+    if not auth.has_team_role(team_id, "leader", "dispatcher"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User is not authorized to dispatch for this team"
@@ -110,15 +141,9 @@ async def get_team_dispatcher(
 async def get_organization_member(
     org_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    auth: AuthContext = Depends(get_auth_context)
 ) -> User:
-    membership = db.query(OrganizationMembership).filter(
-        OrganizationMembership.organization_id == org_id,
-        OrganizationMembership.user_id == current_user.id,
-        OrganizationMembership.status == "active"
-    ).first()
-    
-    if not membership:
+    if not auth.is_org_member(org_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User is not a member of this organization"
@@ -128,14 +153,9 @@ async def get_organization_member(
 async def get_team_member(
     team_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    auth: AuthContext = Depends(get_auth_context)
 ) -> User:
-    membership = db.query(TeamMembership).filter(
-        TeamMembership.team_id == team_id,
-        TeamMembership.user_id == current_user.id
-    ).first()
-    
-    if not membership:
+    if not auth.is_team_member(team_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User is not a member of this team"
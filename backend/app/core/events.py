@@ -0,0 +1,162 @@
+import asyncio
+import itertools
+import json
+import threading
+from typing import Any, Optional, Set, Type
+
+from pydantic import BaseModel
+
+from .authz import AuthContext
+from .config import settings
+
+class Event:
+    """A change published after a crud write has committed.
+
+    `data` is the JSON payload, serialized once at publish time and shared
+    by every subscriber.
+    """
+
+    __slots__ = ("id", "kind", "organization_id", "team_id", "data")
+
+    def __init__(
+        self,
+        id: int,
+        kind: str,
+        organization_id: int,
+        team_id: Optional[int],
+        data: str
+    ):
+        self.id = id
+        self.kind = kind
+        self.organization_id = organization_id
+        self.team_id = team_id
+        self.data = data
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.kind}\ndata: {self.data}\n\n"
+
+    def to_json(self) -> str:
+        return (
+            f'{{"id":{self.id},"type":{json.dumps(self.kind)},'
+            f'"organization_id":{self.organization_id},"data":{self.data}}}'
+        )
+
+class Subscription:
+    """A subscriber's bounded queue, owned by the event loop serving it.
+
+    Events are only delivered to callers who were active members of the
+    event's organization when they subscribed, optionally narrowed to one
+    organization or team. A subscriber that falls more than `maxsize`
+    events behind is cut off (`get` returns None) so it can reconnect and
+    refetch instead of silently missing changes.
+    """
+
+    def __init__(
+        self,
+        auth: AuthContext,
+        loop: asyncio.AbstractEventLoop,
+        maxsize: int,
+        organization_id: Optional[int] = None,
+        team_id: Optional[int] = None
+    ):
+        self.auth = auth
+        self.loop = loop
+        self.organization_id = organization_id
+        self.team_id = team_id
+        self.overflowed = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def wants(self, event: Event) -> bool:
+        if self.organization_id is not None and event.organization_id != self.organization_id:
+            return False
+        if self.team_id is not None and event.team_id != self.team_id:
+            return False
+        return self.auth.is_org_member(event.organization_id)
+
+    def _offer(self, event: Optional[Event]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Next event; raises asyncio.TimeoutError after `timeout` seconds
+        and returns None once the subscription has overflowed."""
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+class EventBus:
+    """In-process publish/subscribe for change notifications.
+
+    Crud functions publish from threadpool workers or the event loop; each
+    event is handed to its subscribers' loops with call_soon_threadsafe.
+    Events only reach subscribers connected to the same worker process.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(
+        self,
+        auth: AuthContext,
+        organization_id: Optional[int] = None,
+        team_id: Optional[int] = None
+    ) -> Subscription:
+        """Register a subscriber; must be called from its event loop"""
+        subscription = Subscription(
+            auth, asyncio.get_running_loop(), self.queue_size,
+            organization_id=organization_id, team_id=team_id
+        )
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(
+        self,
+        kind: str,
+        organization_id: int,
+        team_id: Optional[int],
+        payload: Any,
+        schema: Optional[Type[BaseModel]] = None
+    ) -> None:
+        """Fan `payload` out to interested subscribers.
+
+        `payload` is validated through `schema` when given, otherwise it must
+        be JSON serializable. Nothing is serialized when nobody is listening.
+        """
+        if not self._subscribers:
+            return
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if schema is not None:
+            data = schema.model_validate(payload).model_dump_json()
+        else:
+            data = json.dumps(payload, default=str, separators=(",", ":"))
+        event = Event(next(self._ids), kind, organization_id, team_id, data)
+
+        for subscription in subscribers:
+            if not subscription.wants(event):
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+event_bus = EventBus(queue_size=settings.STREAM_QUEUE_SIZE)
@@ -0,0 +1,292 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from ..db.engine import pool_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Label for requests that matched no route, so unknown paths cannot grow
+# the label set without bound
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Scope key under which middleware that answers before routing (rate
+# limiting) names the route template the request was meant for
+ROUTE_TEMPLATE_KEY = "emre.route_template"
+
+class RequestMetrics:
+    """Database work done while serving one request"""
+
+    __slots__ = ("statements", "errors", "db_seconds", "rows", "selects")
+
+    def __init__(self):
+        self.statements = 0
+        self.errors = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.selects: Counter = Counter()
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "request_metrics", default=None
+)
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+class Registry:
+    """Process-wide metrics, rendered in the Prometheus text format.
+
+    Observations are made on the event loop at the end of each request, but
+    the lock keeps `render` consistent if that ever changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds: Counter = Counter()
+        self.rows: Counter = Counter()
+        self.db_errors: Counter = Counter()
+        self.n_plus_one: Counter = Counter()
+        self.rate_limited: Counter = Counter()
+        self.rate_limit_errors: Counter = Counter()
+        self.pools: Dict[str, Engine] = {}
+
+    def observe_request(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        stats: RequestMetrics
+    ) -> None:
+        key = (method, route)
+        repeated = 0
+        if stats.selects:
+            statement, repeated = stats.selects.most_common(1)[0]
+        with self._lock:
+            self.requests[(method, route, str(status))] += 1
+            self.latency.observe(key, seconds)
+            self.statements.observe(key, stats.statements)
+            self.db_seconds[key] += stats.db_seconds
+            self.rows[key] += stats.rows
+            if stats.errors:
+                self.db_errors[key] += stats.errors
+            if repeated > settings.METRICS_N_PLUS_ONE_THRESHOLD:
+                self.n_plus_one[key] += 1
+        if repeated > settings.METRICS_N_PLUS_ONE_THRESHOLD:
+            logger.warning(
+                "Possible N+1 in %s %s: statement ran %d times: %.200s",
+                method, route, repeated, " ".join(statement.split())
+            )
+
+    def observe_rate_limited(self, method: str, route: str, per: str) -> None:
+        with self._lock:
+            self.rate_limited[(method, route, per)] += 1
+
+    def observe_rate_limit_error(self, store: str) -> None:
+        with self._lock:
+            self.rate_limit_errors[(store,)] += 1
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, values: Counter, label_names: Tuple[str, ...]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{{{_labels(label_names, labels)}}} {_number(value)}")
+
+        def histogram(name: str, help_text: str, values: Histogram, label_names: Tuple[str, ...]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, series in sorted(values.series.items()):
+                base = _labels(label_names, labels)
+                cumulative = 0
+                for bound, count in zip(values.buckets, series):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{base},le="{_number(bound)}"}} {cumulative}')
+                cumulative += series[len(values.buckets)]
+                lines.append(f'{name}_bucket{{{base},le="+Inf"}} {cumulative}')
+                lines.append(f"{name}_sum{{{base}}} {_number(series[-1])}")
+                lines.append(f"{name}_count{{{base}}} {cumulative}")
+
+        route = ("method", "route")
+        with self._lock:
+            counter("emre_http_requests_total", "HTTP requests by route template and status.",
+                    self.requests, ("method", "route", "status"))
+            histogram("emre_http_request_duration_seconds", "Request latency.",
+                      self.latency, route)
+            histogram("emre_db_statements_per_request", "SQL statements executed per request.",
+                      self.statements, route)
+            counter("emre_db_seconds_total", "Time spent executing SQL.",
+                    self.db_seconds, route)
+            counter("emre_db_rows_total",
+                    "ORM instances loaded plus rows changed by INSERT/UPDATE/DELETE.",
+                    self.rows, route)
+            counter("emre_db_errors_total", "SQL statements that raised.",
+                    self.db_errors, route)
+            counter("emre_db_n_plus_one_total",
+                    "Requests that ran one SELECT more than the N+1 threshold allows.",
+                    self.n_plus_one, route)
+            counter("emre_rate_limited_total",
+                    "Requests rejected with 429 by route and bucket kind (user or ip).",
+                    self.rate_limited, ("method", "route", "per"))
+            counter("emre_rate_limit_store_errors_total",
+                    "Rate limit store failures; the requests were let through.",
+                    self.rate_limit_errors, ("store",))
+            pools = dict(self.pools)
+
+        lines.append("# HELP emre_db_pool_connections Connections in each engine's pool by state.")
+        lines.append("# TYPE emre_db_pool_connections gauge")
+        for name, engine in sorted(pools.items()):
+            for state, value in pool_stats(engine).items():
+                lines.append(f"emre_db_pool_connections{{{_labels(('pool', 'state'), (name, state))}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            pools = self.pools
+            self.__init__()
+            self.pools = pools
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+registry = Registry()
+
+def instrument_engine(engine: Engine) -> None:
+    """Attribute every statement run on `engine` to the current request.
+
+    Statements outside a request (migrations, scripts) cost one contextvar
+    lookup. For an async engine pass its `sync_engine`.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None:
+            return
+        stats.db_seconds += time.perf_counter() - conn.info["query_started"].pop()
+        stats.statements += 1
+        if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+            if cursor.rowcount > 0:
+                stats.rows += cursor.rowcount
+        else:
+            # Statements are already parameterized, so the text is the fingerprint
+            stats.selects[statement] += 1
+
+    @event.listens_for(engine, "handle_error")
+    def record_error(context):
+        # after_cursor_execute does not run for a failed statement; drop its
+        # start time so it cannot be matched with the connection's next one
+        started = (
+            context.connection.info.get("query_started")
+            if context.connection is not None else None
+        )
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.db_seconds += elapsed
+            stats.errors += 1
+
+def track_pool(name: str, engine: Engine) -> None:
+    """Report `engine`'s pool at /metrics under pool=`name`"""
+    registry.pools[name] = engine
+
+def instrument_orm(base) -> None:
+    """Count ORM instances loaded during a request as rows returned"""
+
+    @event.listens_for(base, "load", propagate=True)
+    def count_row(target, context):
+        stats = _current.get()
+        if stats is not None:
+            stats.rows += 1
+
+def route_template(scope) -> str:
+    """The matched route's path with parameters as placeholders, rebuilt
+    from the request path (a route's own `path` lacks the prefixes of the
+    routers it was included through)."""
+    if scope.get("route") is None:
+        return scope.get(ROUTE_TEMPLATE_KEY, UNMATCHED_ROUTE)
+    segments = scope["path"].split("/")
+    start = 0
+    for name, value in scope.get("path_params", {}).items():
+        value = str(value)
+        for index in range(start, len(segments)):
+            if segments[index] == value:
+                segments[index] = "{" + name + "}"
+                start = index + 1
+                break
+    return "/".join(segments)
+
+class MetricsMiddleware:
+    """Times each HTTP request and records it, together with its database
+    work, under the matched route template (e.g. /api/v1/incidents/{incident_id})."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestMetrics()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            registry.observe_request(
+                scope["method"],
+                route_template(scope),
+                status,
+                elapsed,
+                stats
+            )
@@ -0,0 +1,309 @@
+"""Token-bucket rate limiting for selected routes.
+
+settings.RATE_LIMITS maps "METHOD /path/template" to a limit such as
+"10/minute per ip": a bucket of 10 tokens, refilled at 10 per minute, from
+which every request takes one. Buckets are per authenticated user
+("per user": the access token's subject, or the client address for
+anonymous callers) or per client address ("per ip"). A request that finds
+its bucket empty gets 429 with Retry-After before any endpoint work runs.
+
+Buckets live in the store named by settings.RATE_LIMIT_STORE_URL:
+
+    memory://             this process only (the default)
+    redis://host:6379/0   shared by every worker (needs the redis package)
+    sqlite:///path.db     shared by the workers of one host; a local
+                          stand-in for Redis when testing multiple workers
+
+A shared store that fails lets requests through, counting the failure in
+/metrics, rather than taking the API down with it.
+"""
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+from sqlalchemy.engine import make_url
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .metrics import ROUTE_TEMPLATE_KEY, registry
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # optional; only redis:// stores need it
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+_LIMIT = re.compile(
+    r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*(?:per\s+(user|ip))?\s*$"
+)
+
+def take_token(
+    tokens: float,
+    updated_at: float,
+    now: float,
+    capacity: int,
+    per_second: float
+) -> Tuple[float, float]:
+    """Refill a bucket up to `now` and take one token: returns the tokens
+    left and 0.0, or, when the bucket is empty, its tokens and the seconds
+    until the next token"""
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * per_second)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / per_second
+
+class RateLimit:
+    def __init__(self, rule: str, spec: str):
+        try:
+            self.method, self.template = rule.split(None, 1)
+        except ValueError:
+            raise ValueError(f"Rate limit rule {rule!r} is not 'METHOD /path'")
+        match = _LIMIT.match(spec)
+        if match is None:
+            raise ValueError(f"Rate limit {spec!r} is not '<requests>/<period> per <user|ip>'")
+        requests, multiple, period, per = match.groups()
+        self.method = self.method.upper()
+        self.capacity = int(requests)
+        self.per_second = self.capacity / (int(multiple or 1) * PERIODS[period])
+        self.per = per or "user"
+        self.pattern = re.compile(
+            "^" + re.sub(r"\\\{\w+\\\}", "[^/]+", re.escape(self.template)) + "$"
+        )
+
+    def key(self, subject: str) -> str:
+        return f"{self.method} {self.template}|{subject}"
+
+def parse_limits(rules: Dict[str, str]) -> Dict[str, List[RateLimit]]:
+    """method -> limits, from settings.RATE_LIMITS"""
+    limits: Dict[str, List[RateLimit]] = {}
+    for rule, spec in rules.items():
+        limit = RateLimit(rule, spec)
+        limits.setdefault(limit.method, []).append(limit)
+    return limits
+
+class RateLimitStore(ABC):
+    name = "store"
+
+    @abstractmethod
+    async def take(self, key: str, capacity: int, per_second: float) -> float:
+        """Take a token from bucket `key` (created full): returns 0.0 when
+        one was available, otherwise the seconds until one will be"""
+
+class MemoryStore(RateLimitStore):
+    """Buckets of this process, at most `maxsize`; the least recently used
+    are forgotten first, which only ever refills them early"""
+    name = "memory"
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, capacity: int, per_second: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens, wait = take_token(tokens, updated_at, now, capacity, per_second)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+# Refill and take in one atomic step on the Redis server, timed by its clock
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local per_second = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * per_second)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / per_second
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / per_second * 1000))
+return tostring(wait)
+"""
+
+class RedisStore(RateLimitStore):
+    """Buckets shared by every worker, as Redis hashes that expire once
+    they would be full again"""
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "emre:ratelimit:"):
+        if redis_asyncio is None:
+            raise RuntimeError("redis:// rate limit stores need the redis package")
+        self.prefix = prefix
+        self.client = redis_asyncio.from_url(url)
+        self._script = self.client.register_script(_REDIS_TAKE)
+
+    async def take(self, key: str, capacity: int, per_second: float) -> float:
+        wait = await self._script(keys=[self.prefix + key], args=[capacity, per_second])
+        return float(wait)
+
+class SQLiteStore(RateLimitStore):
+    """Buckets in a SQLite file, shared by the worker processes of one
+    host. Each take is a single UPSERT, so concurrent workers cannot both
+    spend the last token."""
+    name = "sqlite"
+
+    # Drop buckets that have refilled completely every this many takes
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            connection.execute(f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, "
+                "wait REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_expires_at "
+                "ON rate_limit_buckets (expires_at)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def _take(self, key: str, capacity: int, per_second: float) -> float:
+        connection = self._connection()
+        now = time.time()
+        refilled = (
+            "min(:capacity, rate_limit_buckets.tokens + "
+            "max(0, :now - rate_limit_buckets.updated_at) * :per_second)"
+        )
+        (wait,) = connection.execute(
+            "INSERT INTO rate_limit_buckets (key, tokens, updated_at, wait, expires_at) "
+            "VALUES (:key, :capacity - 1, :now, 0, :expires_at) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            f"tokens = {refilled} - ({refilled} >= 1), "
+            f"wait = CASE WHEN {refilled} >= 1 THEN 0 "
+            f"ELSE (1 - {refilled}) / :per_second END, "
+            "updated_at = :now, expires_at = :expires_at "
+            "RETURNING wait",
+            {
+                "key": key, "capacity": capacity, "per_second": per_second, "now": now,
+                "expires_at": now + capacity / per_second,
+            }
+        ).fetchone()
+
+        self._takes += 1
+        if self._takes % self.PRUNE_EVERY == 0:
+            connection.execute("DELETE FROM rate_limit_buckets WHERE expires_at < ?", (now,))
+        return wait
+
+    async def take(self, key: str, capacity: int, per_second: float) -> float:
+        return await run_in_threadpool(self._take, key, capacity, per_second)
+
+def store_from_url(url: str) -> RateLimitStore:
+    backend = url.split(":", 1)[0]
+    if backend == "memory":
+        return MemoryStore(settings.RATE_LIMIT_MAX_KEYS)
+    if backend in ("redis", "rediss"):
+        return RedisStore(url)
+    if backend == "sqlite":
+        return SQLiteStore(make_url(url).database)
+    raise ValueError(f"Unknown rate limit store {url!r}")
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def client_address(scope) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = _header(scope, b"x-forwarded-for")
+        if forwarded:
+            # The address our proxy appended; earlier ones are client-supplied
+            return forwarded.rsplit(",", 1)[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def _user_subject(scope) -> Optional[str]:
+    authorization = _header(scope, b"authorization")
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(
+            authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    return None if subject is None else str(subject)
+
+class RateLimitMiddleware:
+    """Answers 429 for requests over their route's limit. Limits and the
+    store are read from settings on the first request."""
+
+    def __init__(self, app):
+        self.app = app
+        self.limits: Optional[Dict[str, List[RateLimit]]] = None
+        self.store: Optional[RateLimitStore] = None
+
+    def match(self, method: str, path: str) -> Optional[RateLimit]:
+        if self.limits is None:
+            self.limits = parse_limits(settings.RATE_LIMITS)
+            self.store = store_from_url(settings.RATE_LIMIT_STORE_URL)
+        for limit in self.limits.get(method, ()):
+            if limit.pattern.match(path):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        limit = self.match(scope["method"], scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        subject = _user_subject(scope) if limit.per == "user" else None
+        subject = f"user:{subject}" if subject else f"ip:{client_address(scope)}"
+        try:
+            wait = await self.store.take(limit.key(subject), limit.capacity, limit.per_second)
+        except Exception:
+            logger.warning("Rate limit store %s failed; letting the request through",
+                           self.store.name, exc_info=True)
+            registry.observe_rate_limit_error(self.store.name)
+            wait = 0.0
+
+        if wait <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        registry.observe_rate_limited(limit.method, limit.template, limit.per)
+        scope[ROUTE_TEMPLATE_KEY] = limit.template
+        response = JSONResponse(
+            {"detail": "Too many requests"},
+            status_code=429,
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+        await response(scope, receive, send)
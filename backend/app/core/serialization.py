@@ -0,0 +1,40 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional; pydantic-core's encoder is used instead
+    orjson = None
+
+@lru_cache(maxsize=None)
+def type_adapter(tp: Any) -> TypeAdapter:
+    """Building a TypeAdapter compiles a validator and serializer; reuse them"""
+    return TypeAdapter(tp)
+
+def dumps(content: Any) -> bytes:
+    """Encode plain Python data (dicts, lists, datetimes, enums) to JSON,
+    formatting datetimes the way pydantic does"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return type_adapter(Any).dump_json(content)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for payloads that are already plain data (or encoded
+    bytes), skipping FastAPI's response-model validation and
+    jsonable_encoder pass"""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+def json_rows(rows: List[Dict[str, Any]], response: Optional[Any] = None) -> FastJSONResponse:
+    """Render `rows` directly, keeping headers (e.g. X-Next-Cursor) set on
+    the endpoint's injected `response`"""
+    headers: Optional[Mapping[str, str]] = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(rows, headers=headers)
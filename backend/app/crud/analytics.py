@@ -0,0 +1,265 @@
+"""Incident analytics served from the incident_rollups table.
+
+Every incident contributes, per granularity, to the bucket it was created
+in and, once resolved, to the bucket it was resolved in. Writes that change
+an incident take away its old contribution and add the new one, so the
+rollups stay exact without re-reading history; reads only touch the rows of
+the requested buckets.
+
+Backfill (or repair) the rollups from the incidents table with
+
+    python -m app.crud.analytics
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+# get_incident_analytics has a `status` filter parameter
+from fastapi import status as http_status
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..core.authz import AuthContext
+from ..core.config import settings
+from ..models.incident import Incident, IncidentRollup
+from ..schemas import analytics as schemas
+
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+DEFAULT_WINDOWS = {"hour": timedelta(hours=48), "day": timedelta(days=30)}
+RESOLVED_STATUSES = ("resolved", "closed")
+
+ROLLUP_KEY = ("organization_id", "granularity", "bucket_start", "priority", "status", "type")
+ROLLUP_MEASURES = ("created_count", "resolved_count", "resolve_seconds")
+
+# The incident columns a contribution is computed from
+INCIDENT_STATE = (
+    Incident.organization_id, Incident.priority, Incident.status, Incident.type,
+    Incident.created_at, Incident.resolved_at
+)
+
+# rollup key -> [created_count, resolved_count, resolve_seconds]
+Deltas = Dict[Tuple[Any, ...], List[float]]
+
+def _utc(value: datetime) -> datetime:
+    """Naive UTC, the form timestamps are stored and bucketed in"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    value = _utc(value).replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if granularity == "day" else value
+
+def _name(value: Any) -> str:
+    # Enum members arrive from validated input, plain strings from the database
+    return getattr(value, "value", value)
+
+def contribution(incident: Any) -> Deltas:
+    """What `incident` (an Incident or a row of INCIDENT_STATE) adds to the
+    rollups"""
+    deltas: Deltas = {}
+    if incident.created_at is None:
+        return deltas
+    dimensions = (_name(incident.priority), _name(incident.status), _name(incident.type))
+    resolved = (
+        incident.resolved_at is not None
+        and _name(incident.status) in RESOLVED_STATUSES
+    )
+    for granularity in GRANULARITIES:
+        key = (incident.organization_id, granularity,
+               bucket_start(incident.created_at, granularity)) + dimensions
+        deltas.setdefault(key, [0, 0, 0.0])[0] += 1
+        if resolved:
+            key = (incident.organization_id, granularity,
+                   bucket_start(incident.resolved_at, granularity)) + dimensions
+            seconds = (_utc(incident.resolved_at) - _utc(incident.created_at)).total_seconds()
+            measures = deltas.setdefault(key, [0, 0, 0.0])
+            measures[1] += 1
+            measures[2] += max(seconds, 0.0)
+    return deltas
+
+def merge(deltas: Deltas, other: Deltas, sign: int = 1) -> Deltas:
+    for key, measures in other.items():
+        total = deltas.setdefault(key, [0, 0, 0.0])
+        for index, value in enumerate(measures):
+            total[index] += sign * value
+    return deltas
+
+def apply_deltas(db: Session, deltas: Deltas) -> None:
+    """Add `deltas` to the rollups in the caller's transaction"""
+    rows = [
+        {**dict(zip(ROLLUP_KEY, key)), **dict(zip(ROLLUP_MEASURES, measures))}
+        for key, measures in deltas.items() if any(measures)
+    ]
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(IncidentRollup)
+        db.execute(insert.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEY),
+            set_={
+                name: getattr(IncidentRollup, name) + getattr(insert.excluded, name)
+                for name in ROLLUP_MEASURES
+            }
+        ), rows)
+        return
+
+    for row in rows:
+        result = db.execute(
+            update(IncidentRollup)
+            .where(*[getattr(IncidentRollup, name) == row[name] for name in ROLLUP_KEY])
+            .values({
+                name: getattr(IncidentRollup, name) + row[name] for name in ROLLUP_MEASURES
+            })
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.add(IncidentRollup(**row))
+    db.flush()
+
+def record_incidents(db: Session, incident_ids: Sequence[int]) -> None:
+    """Count newly inserted incidents (flushed, not yet committed)"""
+    if not incident_ids:
+        return
+    deltas: Deltas = {}
+    for row in db.query(*INCIDENT_STATE).filter(Incident.id.in_(incident_ids)):
+        merge(deltas, contribution(row))
+    apply_deltas(db, deltas)
+
+def record_change(db: Session, before: Deltas, incident: Incident) -> None:
+    """Move an updated incident from its `before` contribution (taken
+    before the change) to its current one"""
+    apply_deltas(db, merge(contribution(incident), before, sign=-1))
+
+def rebuild_incident_rollups(db: Session, organization_id: Optional[int] = None) -> int:
+    """Recompute the rollups of one organization (or all of them) from the
+    incidents table. Does not commit; returns the number of rollup rows."""
+    existing = db.query(IncidentRollup)
+    incidents = db.query(*INCIDENT_STATE)
+    if organization_id is not None:
+        existing = existing.filter(IncidentRollup.organization_id == organization_id)
+        incidents = incidents.filter(Incident.organization_id == organization_id)
+    existing.delete(synchronize_session=False)
+
+    deltas: Deltas = {}
+    for row in incidents.yield_per(5000):
+        merge(deltas, contribution(row))
+    apply_deltas(db, deltas)
+    return len(deltas)
+
+class _Breakdown:
+    """Running sums over rollup rows"""
+
+    def __init__(self):
+        self.created = 0
+        self.resolved = 0
+        self.resolve_seconds = 0.0
+        self.counts = {"priority": {}, "status": {}, "type": {}}
+
+    def add(self, row: IncidentRollup) -> None:
+        self.created += row.created_count
+        self.resolved += row.resolved_count
+        self.resolve_seconds += row.resolve_seconds
+        if row.created_count:
+            for dimension, counts in self.counts.items():
+                value = getattr(row, dimension)
+                counts[value] = counts.get(value, 0) + row.created_count
+
+    def fields(self) -> Dict[str, Any]:
+        return {
+            "created": self.created,
+            "resolved": self.resolved,
+            "mean_time_to_resolve_seconds": (
+                round(self.resolve_seconds / self.resolved, 3) if self.resolved else None
+            ),
+            "by_priority": self.counts["priority"],
+            "by_status": self.counts["status"],
+            "by_type": self.counts["type"],
+        }
+
+def get_incident_analytics(
+    db: Session,
+    organization_id: int,
+    auth: AuthContext,
+    granularity: str = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    priority: Optional[str] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None
+) -> schemas.IncidentAnalytics:
+    """Incident counts and mean time to resolve per bucket in [since, until),
+    read from the rollups alone"""
+    if not auth.is_org_member(organization_id):
+        raise HTTPException(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this organization's analytics"
+        )
+
+    granularity = _name(granularity)
+    step = GRANULARITIES[granularity]
+    until = _utc(until) if until else datetime.utcnow()
+    since = _utc(since) if since else until - DEFAULT_WINDOWS[granularity]
+    first = bucket_start(since, granularity)
+    if since >= until:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail="`since` must be before `until`"
+        )
+    if (until - first) / step > settings.ANALYTICS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.ANALYTICS_MAX_BUCKETS} {granularity} buckets per request"
+        )
+
+    query = db.query(IncidentRollup).filter(
+        IncidentRollup.organization_id == organization_id,
+        IncidentRollup.granularity == granularity,
+        IncidentRollup.bucket_start >= first,
+        IncidentRollup.bucket_start < until
+    )
+    if priority:
+        query = query.filter(IncidentRollup.priority == priority)
+    if status:
+        query = query.filter(IncidentRollup.status == status)
+    if type:
+        query = query.filter(IncidentRollup.type == type)
+
+    rows_by_bucket: Dict[datetime, List[IncidentRollup]] = {}
+    for row in query.all():
+        rows_by_bucket.setdefault(_utc(row.bucket_start), []).append(row)
+
+    totals = _Breakdown()
+    buckets = []
+    start = first
+    while start < until:
+        bucket = _Breakdown()
+        for row in rows_by_bucket.get(start, ()):
+            bucket.add(row)
+            totals.add(row)
+        buckets.append(schemas.IncidentAnalyticsBucket(bucket_start=start, **bucket.fields()))
+        start += step
+
+    return schemas.IncidentAnalytics(
+        organization_id=organization_id,
+        granularity=granularity,
+        since=first,
+        until=until,
+        totals=schemas.IncidentBreakdown(**totals.fields()),
+        buckets=buckets
+    )
+
+if __name__ == "__main__":
+    # Backfill: python -m app.crud.analytics
+    from ..db.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        count = rebuild_incident_rollups(db)
+        db.commit()
+        print(f"Rebuilt {count} incident rollup rows")
+    finally:
+        db.close()
@@ -1,17 +1,144 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import Optional, List
+from sqlalchemy import Float, and_, column, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+from typing import Any, FrozenSet, Optional, List, Sequence
 from fastapi import HTTPException, status
+# For functions whose `status` parameter (a filter) shadows the module
+from fastapi import status as http_status
 from datetime import datetime
+from pydantic import ValidationError
 
-from ..models.incident import Incident
-from ..models.team import TeamMembership
-from ..models.organization import OrganizationMembership
+from ..models.incident import Incident, IncidentUpdate
+from ..models.organization import Organization
+from ..models.resource import ResourceAssignment
+from ..models.team import Team
+from ..models.user import User
 from ..schemas import incident as schemas
+from ..core.authz import AuthContext, load_auth_context
+from ..core.events import event_bus
+from ..db import search, spatial
+from ..db.engine import insert_returning_ids
+from . import analytics, versioning
+from .pagination import cursor_for, paginate
+from .projection import Projection
+from .stats import bump_organization_stats, is_active_incident
+
+# Keyset orderings; the trailing id keeps them total
+INCIDENT_ORDER = (Incident.created_at, Incident.id)
+INCIDENT_UPDATE_ORDER = (IncidentUpdate.created_at, IncidentUpdate.id)
+# Search results are ordered by score, best first; the score expression
+# depends on the backend, so this only names the cursor's keys
+INCIDENT_SEARCH_ORDER = (column("score", Float), Incident.id)
+
+# Incident fields that are part of the search document
+SEARCHABLE_FIELDS = {"title", "description", "location_description"}
+
+# List reads select these columns as plain rows
+INCIDENT_PROJECTION = Projection(Incident, schemas.IncidentSummary, INCIDENT_ORDER)
+INCIDENT_UPDATE_PROJECTION = Projection(
+    IncidentUpdate, schemas.IncidentUpdateRead, INCIDENT_UPDATE_ORDER
+)
 
 def get_incident(db: Session, incident_id: int) -> Optional[Incident]:
+    """The incident row alone; its updates are paged separately"""
     return db.query(Incident).filter(Incident.id == incident_id).first()
 
+def get_incident_etag(db: Session, incident_id: int) -> Optional[str]:
+    """ETag of the incident detail view, read with one indexed query: the
+    incident's and its team's versions, its newest update, how many
+    resources were assigned and returned, and when its organization and
+    creator (whose names it shows) were last updated. None when the
+    incident does not exist."""
+    newest_update = db.query(func.max(IncidentUpdate.id)).filter(
+        IncidentUpdate.incident_id == incident_id
+    ).scalar_subquery()
+    assigned = db.query(func.count(ResourceAssignment.id)).filter(
+        ResourceAssignment.incident_id == incident_id
+    ).scalar_subquery()
+    returned = db.query(func.count(ResourceAssignment.returned_at)).filter(
+        ResourceAssignment.incident_id == incident_id
+    ).scalar_subquery()
+    row = (
+        db.query(
+            Incident.version, Team.version, newest_update, assigned, returned,
+            Organization.updated_at, User.updated_at
+        )
+        .join(Organization, Incident.organization_id == Organization.id)
+        .join(User, Incident.created_by_id == User.id)
+        .outerjoin(Team, Incident.assigned_team_id == Team.id)
+        .filter(Incident.id == incident_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return versioning.etag(*row)
+
+def get_incident_detail(
+    db: Session,
+    incident_id: int,
+    updates_limit: int = 50
+) -> schemas.IncidentDetail:
+    """Incident with its newest updates, resource assignments and the names
+    of its organization, team and creator, in three queries regardless of
+    how many updates the incident has."""
+    row = (
+        db.query(
+            Incident, Organization.name, Team.name, User.first_name, User.last_name
+        )
+        .join(Organization, Incident.organization_id == Organization.id)
+        .join(User, Incident.created_by_id == User.id)
+        .outerjoin(Team, Incident.assigned_team_id == Team.id)
+        .filter(Incident.id == incident_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incident not found"
+        )
+    incident, organization_name, team_name, first_name, last_name = row
+
+    updates = paginate(
+        db.query(*INCIDENT_UPDATE_PROJECTION.select())
+        .filter(IncidentUpdate.incident_id == incident_id),
+        INCIDENT_UPDATE_ORDER, limit=updates_limit, descending=True
+    ).all() if updates_limit else []
+    assignments = (
+        db.query(ResourceAssignment)
+        .filter(ResourceAssignment.incident_id == incident_id)
+        .order_by(ResourceAssignment.id)
+        .all()
+    )
+
+    return schemas.IncidentDetail(
+        id=incident.id,
+        title=incident.title,
+        description=incident.description,
+        type=incident.type,
+        priority=incident.priority,
+        status=incident.status,
+        latitude=incident.latitude,
+        longitude=incident.longitude,
+        location_description=incident.location_description,
+        organization_id=incident.organization_id,
+        created_by_id=incident.created_by_id,
+        assigned_team_id=incident.assigned_team_id,
+        created_at=incident.created_at,
+        updated_at=incident.updated_at,
+        resolved_at=incident.resolved_at,
+        version=incident.version,
+        updates=INCIDENT_UPDATE_PROJECTION.as_dicts(updates),
+        updates_next_cursor=(
+            cursor_for(updates[-1], INCIDENT_UPDATE_ORDER)
+            if len(updates) >= updates_limit > 0 else None
+        ),
+        assigned_resources=assignments,
+        organization_name=organization_name,
+        team_name=team_name,
+        creator_name=f"{first_name} {last_name}"
+    )
+
 def get_incidents(
     db: Session,
     organization_id: Optional[int] = None,
@@ -19,9 +146,17 @@ def get_incidents(
     status: Optional[str] = None,
     priority: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
-) -> List[Incident]:
-    query = db.query(Incident)
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None
+) -> List[Any]:
+    """A page of incidents as rows of the selected columns, newest first.
+
+    `fields` narrows the SELECT to those columns (default: every
+    IncidentSummary field); INCIDENT_PROJECTION.as_dicts turns the rows
+    into response payloads.
+    """
+    query = db.query(*INCIDENT_PROJECTION.select(fields))
     
     if organization_id:
         query = query.filter(Incident.organization_id == organization_id)
@@ -32,23 +167,133 @@ def get_incidents(
     if priority:
         query = query.filter(Incident.priority == priority)
     
-    return query.order_by(Incident.created_at.desc()).offset(skip).limit(limit).all()
+    return paginate(
+        query, INCIDENT_ORDER, cursor=cursor, skip=skip, limit=limit, descending=True
+    ).all()
+
+def get_incident_updates(
+    db: Session,
+    incident_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[Any]:
+    query = db.query(*INCIDENT_UPDATE_PROJECTION.select()).filter(
+        IncidentUpdate.incident_id == incident_id
+    )
+    return paginate(
+        query, INCIDENT_UPDATE_ORDER, cursor=cursor, skip=skip, limit=limit, descending=True
+    ).all()
+
+def search_incidents(
+    db: Session,
+    q: str,
+    auth: AuthContext,
+    organization_id: Optional[int] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> List[Any]:
+    """A page of incidents matching `q`, best match first, as rows of the
+    IncidentSummary columns followed by `score` and `snippet`.
+
+    Only organizations the user is an active member of are searched.
+    """
+    if organization_id is not None and not auth.is_org_member(organization_id):
+        raise HTTPException(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to search this organization's incidents"
+        )
+    organization_ids = (
+        [organization_id] if organization_id is not None else auth.member_org_ids()
+    )
+    search_query = search.SearchQuery(db, q)
+    if search_query.is_empty or not organization_ids:
+        return []
+
+    score = search_query.score().label("score")
+    query = search_query.join(
+        db.query(
+            *INCIDENT_PROJECTION.select(), score,
+            search_query.snippet(Incident).label("snippet")
+        ),
+        Incident
+    ).filter(Incident.organization_id.in_(organization_ids))
+
+    if status:
+        query = query.filter(Incident.status == status)
+    if priority:
+        query = query.filter(Incident.priority == priority)
+
+    return paginate(
+        query, (score, Incident.id), cursor=cursor, limit=limit, descending=True
+    ).all()
+
+def get_nearby_incidents(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    auth: AuthContext,
+    organization_id: Optional[int] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: int = 50
+) -> List[schemas.IncidentNearby]:
+    """Incidents within `radius_km` of a point, nearest first, from the
+    organizations the user is an active member of"""
+    if organization_id is not None and not auth.is_org_member(organization_id):
+        raise HTTPException(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this organization's incidents"
+        )
+    organization_ids = (
+        [organization_id] if organization_id is not None else auth.member_org_ids()
+    )
+    if not organization_ids:
+        return []
+
+    criteria = [spatial.not_indexed(Incident.organization_id).in_(organization_ids)]
+    if status:
+        criteria.append(Incident.status == status)
+    if type:
+        criteria.append(Incident.type == type)
+
+    def candidates(search_km: float) -> List[Any]:
+        return spatial.filter_within_box(
+            db.query(Incident.id, Incident.latitude, Incident.longitude), Incident,
+            spatial.incidents_rtree, latitude, longitude, search_km
+        ).filter(*criteria).all()
+
+    # Distances are computed over bare coordinates; only the winners are loaded
+    nearest = spatial.nearest(candidates, latitude, longitude, radius_km, limit)
+    if not nearest:
+        return []
+    ids = [incident_id for incident_id, _ in nearest]
+    incidents = {incident.id: incident for incident in db.query(Incident).filter(Incident.id.in_(ids))}
+
+    results = []
+    for incident_id, distance in nearest:
+        incident = incidents.get(incident_id)
+        if incident is None:
+            # Deleted since the distance query
+            continue
+        item = schemas.IncidentNearby.model_validate(incident)
+        item.distance_km = round(distance, 3)
+        results.append(item)
+    return results
 
 def create_incident(
     db: Session,
     incident: schemas.IncidentCreate,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None
 ) -> Incident:
-    # Verify user is part of the organization
-    is_member = db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == incident.organization_id,
-            OrganizationMembership.user_id == user_id,
-            OrganizationMembership.status == 'active'
-        )
-    ).first()
+    auth = auth or load_auth_context(db, user_id)
 
-    if not is_member:
+    # Verify user is part of the organization
+    if not auth.is_org_member(incident.organization_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to create incidents in this organization"
@@ -59,16 +304,121 @@ def create_incident(
         created_by_id=user_id
     )
     db.add(db_incident)
+    db.flush()
+    search.reindex_incidents(db, [db_incident.id])
+    analytics.record_incidents(db, [db_incident.id])
+    # New incidents start out open
+    bump_organization_stats(
+        db, incident.organization_id, active_incidents=1, incident_changes=1
+    )
     db.commit()
     db.refresh(db_incident)
+    db.refresh(db_incident, ["updates"])
+    event_bus.publish(
+        "incident.created", db_incident.organization_id, db_incident.assigned_team_id,
+        db_incident, schema=schemas.Incident
+    )
     return db_incident
 
+def create_incidents_bulk(
+    db: Session,
+    rows: Sequence[Any],
+    user_id: int,
+    auth: Optional[AuthContext] = None,
+    chunk_size: int = 500
+) -> schemas.IncidentBulkResponse:
+    """Validate and insert many incidents, returning a result per row.
+
+    Rows are dicts or raw JSON documents (NDJSON lines). Each chunk is
+    inserted with one executemany and committed on its own, so a failure
+    only loses that chunk; invalid or unauthorized rows are reported and
+    skipped without affecting the rest.
+    """
+    auth = auth or load_auth_context(db, user_id)
+    response = schemas.IncidentBulkResponse()
+    allowed_orgs = {}
+
+    for start in range(0, len(rows), chunk_size):
+        valid = []
+        for index, raw in enumerate(rows[start:start + chunk_size], start):
+            try:
+                if isinstance(raw, (str, bytes)):
+                    incident = schemas.IncidentCreate.model_validate_json(raw)
+                else:
+                    incident = schemas.IncidentCreate.model_validate(raw)
+            except ValidationError as exc:
+                response.results.append(schemas.IncidentBulkResult(
+                    index=index,
+                    error=exc.errors(include_url=False, include_context=False)
+                ))
+                continue
+
+            org_id = incident.organization_id
+            if org_id not in allowed_orgs:
+                allowed_orgs[org_id] = auth.is_org_member(org_id)
+            if not allowed_orgs[org_id]:
+                response.results.append(schemas.IncidentBulkResult(
+                    index=index,
+                    error="Not authorized to create incidents in this organization"
+                ))
+                continue
+
+            valid.append((index, {**incident.model_dump(), "created_by_id": user_id}))
+
+        if not valid:
+            continue
+
+        created_by_org = {}
+        for _, values in valid:
+            org_id = values["organization_id"]
+            created_by_org[org_id] = created_by_org.get(org_id, 0) + 1
+
+        try:
+            ids = insert_returning_ids(db, Incident, [values for _, values in valid])
+            search.reindex_incidents(db, ids)
+            analytics.record_incidents(db, ids)
+            for org_id, count in created_by_org.items():
+                bump_organization_stats(
+                    db, org_id, active_incidents=count, incident_changes=count
+                )
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            response.results.extend(
+                schemas.IncidentBulkResult(index=index, error="Database error")
+                for index, _ in valid
+            )
+            continue
+
+        response.results.extend(
+            schemas.IncidentBulkResult(index=index, id=incident_id)
+            for (index, _), incident_id in zip(valid, ids)
+        )
+
+        # One event per organization and chunk rather than per row
+        ids_by_org = {}
+        for (_, values), incident_id in zip(valid, ids):
+            ids_by_org.setdefault(values["organization_id"], []).append(incident_id)
+        for org_id, incident_ids in ids_by_org.items():
+            event_bus.publish(
+                "incident.bulk_created", org_id, None, {"ids": incident_ids}
+            )
+
+    response.results.sort(key=lambda result: result.index)
+    response.created = sum(1 for result in response.results if result.id is not None)
+    response.failed = len(response.results) - response.created
+    return response
+
 def update_incident(
     db: Session,
     incident_id: int,
     incident_update: schemas.IncidentUpdate,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None,
+    expected_version: Optional[FrozenSet[int]] = None
 ) -> Incident:
+    """Apply `incident_update`; with `expected_version` (from If-Match),
+    only if the incident still has one of those versions"""
     db_incident = get_incident(db, incident_id)
     if not db_incident:
         raise HTTPException(
@@ -76,22 +426,12 @@ def update_incident(
             detail="Incident not found"
         )
 
-    # Check if user is authorized (team member, team leader, or org admin)
+    # Check if user is authorized (creator, team member, or org admin)
+    auth = auth or load_auth_context(db, user_id)
     is_authorized = (
         db_incident.created_by_id == user_id or
-        db.query(TeamMembership).filter(
-            and_(
-                TeamMembership.team_id == db_incident.assigned_team_id,
-                TeamMembership.user_id == user_id
-            )
-        ).first() or
-        db.query(OrganizationMembership).filter(
-            and_(
-                OrganizationMembership.organization_id == db_incident.organization_id,
-                OrganizationMembership.user_id == user_id,
-                OrganizationMembership.role == 'admin'
-            )
-        ).first()
+        auth.is_team_member(db_incident.assigned_team_id) or
+        auth.is_org_admin(db_incident.organization_id)
     )
 
     if not is_authorized:
@@ -99,6 +439,7 @@ def update_incident(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update this incident"
         )
+    versioning.check_version(db_incident, expected_version, "Incident")
 
     update_data = incident_update.model_dump(exclude_unset=True)
     
@@ -106,9 +447,71 @@ def update_incident(
     if update_data.get('status') == 'resolved':
         update_data['resolved_at'] = datetime.utcnow()
 
+    active_delta = 0
+    if 'status' in update_data:
+        was_active = is_active_incident(db_incident.status)
+        now_active = is_active_incident(update_data['status'])
+        active_delta = int(now_active) - int(was_active)
+
+    rollup_before = analytics.contribution(db_incident)
     for field, value in update_data.items():
         setattr(db_incident, field, value)
+    try:
+        db.flush()
+    except StaleDataError:
+        # Updated by someone else since it was read above
+        db.rollback()
+        raise versioning.conflict("Incident")
+    bump_organization_stats(
+        db, db_incident.organization_id,
+        active_incidents=active_delta, incident_changes=int(bool(update_data))
+    )
+    analytics.record_change(db, rollup_before, db_incident)
 
+    if SEARCHABLE_FIELDS.intersection(update_data):
+        search.reindex_incidents(db, [incident_id])
     db.commit()
     db.refresh(db_incident)
-    return db_incident 
\ No newline at end of file
+    event_bus.publish(
+        "incident.updated", db_incident.organization_id, db_incident.assigned_team_id,
+        db_incident, schema=schemas.IncidentSummary
+    )
+    return db_incident
+
+def create_incident_update(
+    db: Session,
+    incident_id: int,
+    user_id: int,
+    update_in: schemas.IncidentUpdateCreate,
+    auth: Optional[AuthContext] = None
+) -> IncidentUpdate:
+    incident = db.query(Incident).filter(Incident.id == incident_id).first()
+    if not incident:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incident not found"
+        )
+
+    organization_id, team_id = incident.organization_id, incident.assigned_team_id
+    auth = auth or load_auth_context(db, user_id)
+    if not auth.is_org_member(organization_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to update this incident"
+        )
+
+    db_update = IncidentUpdate(
+        **update_in.model_dump(exclude={"incident_id"}),
+        incident_id=incident_id,
+        user_id=user_id
+    )
+    db.add(db_update)
+    db.flush()
+    search.reindex_incidents(db, [incident_id])
+    db.commit()
+    db.refresh(db_update)
+    event_bus.publish(
+        "incident_update.created", organization_id, team_id,
+        db_update, schema=schemas.IncidentUpdateRead
+    )
+    return db_update 
\ No newline at end of file
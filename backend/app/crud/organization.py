@@ -1,95 +1,114 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import Optional, List
+from sqlalchemy import and_, update
+from typing import Optional, List, Tuple
 from fastapi import HTTPException, status
 
-from ..models.organization import Organization, OrganizationMembership
+from ..models.organization import Organization, OrganizationMembership, OrganizationStats
 from ..models.user import User
 from ..models.team import Team
-from ..models.resource import Resource
-from ..models.incident import Incident
 from ..schemas import organization as schemas
+from ..core.authz import AuthContext, load_auth_context
+from .pagination import cursor_for, encode_cursor, paginate
+from .stats import COUNTS, bump_organization_stats, organization_counts
+from .team import TEAM_ORDER
 
-def get_organization(db: Session, org_id: int, user_id: int) -> Optional[schemas.OrganizationDetail]:
-    """Get organization details with permission check"""
-    # Get organization with related data
-    org = (
-        db.query(Organization)
+MEMBER_ORDER = (OrganizationMembership.user_id,)
+
+def _get_visible_organization(
+    db: Session,
+    org_id: int,
+    user_id: int,
+    auth: Optional[AuthContext] = None
+) -> Tuple[Organization, Optional[OrganizationStats]]:
+    """Load an organization with its stats row, checking the caller may
+    see it (public org or active member)"""
+    row = (
+        db.query(Organization, OrganizationStats)
+        .outerjoin(OrganizationStats, OrganizationStats.organization_id == Organization.id)
         .filter(Organization.id == org_id)
         .first()
     )
 
-    if not org:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Organization not found"
         )
 
-    # Check if user has access (public org or user is a member)
+    org, stats = row
     if org.visibility != 'public':
-        is_member = db.query(OrganizationMembership).filter(
-            and_(
-                OrganizationMembership.organization_id == org_id,
-                OrganizationMembership.user_id == user_id,
-                OrganizationMembership.status == 'active'
-            )
-        ).first()
-        
-        if not is_member:
+        auth = auth or load_auth_context(db, user_id)
+        if not auth.is_org_member(org_id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not authorized to view this organization"
             )
+    return org, stats
 
-    # Get members with their roles
-    members = (
-        db.query(User, OrganizationMembership)
+def get_organization_members(
+    db: Session,
+    org_id: int,
+    user_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    auth: Optional[AuthContext] = None,
+    check_access: bool = True
+) -> List[schemas.UserWithOrgRole]:
+    """Page through the active members of an organization by user id"""
+    if check_access:
+        _get_visible_organization(db, org_id, user_id, auth=auth)
+
+    query = (
+        db.query(User, OrganizationMembership.role)
         .join(OrganizationMembership, User.id == OrganizationMembership.user_id)
         .filter(
             OrganizationMembership.organization_id == org_id,
             OrganizationMembership.status == 'active'
         )
-        .all()
     )
 
-    # Transform members into the expected format
-    transformed_members = []
-    for user, membership in members:
-        member_dict = schemas.UserWithOrgRole(
+    return [
+        schemas.UserWithOrgRole(
             id=user.id,
             email=user.email,
             first_name=user.first_name,
             last_name=user.last_name,
             is_active=user.is_active,
             created_at=user.created_at,
-            organization_role=membership.role
+            organization_role=role
         )
-        transformed_members.append(member_dict)
+        for user, role in paginate(query, MEMBER_ORDER, cursor=cursor, limit=limit)
+    ]
 
-    # Get teams
-    teams = (
-        db.query(Team)
-        .filter(Team.organization_id == org_id)
-        .all()
-    )
+def get_organization(
+    db: Session,
+    org_id: int,
+    user_id: int,
+    auth: Optional[AuthContext] = None,
+    members_limit: int = 50,
+    teams_limit: int = 50
+) -> Optional[schemas.OrganizationDetail]:
+    """Get organization details with permission check.
 
-    # Get counts
-    member_count = len(members)
-    team_count = len(teams)
-    resource_count = (
-        db.query(Resource)
-        .filter(Resource.organization_id == org_id)
-        .count()
-    )
-    active_incidents = (
-        db.query(Incident)
-        .filter(
-            Incident.organization_id == org_id,
-            Incident.status.in_(['open', 'in_progress'])
-        )
-        .count()
+    Counts come from the organization_stats row; members and teams are the
+    first page of each, with cursors for fetching the rest.
+    """
+    org, stats = _get_visible_organization(db, org_id, user_id, auth=auth)
+    # This may run on a read replica: without a stats row, count rather than
+    # create one (the next write or the reconcile job does)
+    counts = (
+        organization_counts(db, org_id) if stats is None
+        else {name: getattr(stats, name) for name in COUNTS}
     )
 
+    members = get_organization_members(
+        db, org_id, user_id, limit=members_limit, check_access=False
+    ) if members_limit else []
+    teams = paginate(
+        db.query(Team).filter(Team.organization_id == org_id),
+        TEAM_ORDER, limit=teams_limit
+    ).all() if teams_limit else []
+
     # Create OrganizationDetail response
     return schemas.OrganizationDetail(
         id=org.id,
@@ -102,12 +121,15 @@ def get_organization(db: Session, org_id: int, user_id: int) -> Optional[schemas
         created_by_id=org.created_by_id,
         created_at=org.created_at,
         updated_at=org.updated_at,
-        members=transformed_members,
+        members=members,
         teams=teams,
-        member_count=member_count,
-        team_count=team_count,
-        resource_count=resource_count,
-        active_incidents=active_incidents
+        members_next_cursor=(
+            encode_cursor([members[-1].id]) if len(members) >= members_limit > 0 else None
+        ),
+        teams_next_cursor=(
+            cursor_for(teams[-1], TEAM_ORDER) if len(teams) >= teams_limit > 0 else None
+        ),
+        **counts
     )
 
 def get_organizations(
@@ -122,21 +144,29 @@ def get_organizations(
     1. Public
     2. User is a member of
     """
-    query = db.query(Organization).distinct()
-    
-    # Include public organizations and organizations where user is a member
-    query = query.outerjoin(OrganizationMembership).filter(
-        (Organization.visibility == 'public') |
-        (
-            (OrganizationMembership.user_id == user_id) &
-            (OrganizationMembership.status == 'active')
+    # A UNION of two index lookups (public visibility, the caller's own
+    # memberships); an OR across both would scan every organization
+    public = db.query(Organization).filter(Organization.visibility == 'public')
+    joined = (
+        db.query(Organization)
+        .join(OrganizationMembership)
+        .filter(
+            OrganizationMembership.user_id == user_id,
+            OrganizationMembership.status == 'active'
         )
     )
-    
+
     if visibility:
-        query = query.filter(Organization.visibility == visibility)
+        public = public.filter(Organization.visibility == visibility)
+        joined = joined.filter(Organization.visibility == visibility)
     
-    return query.offset(skip).limit(limit).all()
+    return (
+        public.union(joined)
+        .order_by(Organization.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
 
 def create_organization(
     db: Session, 
@@ -159,6 +189,7 @@ def create_organization(
         status='active'
     )
     db.add(membership)
+    db.add(OrganizationStats(organization_id=db_org.id, member_count=1))
     db.commit()
 
     return db_org
@@ -167,9 +198,10 @@ def update_organization(
     db: Session, 
     org_id: int, 
     org_update: schemas.OrganizationUpdate,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None
 ) -> Organization:
-    db_org = get_organization(db, org_id)
+    db_org = db.query(Organization).filter(Organization.id == org_id).first()
     if not db_org:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -177,15 +209,8 @@ def update_organization(
         )
     
     # Check if user is admin
-    is_admin = db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == org_id,
-            OrganizationMembership.user_id == user_id,
-            OrganizationMembership.role == 'admin'
-        )
-    ).first()
-
-    if not is_admin:
+    auth = auth or load_auth_context(db, user_id)
+    if not auth.is_org_admin(org_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update organization"
@@ -226,6 +251,45 @@ def add_member(
         status='pending' if role == 'member' else 'active'
     )
     db.add(membership)
+    if membership.status == 'active':
+        bump_organization_stats(db, org_id, member_count=1)
     db.commit()
     db.refresh(membership)
-    return membership 
\ No newline at end of file
+    return membership
+
+def create_membership_request(
+    db: Session,
+    org_id: int,
+    user_id: int
+) -> OrganizationMembership:
+    if not db.query(Organization.id).filter(Organization.id == org_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Organization not found"
+        )
+    return add_member(db, org_id, user_id)
+
+def approve_membership_request(
+    db: Session,
+    org_id: int,
+    user_id: int
+) -> None:
+    # Only a pending request can be approved, so the member count moves once
+    result = db.execute(
+        update(OrganizationMembership)
+        .where(
+            OrganizationMembership.organization_id == org_id,
+            OrganizationMembership.user_id == user_id,
+            OrganizationMembership.status == 'pending'
+        )
+        .values(status='active')
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No pending membership request for this user"
+        )
+
+    bump_organization_stats(db, org_id, member_count=result.rowcount)
+    db.commit() 
\ No newline at end of file
@@ -0,0 +1,110 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, String, and_, literal, or_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        values = None
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    return values
+
+def _bounds(query: Query, column, value):
+    """Return the (lowest, highest) bind values equal to a decoded cursor
+    value, so `column < lowest` and `column > highest` are strict.
+
+    SQLite stores timestamps as text, and the same instant may be written
+    as 'YYYY-MM-DD HH:MM:SS' (server defaults) or with a '.000000' suffix
+    (values bound from Python), so a whole second has two spellings.
+    """
+    if not isinstance(column.type, DateTime) or value is None:
+        return value, value
+    try:
+        value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    if query.session.get_bind().dialect.name != "sqlite":
+        return value, value
+
+    text = value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    if value.microsecond:
+        low = high = literal(text, type_=String)
+    else:
+        low, high = literal(text[:-7], type_=String), literal(text, type_=String)
+    return low, high
+
+def paginate(
+    query: Query,
+    order_by: Sequence,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    descending: bool = False
+) -> Query:
+    """Order `query` by the `order_by` columns and apply either keyset
+    pagination (when a cursor is given) or the legacy skip/limit offset.
+
+    `order_by` must end with a unique column so the ordering is total.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(order_by))
+        bounds = [
+            _bounds(query, column, value)
+            for column, value in zip(order_by, values)
+        ]
+
+        def beyond(column, low, high):
+            return column < low if descending else column > high
+
+        def equal(column, low, high):
+            return column == low if low is high else column.between(low, high)
+
+        # (a, b) < (x, y)  ==>  a < x OR (a = x AND b < y)
+        clauses = []
+        for i, column in enumerate(order_by):
+            same = [equal(order_by[j], *bounds[j]) for j in range(i)]
+            clauses.append(and_(*same, beyond(column, *bounds[i])))
+        query = query.filter(or_(*clauses))
+    elif skip:
+        query = query.offset(skip)
+
+    ordering = [column.desc() if descending else column.asc() for column in order_by]
+    return query.order_by(*ordering).limit(limit)
+
+def cursor_for(item: Any, order_by: Sequence) -> str:
+    return encode_cursor([getattr(item, column.key) for column in order_by])
+
+def set_next_cursor(
+    response: Response,
+    items: Sequence[Any],
+    limit: int,
+    order_by: Sequence
+) -> None:
+    """Expose the cursor for the page after `items`, if there may be one."""
+    if items and len(items) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_for(items[-1], order_by)
@@ -0,0 +1,43 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+class Projection:
+    """The columns behind a response schema, for list reads that select
+    plain row tuples instead of hydrating ORM objects.
+
+    `order_by` columns are always selected (after the requested ones) so the
+    page's cursor can be computed; `as_dicts` leaves them out again. Schema
+    fields without a column get the schema default.
+    """
+
+    def __init__(self, model, schema: type[BaseModel], order_by: Sequence = ()):
+        table_columns = model.__table__.columns
+        self.model = model
+        self.fields = tuple(name for name in schema.model_fields if name in table_columns)
+        self.defaults = {
+            name: field.get_default(call_default_factory=True)
+            for name, field in schema.model_fields.items()
+            if name not in table_columns
+        }
+        self.order_keys = [column.key for column in order_by]
+
+    def select(self, fields: Optional[Sequence[str]] = None) -> List[Any]:
+        """Columns to query for `fields` (default: the whole schema)"""
+        fields = list(fields or self.fields)
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown field(s): {', '.join(unknown)}"
+            )
+        fields += [key for key in self.order_keys if key not in fields]
+        return [getattr(self.model, name) for name in fields]
+
+    def as_dicts(self, rows: Sequence[Any], fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Response payloads for rows selected with `select(fields)`"""
+        if fields:
+            return [dict(zip(fields, row)) for row in rows]
+        names, defaults = self.fields, self.defaults
+        return [{**dict(zip(names, row)), **defaults} for row in rows]
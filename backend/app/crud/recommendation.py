@@ -0,0 +1,278 @@
+"""Dispatch recommendations: rank the resources that could serve an incident.
+
+Scoring runs over an in-memory columnar snapshot of every resource (NumPy
+arrays, one per column), so ranking a large fleet is a handful of vector
+operations instead of a table read. The resource write paths in
+crud.resource call `resource_snapshot.mark_dirty` after committing; the
+next ranking reloads just those rows. Writes made by other processes are
+picked up by a full reload once the snapshot is older than
+RECOMMENDATION_SNAPSHOT_MAX_AGE_SECONDS.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from ..core.authz import AuthContext
+from ..core.config import settings
+from ..db.spatial import EARTH_RADIUS_KM
+from ..models.incident import Incident
+from ..models.resource import Resource
+from ..schemas import resource as schemas
+
+RESOURCE_TYPES = tuple(Resource.__table__.c.type.type.enums)
+RESOURCE_STATUSES = tuple(Resource.__table__.c.status.type.enums)
+RESOURCE_CONDITIONS = tuple(Resource.__table__.c.condition.type.enums)
+AVAILABLE = RESOURCE_STATUSES.index("available")
+
+# How well each resource type serves each incident type (0..1); pairs not
+# listed score DEFAULT_TYPE_FIT
+TYPE_FIT = {
+    "emergency": {"vehicle": 1.0, "personnel": 1.0, "equipment": 0.8, "supply": 0.5},
+    "resource_request": {"supply": 1.0, "equipment": 0.8, "personnel": 0.6, "vehicle": 0.5},
+    "status_update": {},
+}
+DEFAULT_TYPE_FIT = 0.3
+
+CONDITION_SCORE = {"excellent": 1.0, "good": 0.8, "fair": 0.5, "poor": 0.2}
+
+# Closeness halves every DISTANCE_HALF_LIFE_KM
+DISTANCE_HALF_LIFE_KM = 25.0
+
+WEIGHTS = {
+    "distance": 0.4,
+    "type": 0.25,
+    "team": 0.15,
+    "condition": 0.1,
+    "quantity": 0.1,
+}
+
+_COLUMNS = (
+    Resource.id, Resource.organization_id, Resource.team_id, Resource.type,
+    Resource.status, Resource.condition, Resource.available_quantity,
+    Resource.latitude, Resource.longitude
+)
+
+_FIELDS = (
+    "id", "organization_id", "team_id", "type", "status", "condition",
+    "available", "latitude", "longitude"
+)
+
+def _codes(values: Iterable[Optional[str]], names: Sequence[str]) -> np.ndarray:
+    index = {name: code for code, name in enumerate(names)}
+    return np.fromiter((index.get(value, -1) for value in values), dtype=np.int8)
+
+class _Columns:
+    """One immutable version of the snapshot; patches build a new one"""
+
+    def __init__(self, rows: Sequence[Any]):
+        self.id = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self.organization_id = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+        self.team_id = np.fromiter(
+            (-1 if row[2] is None else row[2] for row in rows), dtype=np.int64, count=len(rows)
+        )
+        self.type = _codes((row[3] for row in rows), RESOURCE_TYPES)
+        self.status = _codes((row[4] for row in rows), RESOURCE_STATUSES)
+        self.condition = _codes((row[5] for row in rows), RESOURCE_CONDITIONS)
+        self.available = np.fromiter(
+            (row[6] or 0 for row in rows), dtype=np.int64, count=len(rows)
+        )
+        self.latitude = np.fromiter(
+            (np.nan if row[7] is None else row[7] for row in rows), dtype=np.float64, count=len(rows)
+        )
+        self.longitude = np.fromiter(
+            (np.nan if row[8] is None else row[8] for row in rows), dtype=np.float64, count=len(rows)
+        )
+        self.position = {int(resource_id): i for i, resource_id in enumerate(self.id)}
+
+    def patched(self, ids: Sequence[int], rows: Sequence[Any]) -> "_Columns":
+        """A copy with `rows` replacing (or added for) `ids`; ids without a
+        row were deleted and become ineligible"""
+        fresh = {row[0]: row for row in rows}
+        merged = object.__new__(_Columns)
+        for name in _FIELDS:
+            setattr(merged, name, getattr(self, name).copy())
+        merged.position = self.position
+
+        for resource_id in ids:
+            if resource_id not in fresh and resource_id in self.position:
+                merged.status[self.position[resource_id]] = -1
+
+        changed = [row for row in fresh.values() if row[0] in self.position]
+        if changed:
+            at = np.fromiter((self.position[row[0]] for row in changed), dtype=np.int64)
+            patch = _Columns(changed)
+            for name in _FIELDS:
+                getattr(merged, name)[at] = getattr(patch, name)
+
+        added = [row for row in fresh.values() if row[0] not in self.position]
+        if added:
+            patch = _Columns(added)
+            for name in _FIELDS:
+                setattr(merged, name, np.concatenate((getattr(merged, name), getattr(patch, name))))
+            merged.position = {
+                **self.position,
+                **{row[0]: len(self.id) + i for i, row in enumerate(added)}
+            }
+        return merged
+
+class ResourceSnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializes reloads so two patches cannot overwrite each other
+        self._refresh_lock = threading.Lock()
+        self._columns: Optional[_Columns] = None
+        self._loaded_at = 0.0
+        self._dirty: set = set()
+
+    def mark_dirty(self, *resource_ids: int) -> None:
+        """Reload these resources before the next ranking"""
+        with self._lock:
+            self._dirty.update(resource_ids)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._columns = None
+            self._dirty.clear()
+
+    def columns(self, db: Session) -> _Columns:
+        """The current snapshot, reloading what changed since the last call.
+        `db` must read the primary: what a replica has not caught up with yet
+        would stay in the snapshot once the dirty ids are cleared."""
+        with self._refresh_lock:
+            with self._lock:
+                columns, dirty = self._columns, self._dirty
+                self._dirty = set()
+            stale = (
+                columns is None
+                or time.monotonic() - self._loaded_at > settings.RECOMMENDATION_SNAPSHOT_MAX_AGE_SECONDS
+            )
+            if stale:
+                self._loaded_at = time.monotonic()
+                columns = _Columns(db.query(*_COLUMNS).order_by(Resource.id).all())
+            elif dirty:
+                ids = sorted(dirty)
+                columns = columns.patched(
+                    ids, db.query(*_COLUMNS).filter(Resource.id.in_(ids)).all()
+                )
+            else:
+                return columns
+            with self._lock:
+                self._columns = columns
+            return columns
+
+resource_snapshot = ResourceSnapshot()
+
+def _lookup(table: Dict[str, float], names: Sequence[str], default: float) -> np.ndarray:
+    """Score per code, indexable by an int8 code column (-1 = unknown)"""
+    return np.array([table.get(name, default) for name in names] + [default])
+
+def score_resources(
+    columns: _Columns,
+    incident: Any,
+    organization_ids: Sequence[int],
+    max_distance_km: Optional[float] = None
+) -> Dict[str, np.ndarray]:
+    """Score every eligible resource for `incident`: returns the positions
+    of eligible rows with their score and distance (NaN when either side
+    has no location)"""
+    eligible = (
+        (columns.status == AVAILABLE)
+        & (columns.available > 0)
+        & np.isin(columns.organization_id, np.asarray(organization_ids, dtype=np.int64))
+    )
+    rows = np.flatnonzero(eligible)
+
+    if incident.latitude is not None and incident.longitude is not None:
+        lat1 = np.radians(incident.latitude)
+        lat2 = np.radians(columns.latitude[rows])
+        dlat = lat2 - lat1
+        dlon = np.radians(columns.longitude[rows] - incident.longitude)
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        closeness = np.nan_to_num(0.5 ** (distance / DISTANCE_HALF_LIFE_KM), nan=0.0)
+        if max_distance_km is not None:
+            within = distance <= max_distance_km
+            rows, distance, closeness = rows[within], distance[within], closeness[within]
+    else:
+        distance = np.full(len(rows), np.nan)
+        closeness = np.zeros(len(rows))
+
+    type_fit = _lookup(TYPE_FIT.get(incident.type, {}), RESOURCE_TYPES, DEFAULT_TYPE_FIT)
+    condition = _lookup(CONDITION_SCORE, RESOURCE_CONDITIONS, 0.5)
+    team = columns.team_id[rows]
+    available = columns.available[rows]
+
+    score = (
+        WEIGHTS["distance"] * closeness
+        + WEIGHTS["type"] * type_fit[columns.type[rows]]
+        + WEIGHTS["condition"] * condition[columns.condition[rows]]
+        # More units left means the resource can also cover follow-up requests
+        + WEIGHTS["quantity"] * (1.0 - 1.0 / (1.0 + available))
+        + WEIGHTS["team"] * np.where(
+            (team == (incident.assigned_team_id or -2)), 1.0,
+            np.where(columns.organization_id[rows] == incident.organization_id, 0.5, 0.0)
+        )
+    )
+    return {"rows": rows, "score": score, "distance": distance}
+
+def top_k(score: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the `k` highest scores, best first"""
+    if k < len(score):
+        best = np.argpartition(-score, k - 1)[:k]
+    else:
+        best = np.arange(len(score))
+    return best[np.argsort(-score[best], kind="stable")]
+
+def recommend_resources(
+    db: Session,
+    incident_id: int,
+    auth: AuthContext,
+    mutual_aid_organization_ids: Sequence[int] = (),
+    max_distance_km: Optional[float] = None,
+    limit: int = 10
+) -> List[schemas.ResourceRecommendation]:
+    """The `limit` best available resources for an incident, from its own
+    organization and any `mutual_aid_organization_ids` the user belongs to"""
+    incident = db.query(
+        Incident.organization_id, Incident.assigned_team_id, Incident.type,
+        Incident.latitude, Incident.longitude
+    ).filter(Incident.id == incident_id).first()
+    if incident is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incident not found"
+        )
+
+    organization_ids = [incident.organization_id, *mutual_aid_organization_ids]
+    if not all(auth.is_org_member(org_id) for org_id in organization_ids):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to dispatch from these organizations"
+        )
+
+    columns = resource_snapshot.columns(db)
+    scored = score_resources(columns, incident, organization_ids, max_distance_km)
+    best = top_k(scored["score"], limit)
+    ids = [int(columns.id[scored["rows"][i]]) for i in best]
+    if not ids:
+        return []
+
+    resources = {
+        resource.id: resource
+        for resource in db.query(Resource).filter(Resource.id.in_(ids))
+    }
+    results = []
+    for i, resource_id in zip(best, ids):
+        resource = resources.get(resource_id)
+        if resource is None:
+            continue
+        item = schemas.ResourceRecommendation.model_validate(resource)
+        item.score = round(float(scored["score"][i]), 4)
+        distance = scored["distance"][i]
+        item.distance_km = None if np.isnan(distance) else round(float(distance), 3)
+        results.append(item)
+    return results
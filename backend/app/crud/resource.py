@@ -1,17 +1,93 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import Optional, List
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, case, update
+from typing import Any, Dict, FrozenSet, Optional, List, Sequence
 from fastapi import HTTPException, status
+# For functions whose `status` parameter (a filter) shadows the module
+from fastapi import status as http_status
 from datetime import datetime
 
+from ..models.incident import Incident
+from ..models.organization import Organization
 from ..models.resource import Resource, ResourceAssignment
-from ..models.organization import OrganizationMembership
-from ..models.team import TeamMembership
+from ..models.team import Team
 from ..schemas import resource as schemas
+from ..core.authz import AuthContext, load_auth_context
+from ..core.events import event_bus
+from ..db import spatial
+from ..db.engine import insert_returning_ids
+from . import versioning
+from .pagination import paginate
+from .projection import Projection
+from .recommendation import resource_snapshot
+from .stats import bump_organization_stats
+
+# Keyset orderings; the trailing id keeps them total
+RESOURCE_ORDER = (Resource.id,)
+ASSIGNMENT_ORDER = (ResourceAssignment.assigned_at, ResourceAssignment.id)
+
+# List reads select these columns as plain rows
+RESOURCE_PROJECTION = Projection(Resource, schemas.Resource, RESOURCE_ORDER)
+ASSIGNMENT_PROJECTION = Projection(ResourceAssignment, schemas.ResourceAssignment, ASSIGNMENT_ORDER)
 
 def get_resource(db: Session, resource_id: int) -> Optional[Resource]:
     return db.query(Resource).filter(Resource.id == resource_id).first()
 
+def get_resource_etag(db: Session, resource_id: int) -> Optional[str]:
+    """ETag of the resource detail view: the resource's version (bumped by
+    every assignment and return too) and its team's. None when the resource
+    does not exist."""
+    row = (
+        db.query(Resource.version, Team.version)
+        .outerjoin(Team, Resource.team_id == Team.id)
+        .filter(Resource.id == resource_id)
+        .first()
+    )
+    if row is None:
+        return None
+    return versioning.etag(*row)
+
+def get_resource_detail(
+    db: Session,
+    resource_id: int,
+    history_limit: int = 50
+) -> schemas.ResourceDetail:
+    """Resource with its open assignments, the newest `history_limit`
+    returned ones and the names of its organization and team"""
+    row = (
+        db.query(Resource, Organization.name, Team.name)
+        .join(Organization, Resource.organization_id == Organization.id)
+        .outerjoin(Team, Resource.team_id == Team.id)
+        .filter(Resource.id == resource_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Resource not found"
+        )
+    resource, organization_name, team_name = row
+
+    assignments = db.query(ResourceAssignment).filter(
+        ResourceAssignment.resource_id == resource_id
+    )
+    current = assignments.filter(
+        ResourceAssignment.returned_at.is_(None)
+    ).order_by(*ASSIGNMENT_ORDER).all()
+    history = assignments.filter(
+        ResourceAssignment.returned_at.is_not(None)
+    ).order_by(
+        *(column.desc() for column in ASSIGNMENT_ORDER)
+    ).limit(history_limit).all() if history_limit else []
+
+    return schemas.ResourceDetail(
+        **schemas.Resource.model_validate(resource).model_dump(),
+        current_assignments=current,
+        assignment_history=history,
+        organization_name=organization_name,
+        team_name=team_name
+    )
+
 def get_resources(
     db: Session,
     organization_id: Optional[int] = None,
@@ -19,9 +95,10 @@ def get_resources(
     status: Optional[str] = None,
     type: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
-) -> List[Resource]:
-    query = db.query(Resource)
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[Any]:
+    query = db.query(*RESOURCE_PROJECTION.select())
     
     if organization_id:
         query = query.filter(Resource.organization_id == organization_id)
@@ -32,40 +109,113 @@ def get_resources(
     if type:
         query = query.filter(Resource.type == type)
     
-    return query.offset(skip).limit(limit).all()
+    return paginate(query, RESOURCE_ORDER, cursor=cursor, skip=skip, limit=limit).all()
+
+def get_resource_assignments(
+    db: Session,
+    resource_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[Any]:
+    query = db.query(*ASSIGNMENT_PROJECTION.select()).filter(
+        ResourceAssignment.resource_id == resource_id
+    )
+    return paginate(
+        query, ASSIGNMENT_ORDER, cursor=cursor, skip=skip, limit=limit, descending=True
+    ).all()
+
+def get_nearby_resources(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    auth: AuthContext,
+    organization_id: Optional[int] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    limit: int = 50
+) -> List[schemas.ResourceNearby]:
+    """Resources within `radius_km` of a point, nearest first, from the
+    organizations the user is an active member of"""
+    if organization_id is not None and not auth.is_org_member(organization_id):
+        raise HTTPException(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this organization's resources"
+        )
+    organization_ids = (
+        [organization_id] if organization_id is not None else auth.member_org_ids()
+    )
+    if not organization_ids:
+        return []
+
+    criteria = [spatial.not_indexed(Resource.organization_id).in_(organization_ids)]
+    if status:
+        criteria.append(Resource.status == status)
+    if type:
+        criteria.append(Resource.type == type)
+
+    def candidates(search_km: float) -> List[Any]:
+        return spatial.filter_within_box(
+            db.query(Resource.id, Resource.latitude, Resource.longitude), Resource,
+            spatial.resources_rtree, latitude, longitude, search_km
+        ).filter(*criteria).all()
+
+    # Distances are computed over bare coordinates; only the winners are loaded
+    nearest = spatial.nearest(candidates, latitude, longitude, radius_km, limit)
+    if not nearest:
+        return []
+    ids = [resource_id for resource_id, _ in nearest]
+    resources = {resource.id: resource for resource in db.query(Resource).filter(Resource.id.in_(ids))}
+
+    results = []
+    for resource_id, distance in nearest:
+        resource = resources.get(resource_id)
+        if resource is None:
+            # Deleted since the distance query
+            continue
+        item = schemas.ResourceNearby.model_validate(resource)
+        item.distance_km = round(distance, 3)
+        results.append(item)
+    return results
 
 def create_resource(
     db: Session,
     resource: schemas.ResourceCreate,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None
 ) -> Resource:
-    # Verify user has admin rights in the organization
-    is_admin = db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == resource.organization_id,
-            OrganizationMembership.user_id == user_id,
-            OrganizationMembership.role == 'admin'
-        )
-    ).first()
+    auth = auth or load_auth_context(db, user_id)
 
-    if not is_admin:
+    # Verify user has admin rights in the organization
+    if not auth.is_org_admin(resource.organization_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to create resources in this organization"
         )
 
-    db_resource = Resource(**resource.model_dump())
+    # `description` is accepted by the schema but has no column; the model
+    # defaults available_quantity to the full quantity
+    db_resource = Resource(**resource.model_dump(exclude={"description"}))
     db.add(db_resource)
+    bump_organization_stats(
+        db, resource.organization_id, resource_count=1, resource_changes=1
+    )
     db.commit()
     db.refresh(db_resource)
+    resource_snapshot.mark_dirty(db_resource.id)
     return db_resource
 
 def update_resource(
     db: Session,
     resource_id: int,
     resource_update: schemas.ResourceUpdate,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None,
+    expected_version: Optional[FrozenSet[int]] = None
 ) -> Resource:
+    """Apply `resource_update`; with `expected_version` (from If-Match),
+    only if the resource still has one of those versions"""
     db_resource = get_resource(db, resource_id)
     if not db_resource:
         raise HTTPException(
@@ -74,34 +224,73 @@ def update_resource(
         )
 
     # Check if user is authorized (team leader or org admin)
-    is_authorized = (
-        db.query(TeamMembership).filter(
-            and_(
-                TeamMembership.team_id == db_resource.team_id,
-                TeamMembership.user_id == user_id,
-                TeamMembership.role == 'leader'
-            )
-        ).first() if db_resource.team_id else False
-    ) or db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == db_resource.organization_id,
-            OrganizationMembership.user_id == user_id,
-            OrganizationMembership.role == 'admin'
-        )
-    ).first()
-
-    if not is_authorized:
+    auth = auth or load_auth_context(db, user_id)
+    if not auth.can_lead(db_resource.team_id, db_resource.organization_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update this resource"
         )
 
+    versioning.check_version(db_resource, expected_version, "Resource")
+    loaded_version = db_resource.version
+
     update_data = resource_update.model_dump(exclude_unset=True)
+    update_data.pop("description", None)
+    new_quantity = update_data.pop("quantity", None)
+
     for field, value in update_data.items():
         setattr(db_resource, field, value)
+    try:
+        db.flush()
+    except StaleDataError:
+        # Updated by someone else since it was read above
+        db.rollback()
+        raise versioning.conflict("Resource")
 
+    # Shift the availability ledger by the change in total quantity, refusing
+    # to drop below what is currently assigned out
+    if new_quantity is not None:
+        result = db.execute(
+            update(Resource)
+            .where(
+                Resource.id == resource_id,
+                Resource.version == db_resource.version,
+                Resource.quantity - Resource.available_quantity <= new_quantity
+            )
+            .values(
+                quantity=new_quantity,
+                available_quantity=Resource.available_quantity + (new_quantity - Resource.quantity),
+                status=case(
+                    (
+                        and_(
+                            Resource.status == 'in_use',
+                            Resource.available_quantity + (new_quantity - Resource.quantity) > 0
+                        ),
+                        'available'
+                    ),
+                    else_=Resource.status
+                ),
+                version=Resource.version + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.rollback()
+            current_version = db.query(Resource.version).filter(
+                Resource.id == resource_id
+            ).scalar()
+            if current_version != loaded_version:
+                raise versioning.conflict("Resource")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Quantity cannot be lower than the units currently assigned"
+            )
+
+    if update_data or new_quantity is not None:
+        bump_organization_stats(db, db_resource.organization_id, resource_changes=1)
     db.commit()
     db.refresh(db_resource)
+    resource_snapshot.mark_dirty(resource_id)
     return db_resource
 
 def assign_resource(
@@ -109,7 +298,8 @@ def assign_resource(
     resource_id: int,
     incident_id: int,
     quantity: int,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None
 ) -> ResourceAssignment:
     resource = get_resource(db, resource_id)
     if not resource:
@@ -119,46 +309,51 @@ def assign_resource(
         )
 
     # Check if user is authorized (team leader, dispatcher, or org admin)
-    is_authorized = (
-        db.query(TeamMembership).filter(
-            and_(
-                TeamMembership.team_id == resource.team_id,
-                TeamMembership.user_id == user_id,
-                TeamMembership.role.in_(['leader', 'dispatcher'])
-            )
-        ).first() if resource.team_id else False
-    ) or db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == resource.organization_id,
-            OrganizationMembership.user_id == user_id,
-            OrganizationMembership.role == 'admin'
-        )
-    ).first()
-
-    if not is_authorized:
+    organization_id, team_id = resource.organization_id, resource.team_id
+    auth = auth or load_auth_context(db, user_id)
+    if not auth.can_dispatch(team_id, organization_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to assign this resource"
         )
 
-    # Check if resource has enough quantity available
-    available_quantity = resource.quantity
-    current_assignments = db.query(ResourceAssignment).filter(
-        and_(
-            ResourceAssignment.resource_id == resource_id,
-            ResourceAssignment.returned_at.is_(None)
+    if quantity <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Quantity must be positive"
         )
-    ).all()
-    
-    for assignment in current_assignments:
-        available_quantity -= assignment.quantity
 
-    if quantity > available_quantity:
+    # Take the units off the ledger only if they are still available; the
+    # check and decrement are one statement, so concurrent dispatchers cannot
+    # both pass the check. The resource goes in_use once fully assigned.
+    result = db.execute(
+        update(Resource)
+        .where(
+            Resource.id == resource_id,
+            Resource.available_quantity >= quantity
+        )
+        .values(
+            available_quantity=Resource.available_quantity - quantity,
+            status=case(
+                (Resource.available_quantity == quantity, 'in_use'),
+                else_=Resource.status
+            ),
+            version=Resource.version + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        available_quantity = db.query(Resource.available_quantity).filter(
+            Resource.id == resource_id
+        ).scalar()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Not enough quantity available. Only {available_quantity} units available"
         )
 
+    bump_organization_stats(db, organization_id, resource_changes=1)
+
     # Create assignment
     assignment = ResourceAssignment(
         resource_id=resource_id,
@@ -166,19 +361,125 @@ def assign_resource(
         quantity=quantity
     )
     db.add(assignment)
-
-    # Update resource status if fully assigned
-    if available_quantity - quantity == 0:
-        resource.status = 'in_use'
-
     db.commit()
     db.refresh(assignment)
+    resource_snapshot.mark_dirty(resource_id)
+    event_bus.publish(
+        "resource.assigned", organization_id, team_id,
+        assignment, schema=schemas.ResourceAssignment
+    )
     return assignment
 
+def assign_resources_batch(
+    db: Session,
+    incident_id: int,
+    items: Sequence[schemas.ResourceAssignmentBatchItem],
+    user_id: int,
+    auth: Optional[AuthContext] = None
+) -> List[ResourceAssignment]:
+    """Assign several resources to an incident in one transaction: either
+    every assignment is made or none is.
+
+    Quantities are summed per resource and taken off the availability
+    ledger by a single conditional UPDATE; if any resource is short, it
+    matches fewer rows and the whole batch is rolled back.
+    """
+    if not db.query(Incident.id).filter(Incident.id == incident_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incident not found"
+        )
+
+    requested: Dict[int, int] = {}
+    for item in items:
+        requested[item.resource_id] = requested.get(item.resource_id, 0) + item.quantity
+
+    resources = {
+        row.id: row
+        for row in db.query(Resource.id, Resource.organization_id, Resource.team_id)
+        .filter(Resource.id.in_(requested))
+    }
+    missing = [resource_id for resource_id in requested if resource_id not in resources]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Resource(s) not found: {', '.join(map(str, missing))}"
+        )
+
+    auth = auth or load_auth_context(db, user_id)
+    forbidden = [
+        row.id for row in resources.values()
+        if not auth.can_dispatch(row.team_id, row.organization_id)
+    ]
+    if forbidden:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not authorized to assign resource(s): {', '.join(map(str, forbidden))}"
+        )
+
+    take = case(requested, value=Resource.id)
+    result = db.execute(
+        update(Resource)
+        .where(Resource.id.in_(requested), Resource.available_quantity >= take)
+        .values(
+            available_quantity=Resource.available_quantity - take,
+            status=case(
+                (Resource.available_quantity == take, 'in_use'),
+                else_=Resource.status
+            ),
+            version=Resource.version + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(requested):
+        db.rollback()
+        available = dict(
+            db.query(Resource.id, Resource.available_quantity)
+            .filter(Resource.id.in_(requested))
+            .all()
+        )
+        short = [
+            f"{resource_id} ({available.get(resource_id) or 0} available)"
+            for resource_id, quantity in requested.items()
+            if (available.get(resource_id) or 0) < quantity
+        ]
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Not enough quantity available for resource(s): {', '.join(short)}"
+        )
+
+    changed_by_org: Dict[int, int] = {}
+    for row in resources.values():
+        changed_by_org[row.organization_id] = changed_by_org.get(row.organization_id, 0) + 1
+    for org_id, count in changed_by_org.items():
+        bump_organization_stats(db, org_id, resource_changes=count)
+
+    ids = insert_returning_ids(db, ResourceAssignment, [
+        {"resource_id": item.resource_id, "incident_id": incident_id, "quantity": item.quantity}
+        for item in items
+    ])
+    db.commit()
+    resource_snapshot.mark_dirty(*requested)
+
+    assignments = (
+        db.query(ResourceAssignment)
+        .filter(ResourceAssignment.id.in_(ids))
+        .order_by(ResourceAssignment.id)
+        .all()
+    )
+    for assignment in assignments:
+        resource = resources[assignment.resource_id]
+        event_bus.publish(
+            "resource.assigned", resource.organization_id, resource.team_id,
+            assignment, schema=schemas.ResourceAssignment
+        )
+    return assignments
+
 def return_resource(
     db: Session,
     assignment_id: int,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None
 ) -> ResourceAssignment:
     assignment = db.query(ResourceAssignment).get(assignment_id)
     if not assignment:
@@ -190,41 +491,56 @@ def return_resource(
     resource = get_resource(db, assignment.resource_id)
     
     # Check authorization
-    is_authorized = (
-        db.query(TeamMembership).filter(
-            and_(
-                TeamMembership.team_id == resource.team_id,
-                TeamMembership.user_id == user_id,
-                TeamMembership.role.in_(['leader', 'dispatcher'])
-            )
-        ).first() if resource.team_id else False
-    ) or db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == resource.organization_id,
-            OrganizationMembership.user_id == user_id,
-            OrganizationMembership.role == 'admin'
-        )
-    ).first()
-
-    if not is_authorized:
+    organization_id, team_id = resource.organization_id, resource.team_id
+    auth = auth or load_auth_context(db, user_id)
+    if not auth.can_dispatch(team_id, organization_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to return this resource"
         )
 
-    assignment.returned_at = datetime.utcnow()
-    
-    # Check if this was the last assignment and update resource status
-    active_assignments = db.query(ResourceAssignment).filter(
-        and_(
-            ResourceAssignment.resource_id == resource.id,
+    # Close the assignment only once, even if two returns race
+    result = db.execute(
+        update(ResourceAssignment)
+        .where(
+            ResourceAssignment.id == assignment_id,
             ResourceAssignment.returned_at.is_(None)
         )
-    ).count()
+        .values(returned_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Resource assignment has already been returned"
+        )
 
-    if active_assignments == 0:
-        resource.status = 'available'
+    # Put the units back; the resource is available again once nothing is
+    # assigned out
+    db.execute(
+        update(Resource)
+        .where(Resource.id == assignment.resource_id)
+        .values(
+            available_quantity=Resource.available_quantity + assignment.quantity,
+            status=case(
+                (
+                    Resource.available_quantity + assignment.quantity >= Resource.quantity,
+                    'available'
+                ),
+                else_=Resource.status
+            ),
+            version=Resource.version + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+    bump_organization_stats(db, organization_id, resource_changes=1)
 
     db.commit()
     db.refresh(assignment)
+    resource_snapshot.mark_dirty(assignment.resource_id)
+    event_bus.publish(
+        "resource.returned", organization_id, team_id,
+        assignment, schema=schemas.ResourceAssignment
+    )
     return assignment 
\ No newline at end of file
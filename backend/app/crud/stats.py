@@ -0,0 +1,149 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Dict, List, Optional
+
+from ..models.organization import Organization, OrganizationMembership, OrganizationStats
+from ..models.team import Team
+from ..models.resource import Resource
+from ..models.incident import Incident
+
+ACTIVE_INCIDENT_STATUSES = ('open', 'in_progress')
+
+# Counts of source rows, recomputed by the reconcile job
+COUNTS = ('member_count', 'team_count', 'resource_count', 'active_incidents')
+
+# Change markers rather than counts: never recomputed by the reconcile job,
+# since going back to an earlier value would revalidate stale client copies
+CHANGE_COUNTERS = ('incident_changes', 'resource_changes', 'team_changes')
+
+def is_active_incident(incident_status: Optional[str]) -> bool:
+    return incident_status in ACTIVE_INCIDENT_STATUSES
+
+def bump_organization_stats(db: Session, organization_id: int, **deltas: int) -> None:
+    """Add `deltas` (e.g. member_count=1) to an organization's counters.
+
+    Runs in the caller's transaction so the counters commit or roll back
+    together with the write they describe; call it once that write has been
+    applied to the session. An organization without a stats row yet gets
+    one counted from the source tables, this write included.
+    """
+    values = {
+        name: getattr(OrganizationStats, name) + delta
+        for name, delta in deltas.items() if delta
+    }
+    if not values:
+        return
+
+    increment = (
+        update(OrganizationStats)
+        .where(OrganizationStats.organization_id == organization_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if db.execute(increment).rowcount:
+        return
+
+    # Counting sees this transaction's pending rows once flushed
+    db.flush()
+    row = {
+        "organization_id": organization_id,
+        **organization_counts(db, organization_id),
+        **{name: delta for name, delta in deltas.items() if name in CHANGE_COUNTERS},
+    }
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(OrganizationStats)
+        created = db.execute(
+            insert.values(**row).on_conflict_do_nothing(index_elements=["organization_id"])
+        ).rowcount
+    else:
+        db.add(OrganizationStats(**row))
+        db.flush()
+        created = True
+    if not created:
+        # A concurrent first write created the row, counted without this one
+        db.execute(increment)
+
+def change_count(db: Session, organization_id: int, counter: str) -> int:
+    """Current value of one of the CHANGE_COUNTERS; 0 before the
+    organization's first write"""
+    return db.query(getattr(OrganizationStats, counter)).filter(
+        OrganizationStats.organization_id == organization_id
+    ).scalar() or 0
+
+def _counts(db: Session, model, organization_id: Optional[int], *criteria) -> Dict[int, int]:
+    """organization_id -> number of `model` rows matching `criteria`"""
+    query = (
+        db.query(model.organization_id, func.count())
+        .filter(*criteria)
+        .group_by(model.organization_id)
+    )
+    if organization_id is not None:
+        query = query.filter(model.organization_id == organization_id)
+    return dict(query.all())
+
+def _all_counts(db: Session, organization_id: Optional[int]) -> Dict[str, Dict[int, int]]:
+    """name in COUNTS -> organization_id -> count"""
+    return {
+        'member_count': _counts(
+            db, OrganizationMembership, organization_id,
+            OrganizationMembership.status == 'active'
+        ),
+        'team_count': _counts(db, Team, organization_id),
+        'resource_count': _counts(db, Resource, organization_id),
+        'active_incidents': _counts(
+            db, Incident, organization_id,
+            Incident.status.in_(ACTIVE_INCIDENT_STATUSES)
+        ),
+    }
+
+def organization_counts(db: Session, organization_id: int) -> Dict[str, int]:
+    """The COUNTS of one organization, counted from the source tables"""
+    return {
+        name: by_org.get(organization_id, 0)
+        for name, by_org in _all_counts(db, organization_id).items()
+    }
+
+def reconcile_organization_stats(
+    db: Session,
+    organization_id: Optional[int] = None
+) -> List[OrganizationStats]:
+    """Recompute the counters of one organization (or all of them) from the
+    source tables and overwrite the stats rows.
+
+    Repairs drift from writes made outside the crud layer. Does not commit.
+    """
+    counts = _all_counts(db, organization_id)
+
+    org_ids = db.query(Organization.id)
+    existing = db.query(OrganizationStats)
+    if organization_id is not None:
+        org_ids = org_ids.filter(Organization.id == organization_id)
+        existing = existing.filter(OrganizationStats.organization_id == organization_id)
+    existing = {stats.organization_id: stats for stats in existing.all()}
+
+    results = []
+    for (org_id,) in org_ids.all():
+        stats = existing.get(org_id)
+        if stats is None:
+            stats = OrganizationStats(organization_id=org_id)
+            db.add(stats)
+        for name, by_org in counts.items():
+            setattr(stats, name, by_org.get(org_id, 0))
+        results.append(stats)
+
+    db.flush()
+    return results
+
+if __name__ == "__main__":
+    # Periodic reconcile job: python -m app.crud.stats
+    from ..db.base import SessionLocal
+
+    db = SessionLocal()
+    try:
+        count = len(reconcile_organization_stats(db))
+        db.commit()
+        print(f"Reconciled statistics for {count} organizations")
+    finally:
+        db.close()
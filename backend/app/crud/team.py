@@ -1,42 +1,98 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import Optional, List
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy import and_, func
+from typing import FrozenSet, Optional, List
 from fastapi import HTTPException, status
 
 from ..models.team import Team, TeamMembership
-from ..models.organization import OrganizationMembership
+from ..models.organization import Organization, OrganizationMembership
+from ..models.incident import Incident
+from ..models.resource import Resource, ResourceAssignment
+from ..models.user import User
 from ..schemas import team as schemas
+from ..core.authz import AuthContext, load_auth_context
+from . import versioning
+from .pagination import paginate
+from .stats import ACTIVE_INCIDENT_STATUSES, bump_organization_stats
+
+TEAM_ORDER = (Team.id,)
 
 def get_team(db: Session, team_id: int) -> Optional[Team]:
     return db.query(Team).filter(Team.id == team_id).first()
 
+def get_team_detail(db: Session, team_id: int) -> schemas.TeamDetail:
+    """Team with its members, its resources, how many of its incidents are
+    active and how many of its resources are out on assignments"""
+    row = (
+        db.query(Team, Organization.name)
+        .join(Organization, Team.organization_id == Organization.id)
+        .filter(Team.id == team_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Team not found"
+        )
+    team, organization_name = row
+
+    members = (
+        db.query(User)
+        .join(TeamMembership, TeamMembership.user_id == User.id)
+        .filter(TeamMembership.team_id == team_id)
+        .order_by(User.id)
+        .all()
+    )
+    resources = (
+        db.query(Resource)
+        .filter(Resource.team_id == team_id)
+        .order_by(Resource.id)
+        .all()
+    )
+    active_incidents = db.query(func.count(Incident.id)).filter(
+        Incident.assigned_team_id == team_id,
+        Incident.status.in_(ACTIVE_INCIDENT_STATUSES)
+    ).scalar()
+    assigned_resources = (
+        db.query(func.count(ResourceAssignment.id))
+        .join(Resource, ResourceAssignment.resource_id == Resource.id)
+        .filter(Resource.team_id == team_id, ResourceAssignment.returned_at.is_(None))
+        .scalar()
+    )
+
+    return schemas.TeamDetail(
+        **schemas.Team.model_validate(team).model_dump(),
+        members=members,
+        resources=resources,
+        member_count=len(members),
+        active_incidents=active_incidents,
+        assigned_resources=assigned_resources,
+        organization_name=organization_name
+    )
+
 def get_teams(
     db: Session,
     organization_id: int,
     skip: int = 0,
     limit: int = 100,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    cursor: Optional[str] = None
 ) -> List[Team]:
     query = db.query(Team).filter(Team.organization_id == organization_id)
     if status:
         query = query.filter(Team.status == status)
-    return query.offset(skip).limit(limit).all()
+    return paginate(query, TEAM_ORDER, cursor=cursor, skip=skip, limit=limit).all()
 
 def create_team(
     db: Session,
     team: schemas.TeamCreate,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None
 ) -> Team:
-    # Verify user has admin rights in the organization
-    is_admin = db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == team.organization_id,
-            OrganizationMembership.user_id == user_id,
-            OrganizationMembership.role == 'admin'
-        )
-    ).first()
+    auth = auth or load_auth_context(db, user_id)
 
-    if not is_admin:
+    # Verify user has admin rights in the organization
+    if not auth.is_org_admin(team.organization_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to create teams in this organization"
@@ -44,6 +100,7 @@ def create_team(
 
     db_team = Team(**team.model_dump())
     db.add(db_team)
+    bump_organization_stats(db, team.organization_id, team_count=1, team_changes=1)
     db.commit()
     db.refresh(db_team)
 
@@ -63,8 +120,12 @@ def update_team(
     db: Session,
     team_id: int,
     team_update: schemas.TeamUpdate,
-    user_id: int
+    user_id: int,
+    auth: Optional[AuthContext] = None,
+    expected_version: Optional[FrozenSet[int]] = None
 ) -> Team:
+    """Apply `team_update`; with `expected_version` (from If-Match), only if
+    the team still has one of those versions"""
     db_team = get_team(db, team_id)
     if not db_team:
         raise HTTPException(
@@ -73,30 +134,25 @@ def update_team(
         )
 
     # Check if user is team leader or org admin
-    is_authorized = db.query(TeamMembership).filter(
-        and_(
-            TeamMembership.team_id == team_id,
-            TeamMembership.user_id == user_id,
-            TeamMembership.role == 'leader'
-        )
-    ).first() or db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == db_team.organization_id,
-            OrganizationMembership.user_id == user_id,
-            OrganizationMembership.role == 'admin'
-        )
-    ).first()
-
-    if not is_authorized:
+    auth = auth or load_auth_context(db, user_id)
+    if not auth.can_lead(team_id, db_team.organization_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update this team"
         )
+    versioning.check_version(db_team, expected_version, "Team")
 
     update_data = team_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_team, field, value)
 
+    try:
+        db.flush()
+    except StaleDataError:
+        # Updated by someone else since it was read above
+        db.rollback()
+        raise versioning.conflict("Team")
+    bump_organization_stats(db, db_team.organization_id, team_changes=int(bool(update_data)))
     db.commit()
     db.refresh(db_team)
     return db_team
@@ -106,7 +162,8 @@ def add_team_member(
     team_id: int,
     user_id: int,
     added_by_id: int,
-    role: str = 'member'
+    role: str = 'member',
+    auth: Optional[AuthContext] = None
 ) -> TeamMembership:
     # Verify the user being added is part of the organization
     team = get_team(db, team_id)
@@ -117,21 +174,8 @@ def add_team_member(
         )
 
     # Verify the adding user has permission (team leader or org admin)
-    is_authorized = db.query(TeamMembership).filter(
-        and_(
-            TeamMembership.team_id == team_id,
-            TeamMembership.user_id == added_by_id,
-            TeamMembership.role == 'leader'
-        )
-    ).first() or db.query(OrganizationMembership).filter(
-        and_(
-            OrganizationMembership.organization_id == team.organization_id,
-            OrganizationMembership.user_id == added_by_id,
-            OrganizationMembership.role == 'admin'
-        )
-    ).first()
-
-    if not is_authorized:
+    auth = auth or load_auth_context(db, added_by_id)
+    if not auth.can_lead(team_id, team.organization_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to add members to this team"
@@ -4,13 +4,31 @@ from typing import Optional, List
 from fastapi import HTTPException, status
 
 from ..models.user import User
-from ..models.organization import OrganizationMembership
+from ..models.organization import Organization, OrganizationMembership
+from ..models.team import Team, TeamMembership
 from ..schemas import user as schemas
-from ..core.security import get_password_hash, verify_password
+from ..core.security import (
+    get_password_hash,
+    verify_password,
+    verify_and_update_password
+)
+from ..db.base import run_db
+from ..core.cache import user_cache
+from .pagination import paginate
+
+USER_ORDER = (User.id,)
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
 
+def get_detached_user(db: Session, user_id: int) -> Optional[User]:
+    """Load a user and detach it from the session so it can be cached
+    across requests without being expired by this session's commits"""
+    user = get_user(db, user_id)
+    if user is not None:
+        db.expunge(user)
+    return user
+
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     return db.query(User).filter(User.email == email).first()
 
@@ -18,7 +36,8 @@ def get_users(
     db: Session, 
     skip: int = 0, 
     limit: int = 100,
-    organization_id: Optional[int] = None
+    organization_id: Optional[int] = None,
+    cursor: Optional[str] = None
 ) -> List[User]:
     query = db.query(User)
     if organization_id:
@@ -26,7 +45,69 @@ def get_users(
             OrganizationMembership.organization_id == organization_id,
             OrganizationMembership.status == 'active'
         )
-    return query.offset(skip).limit(limit).all()
+    return paginate(query, USER_ORDER, cursor=cursor, skip=skip, limit=limit).all()
+
+def get_user_with_memberships(db: Session, user: User) -> schemas.UserWithMemberships:
+    """Build the profile of `user` with its organization and team memberships"""
+    org_memberships = (
+        db.query(OrganizationMembership)
+        .join(Organization)
+        .filter(OrganizationMembership.user_id == user.id)
+        .with_entities(
+            OrganizationMembership.organization_id,
+            Organization.name,
+            OrganizationMembership.role,
+            OrganizationMembership.status,
+            OrganizationMembership.join_date
+        )
+        .all()
+    )
+    organizations = [
+        schemas.OrganizationMemberInfo(
+            organization_id=membership.organization_id,
+            name=membership.name,
+            role=membership.role,
+            status=membership.status,
+            join_date=membership.join_date
+        )
+        for membership in org_memberships
+    ]
+
+    team_memberships = (
+        db.query(TeamMembership)
+        .join(Team)
+        .filter(TeamMembership.user_id == user.id)
+        .with_entities(
+            TeamMembership.team_id,
+            Team.name,
+            Team.organization_id,
+            TeamMembership.role,
+            TeamMembership.join_date
+        )
+        .all()
+    )
+    teams = [
+        schemas.TeamMemberInfo(
+            team_id=membership.team_id,
+            name=membership.name,
+            organization_id=membership.organization_id,
+            role=membership.role,
+            join_date=membership.join_date
+        )
+        for membership in team_memberships
+    ]
+
+    return schemas.UserWithMemberships(
+        id=user.id,
+        email=user.email,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        is_active=user.is_active,
+        created_at=user.created_at,
+        updated_at=user.updated_at,
+        organizations=organizations,
+        teams=teams
+    )
 
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     user = get_user_by_email(db, email=email)
@@ -36,7 +117,32 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
         return None
     return user
 
-def create_user(db: Session, user: schemas.UserCreate) -> User:
+async def authenticate_user_async(db: Session, email: str, password: str) -> Optional[User]:
+    """authenticate_user for request handlers: bcrypt runs on the hashing
+    pool, and an outdated hash is transparently upgraded on success"""
+    user = await run_db(db, get_user_by_email, email=email)
+    if not user:
+        return None
+    is_valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not is_valid:
+        return None
+    if new_hash:
+        user = await run_db(db, set_password_hash, user.id, new_hash)
+    return user
+
+def set_password_hash(db: Session, user_id: int, hashed_password: str) -> User:
+    db_user = get_user(db, user_id)
+    db_user.hashed_password = hashed_password
+    db.commit()
+    db.refresh(db_user)
+    user_cache.invalidate(str(user_id))
+    return db_user
+
+def create_user(
+    db: Session,
+    user: schemas.UserCreate,
+    hashed_password: Optional[str] = None
+) -> User:
     # Check if user already exists
     if get_user_by_email(db, email=user.email):
         raise HTTPException(
@@ -44,8 +150,8 @@ def create_user(db: Session, user: schemas.UserCreate) -> User:
             detail="Email already registered"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+    # Create new user; request handlers hash off the event loop beforehand
+    hashed_password = hashed_password or get_password_hash(user.password)
     db_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -61,7 +167,8 @@ def create_user(db: Session, user: schemas.UserCreate) -> User:
 def update_user(
     db: Session, 
     user_id: int, 
-    user_update: schemas.UserUpdate
+    user_update: schemas.UserUpdate,
+    hashed_password: Optional[str] = None
 ) -> User:
     db_user = get_user(db, user_id)
     if not db_user:
@@ -71,11 +178,16 @@ def update_user(
         )
     
     update_data = user_update.model_dump(exclude_unset=True)
+    password = update_data.pop("password", None)
+    if password:
+        update_data["hashed_password"] = hashed_password or get_password_hash(password)
+
     for field, value in update_data.items():
         setattr(db_user, field, value)
     
     db.commit()
     db.refresh(db_user)
+    user_cache.invalidate(str(user_id))
     return db_user
 
 def delete_user(db: Session, user_id: int) -> bool:
@@ -88,4 +200,5 @@ def delete_user(db: Session, user_id: int) -> bool:
     
     db.delete(db_user)
     db.commit()
+    user_cache.invalidate(str(user_id))
     return True 
\ No newline at end of file
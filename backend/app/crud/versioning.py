@@ -0,0 +1,118 @@
+"""Optimistic concurrency and conditional requests.
+
+Incidents, resources and teams carry a `version` the ORM checks and bumps on
+every flush (mapper version_id_col): the UPDATE is `... WHERE id = ? AND
+version = ?`, so a write based on a stale read matches no row instead of
+overwriting a concurrent one. Responses expose the version as the ETag;
+clients send it back in If-Match and a write against any other version
+fails with 412.
+
+Reads work the other way round: a GET whose If-None-Match still names the
+current ETag gets an empty 304. Single rows are tagged with their version
+(followed by whatever else the representation depends on); organization
+lists with the change counters kept in organization_stats (see
+crud.stats). Both are read with one cheap query before the real one.
+"""
+import hashlib
+from datetime import datetime
+from typing import Any, FrozenSet, List, Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy.orm import Session
+
+from .stats import change_count
+
+ETAG_HEADER = "ETag"
+CACHE_CONTROL_HEADER = "Cache-Control"
+
+# Authenticated reads: clients may keep a copy but must revalidate it
+PRIVATE_REVALIDATE = "private, no-cache"
+
+def _tag_part(part: Any) -> str:
+    if part is None:
+        return "0"
+    if isinstance(part, datetime):
+        # Microseconds since the epoch: no spaces or colons in the tag
+        return str(int(part.timestamp() * 1_000_000))
+    return str(part)
+
+def etag(version: int, *parts: Any) -> str:
+    """Strong ETag of a row: its version, then anything else the
+    representation depends on (None as 0, datetimes as numbers),
+    dot-separated"""
+    return '"' + ".".join(_tag_part(part) for part in (version, *parts)) + '"'
+
+def collection_etag(*parts: Any) -> str:
+    return 'W/"' + ".".join(str(part) for part in parts) + '"'
+
+def organization_list_etag(db: Session, organization_id: int, counter: str) -> str:
+    """ETag of an organization's incidents, resources or teams (`counter`
+    is one of stats.CHANGE_COUNTERS), whatever the filters and page. Read it
+    before the list: a write in between then leaves an older tag on the
+    newer page, which only costs the next request a full response."""
+    return collection_etag(organization_id, change_count(db, organization_id, counter))
+
+def content_etag(body: bytes) -> str:
+    return 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+def _opaque_tags(value: str) -> List[str]:
+    """The tags of an If-Match / If-None-Match list, without W/ and quotes"""
+    tags = []
+    for tag in value.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tags.append(tag.strip('"'))
+    return tags
+
+def parse_if_match(value: Optional[str]) -> Optional[FrozenSet[int]]:
+    """Versions accepted by an If-Match header; None when any version will
+    do (no header, or `*`). Only a tag's first component is compared, so
+    the ETag of a detail view also matches; tags that are not versions can
+    never match."""
+    if value is None or value.strip() == "*":
+        return None
+    versions = set()
+    for tag in _opaque_tags(value):
+        version = tag.split(".", 1)[0]
+        if version.isdigit():
+            versions.add(int(version))
+    return frozenset(versions)
+
+def none_match(value: Optional[str], tag: str) -> bool:
+    """Whether If-None-Match `value` already names `tag` (weak comparison),
+    i.e. the client's copy is current"""
+    if value is None:
+        return False
+    if value.strip() == "*":
+        return True
+    return _opaque_tags(tag)[0] in _opaque_tags(value)
+
+def not_modified(tag: str, cache_control: str = PRIVATE_REVALIDATE) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={ETAG_HEADER: tag, CACHE_CONTROL_HEADER: cache_control}
+    )
+
+def set_cache_headers(
+    response: Response,
+    tag: str,
+    cache_control: str = PRIVATE_REVALIDATE
+) -> None:
+    response.headers[ETAG_HEADER] = tag
+    response.headers[CACHE_CONTROL_HEADER] = cache_control
+
+def conflict(name: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=f"{name} was modified by another request; reload it and retry"
+    )
+
+def check_version(instance: Any, expected: Optional[FrozenSet[int]], name: str) -> None:
+    """Refuse to write `instance` unless it still has one of the `expected`
+    versions"""
+    if expected is not None and instance.version not in expected:
+        raise conflict(name)
+
+def set_etag(response: Response, instance: Any) -> None:
+    response.headers[ETAG_HEADER] = etag(instance.version)
@@ -1,20 +1,72 @@
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from starlette.concurrency import run_in_threadpool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./emre.db"
+from ..core.config import settings
+from ..core.metrics import instrument_engine, instrument_orm, track_pool
+from .engine import create_async_db_engine, create_db_engine
+from .replicas import ReplicaRouter, track_writes
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_db_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Only build the async engine when it is used so aiosqlite/asyncpg stay
+# optional for deployments on the synchronous path
+async_engine = (
+    create_async_db_engine(settings.ASYNC_DATABASE_URL)
+    if settings.USE_ASYNC_DB else None
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+replica_router = ReplicaRouter(
+    settings.READ_REPLICA_URLS,
+    settings.ASYNC_DATABASE_URL if settings.USE_ASYNC_DB else settings.DATABASE_URL,
+    is_async=settings.USE_ASYNC_DB
+)
+track_writes(replica_router)
+
 Base = declarative_base()
 
-# Dependency
-def get_db():
+instrument_engine(engine)
+track_pool("primary", engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+    track_pool("primary_async", async_engine.sync_engine)
+instrument_orm(Base)
+
+# Dependencies
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+get_db = get_async_db if settings.USE_ASYNC_DB else get_sync_db
+
+async def run_db(db, fn, *args, **kwargs):
+    """Call a synchronous crud function `fn(db, *args, **kwargs)` without
+    blocking the event loop.
+
+    With an AsyncSession the function runs through `run_sync`, so its SQL is
+    awaited on the async driver; a plain Session is handed to the threadpool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda session: fn(session, *args, **kwargs))
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def release_db(db):
+    """Return the session's connection to the pool. Long-lived handlers
+    (streams) call this once their queries are done; the session can still
+    be used again afterwards."""
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        db.close()
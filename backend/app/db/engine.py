@@ -0,0 +1,98 @@
+"""Engine factory: one place that knows how each database backend should be
+configured, plus the backend-specific fast paths the crud layer uses."""
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from ..core.config import settings
+
+def _sqlite_pragmas() -> List[str]:
+    return [
+        # Readers no longer block the writer (and vice versa)
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        # Safe with WAL: only the last transactions can be lost on power failure
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        # Wait for the write lock instead of failing with "database is locked"
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+    ]
+
+def _configure_sqlite(engine: Engine) -> None:
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in _sqlite_pragmas():
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def _engine_options(url: str, is_async: bool) -> Dict[str, Any]:
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return {
+            "connect_args": {
+                "check_same_thread": False,
+                # the driver's own lock wait, in seconds
+                "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            }
+        }
+
+    options: Dict[str, Any] = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    if backend == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        options["connect_args"] = (
+            {"server_settings": {"statement_timeout": timeout}} if is_async
+            else {"options": f"-c statement_timeout={timeout}"}
+        )
+    return options
+
+def create_db_engine(url: str) -> Engine:
+    engine = create_engine(url, **_engine_options(url, is_async=False))
+    if engine.dialect.name == "sqlite":
+        _configure_sqlite(engine)
+    return engine
+
+def create_async_db_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(url, **_engine_options(url, is_async=True))
+    if engine.dialect.name == "sqlite":
+        _configure_sqlite(engine.sync_engine)
+    return engine
+
+def pool_stats(engine: Engine) -> Dict[str, int]:
+    """Connection counts of `engine`'s pool; empty for pools that don't keep
+    any (e.g. SQLite in-memory databases)"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+def insert_returning_ids(db: Session, model, rows: Sequence[Dict[str, Any]]) -> List[int]:
+    """INSERT `rows` and return their new ids, in the order of `rows`.
+
+    SQLAlchemy can only guarantee that order on SQLite by inserting one row
+    per statement. SQLite numbers the rows of a multi-row INSERT upwards in
+    VALUES order while the transaction holds the write lock, so sorting the
+    returned ids gives the same result from batched statements. Other
+    backends batch with sort_by_parameter_order.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sorted(db.scalars(insert(model).returning(model.id), rows))
+    return list(db.scalars(
+        insert(model).returning(model.id, sort_by_parameter_order=True), rows
+    ))
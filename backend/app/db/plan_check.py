@@ -0,0 +1,275 @@
+"""Query plan regression check for the crud layer.
+
+Builds a throwaway SQLite database from the models, seeds it, runs each hot
+crud call while recording the SQL it issues, and asks SQLite for the
+`EXPLAIN QUERY PLAN` of every statement. Any plan step that reads a whole
+table (`SCAN <table>` without an index) is reported as a regression.
+
+    python -m app.db.plan_check [-v]
+
+Exits non-zero when a regression is found, so it can gate CI.
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Callable, List, Tuple
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+
+from .base import Base
+from .search import reindex_incidents
+from ..core.authz import load_auth_context
+from ..crud import incident as crud_incident
+from ..crud import organization as crud_organization
+from ..crud import resource as crud_resource
+from ..crud import team as crud_team
+from ..crud import user as crud_user
+from ..crud import versioning
+from ..crud.pagination import cursor_for, encode_cursor
+from ..crud.analytics import get_incident_analytics, rebuild_incident_rollups
+from ..crud.stats import reconcile_organization_stats
+from ..models import (
+    Incident, IncidentUpdate, Organization, OrganizationMembership,
+    Resource, ResourceAssignment, Team, TeamMembership, User
+)
+from ..schemas import incident as incident_schemas
+from ..schemas import resource as resource_schemas
+
+# A bare "SCAN incidents"; index scans and virtual tables (R*Tree) are fine,
+# and scans of subqueries are only flagged through the tables inside them
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+ORGS = 50
+USERS = 400
+TEAMS_PER_ORG = 8
+INCIDENTS = 5000
+RESOURCES = 600
+
+def seed(db: Session) -> None:
+    rng = random.Random(7)
+    now = datetime.utcnow()
+
+    db.execute(insert(User), [
+        {"email": f"user{i}@example.org", "first_name": "Test", "last_name": f"User{i}",
+         "hashed_password": "x", "is_active": True}
+        for i in range(1, USERS + 1)
+    ])
+    db.execute(insert(Organization), [
+        {"name": f"Org {i}", "type": "emergency_response", "region": "test",
+         "visibility": "public" if i % 5 == 0 else "private", "created_by_id": 1}
+        for i in range(1, ORGS + 1)
+    ])
+    # User n <= ORGS is the active admin of organization n and leads its
+    # first team; everyone else gets two random memberships
+    db.execute(insert(OrganizationMembership), [
+        {"user_id": user_id, "organization_id": user_id, "role": "admin", "status": "active"}
+        for user_id in range(1, ORGS + 1)
+    ] + [
+        {"user_id": user_id, "organization_id": org_id, "role": "member",
+         "status": rng.choice(["active", "active", "active", "pending"])}
+        for user_id in range(ORGS + 1, USERS + 1)
+        for org_id in rng.sample(range(1, ORGS + 1), 2)
+    ])
+    db.execute(insert(Team), [
+        {"name": f"Team {org_id}-{i}", "organization_id": org_id, "type": "response"}
+        for org_id in range(1, ORGS + 1)
+        for i in range(TEAMS_PER_ORG)
+    ])
+    db.execute(insert(TeamMembership), [
+        {"user_id": user_id, "team_id": (user_id - 1) * TEAMS_PER_ORG + 1,
+         "role": "leader", "added_by_id": 1}
+        for user_id in range(1, ORGS + 1)
+    ] + [
+        {"user_id": user_id, "team_id": rng.randint(1, ORGS * TEAMS_PER_ORG),
+         "role": rng.choice(["member", "dispatcher"]), "added_by_id": 1}
+        for user_id in range(ORGS + 1, USERS + 1)
+    ])
+    db.execute(insert(Incident), [
+        {"title": f"Incident {i}", "type": "emergency",
+         "priority": rng.choice(["critical", "high", "medium", "low"]),
+         "status": rng.choice(["open", "in_progress", "resolved", "closed"]),
+         "organization_id": rng.randint(1, ORGS), "created_by_id": rng.randint(1, USERS),
+         "assigned_team_id": rng.randint(1, ORGS * TEAMS_PER_ORG),
+         "latitude": rng.uniform(-60, 60), "longitude": rng.uniform(-170, 170),
+         "created_at": now - timedelta(minutes=i)}
+        for i in range(1, INCIDENTS + 1)
+    ])
+    db.execute(insert(IncidentUpdate), [
+        {"incident_id": 1 if i <= 50 else rng.randint(1, INCIDENTS),
+         "user_id": rng.randint(1, USERS),
+         "content": "update", "created_at": now - timedelta(seconds=i)}
+        for i in range(1, INCIDENTS + 1)
+    ])
+    db.execute(insert(Resource), [
+        {"name": f"Resource {i}", "type": "supply", "quantity": 100,
+         "available_quantity": 100, "organization_id": rng.randint(1, ORGS),
+         "team_id": rng.randint(1, ORGS * TEAMS_PER_ORG),
+         "latitude": rng.uniform(-60, 60), "longitude": rng.uniform(-170, 170)}
+        for i in range(1, RESOURCES + 1)
+    ])
+    db.execute(insert(ResourceAssignment), [
+        {"resource_id": rng.randint(1, RESOURCES), "incident_id": rng.randint(1, INCIDENTS),
+         "quantity": 1, "returned_at": now if i % 3 else None}
+        for i in range(1, RESOURCES * 4 + 1)
+    ])
+    reindex_incidents(db)
+    rebuild_incident_rollups(db)
+    reconcile_organization_stats(db)
+    db.commit()
+
+def page_two_members(db: Session):
+    first = crud_organization.get_organization_members(db, 1, 1, limit=20)
+    return crud_organization.get_organization_members(
+        db, 1, 1, limit=20, cursor=encode_cursor([first[-1].id])
+    )
+
+def update_status(db: Session):
+    incident_id = db.query(Incident.id).filter(Incident.organization_id == 1).first()[0]
+    return crud_incident.update_incident(
+        db, incident_id, incident_schemas.IncidentUpdate(status="in_progress"), 1
+    )
+
+def assign_and_return(db: Session):
+    resource = db.query(Resource).filter(Resource.organization_id == 1).first()
+    assignment = crud_resource.assign_resource(db, resource.id, 1, 1, 1)
+    return crud_resource.return_resource(db, assignment.id, 1)
+
+def assign_batch(db: Session):
+    resource_ids = [
+        resource_id for (resource_id,) in
+        db.query(Resource.id).filter(Resource.organization_id == 1).limit(10)
+    ]
+    return crud_resource.assign_resources_batch(db, 1, [
+        resource_schemas.ResourceAssignmentBatchItem(resource_id=resource_id)
+        for resource_id in resource_ids
+    ], 1)
+
+def scenarios() -> List[Tuple[str, Callable[[Session], object]]]:
+    """Hot crud calls, as (name, fn(db)). Seed row 1 of each table is
+    used throughout; user 1 is an admin of organization 1."""
+    def page_two(fn, order_by, **kwargs):
+        # Second page, so the keyset predicate is part of the plan
+        def run(db):
+            first = fn(db, limit=5, **kwargs)
+            return fn(db, limit=5, cursor=cursor_for(first[-1], order_by), **kwargs)
+        return run
+
+    new_incident = incident_schemas.IncidentCreate(
+        title="Plan check", type="emergency", priority="high", organization_id=1
+    )
+
+    return [
+        ("auth context", lambda db: load_auth_context(db, 1)),
+        ("user by id", lambda db: crud_user.get_user(db, 1)),
+        ("user by email", lambda db: crud_user.get_user_by_email(db, "user1@example.org")),
+        ("users of organization", lambda db: crud_user.get_users(db, organization_id=1)),
+        ("user memberships", lambda db: crud_user.get_user_with_memberships(
+            db, crud_user.get_user(db, 1))),
+        ("organization detail", lambda db: crud_organization.get_organization(db, 1, 1)),
+        ("organization members page", page_two_members),
+        ("organizations visible to user", lambda db: crud_organization.get_organizations(db, 1)),
+        ("teams of organization", page_two(
+            lambda db, **kw: crud_team.get_teams(db, 1, **kw), crud_team.TEAM_ORDER)),
+        ("incident by id", lambda db: crud_incident.get_incident(db, 1)),
+        ("incident detail", lambda db: crud_incident.get_incident_detail(db, 1)),
+        ("incident detail etag", lambda db: crud_incident.get_incident_etag(db, 1)),
+        ("incidents of organization etag", lambda db: versioning.organization_list_etag(
+            db, 1, "incident_changes")),
+        ("incidents newest", page_two(crud_incident.get_incidents, crud_incident.INCIDENT_ORDER)),
+        ("incidents of organization", page_two(
+            crud_incident.get_incidents, crud_incident.INCIDENT_ORDER, organization_id=1)),
+        ("active incidents of organization", page_two(
+            crud_incident.get_incidents, crud_incident.INCIDENT_ORDER,
+            organization_id=1, status="open")),
+        ("incidents of team", page_two(
+            crud_incident.get_incidents, crud_incident.INCIDENT_ORDER, team_id=1)),
+        ("incident updates", page_two(
+            lambda db, **kw: crud_incident.get_incident_updates(db, 1, **kw),
+            crud_incident.INCIDENT_UPDATE_ORDER)),
+        ("search incidents", page_two(
+            lambda db, **kw: crud_incident.search_incidents(
+                db, "incident", load_auth_context(db, 1), **kw),
+            crud_incident.INCIDENT_SEARCH_ORDER)),
+        ("incident analytics", lambda db: get_incident_analytics(
+            db, 1, load_auth_context(db, 1), granularity="hour")),
+        ("nearby incidents", lambda db: crud_incident.get_nearby_incidents(
+            db, 10.0, 10.0, 50.0, load_auth_context(db, 1))),
+        ("resources of organization", page_two(
+            crud_resource.get_resources, crud_resource.RESOURCE_ORDER, organization_id=1)),
+        ("resources of team", page_two(
+            crud_resource.get_resources, crud_resource.RESOURCE_ORDER, team_id=1)),
+        ("resource assignments", lambda db: crud_resource.get_resource_assignments(db, 1)),
+        ("nearby resources", lambda db: crud_resource.get_nearby_resources(
+            db, 10.0, 10.0, 50.0, load_auth_context(db, 1))),
+        ("create incident", lambda db: crud_incident.create_incident(db, new_incident, 1)),
+        ("update incident status", update_status),
+        ("assign and return resource", assign_and_return),
+        ("assign resources in batch", assign_batch),
+    ]
+
+def explain(connection, statement: str, parameters) -> List[str]:
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return [row[3] for row in rows]
+
+def check(verbose: bool = False) -> List[Tuple[str, str, str]]:
+    """Run every scenario; return (scenario, statement, plan step) for each
+    full table scan found"""
+    handle, path = tempfile.mkstemp(suffix=".db", prefix="plan_check_")
+    os.close(handle)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            seed(db)
+        with engine.connect() as connection:
+            connection.exec_driver_sql("ANALYZE")
+            connection.commit()
+
+        captured = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(
+                ("SELECT", "UPDATE", "DELETE", "WITH")
+            ):
+                captured.append((statement, parameters))
+
+        regressions = []
+        for name, run in scenarios():
+            captured.clear()
+            with Session(engine, autoflush=False) as db:
+                run(db)
+            statements = list(captured)
+
+            with engine.connect() as connection:
+                for statement, parameters in statements:
+                    plan = explain(connection, statement, parameters)
+                    if verbose:
+                        print(f"[{name}] {' '.join(statement.split())}")
+                        for step in plan:
+                            print(f"    {step}")
+                    for step in plan:
+                        match = FULL_SCAN.match(step)
+                        if match and match.group(1) in Base.metadata.tables:
+                            regressions.append((name, statement, step))
+        return regressions
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+def main() -> int:
+    regressions = check(verbose="-v" in sys.argv[1:])
+    for name, statement, step in regressions:
+        print(f"FULL SCAN in '{name}': {step}\n    {' '.join(statement.split())}")
+    if regressions:
+        print(f"{len(regressions)} full table scan(s) on hot queries")
+        return 1
+    print("No full table scans on hot queries")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Read-replica routing for read-only endpoints.
+
+Replicas come from settings.READ_REPLICA_URLS and are used round-robin.
+A replica whose replication lag exceeds READ_REPLICA_MAX_LAG_SECONDS, or
+that cannot be reached, is skipped until its next check; with no usable
+replica, reads go to the primary. A user's reads also go to the primary for
+READ_YOUR_WRITES_SECONDS after they commit a write, so they see it.
+
+Lag is measured with pg_last_xact_replay_timestamp() on Postgres. For local
+testing with SQLite, copy the primary into each replica file with
+
+    python -m app.db.replicas sync
+
+which records the copy time in the replica's user_version; lag is then how
+much newer the primary file is than that copy.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from ..core.cache import TTLCache
+from ..core.config import settings
+from .engine import create_async_db_engine, create_db_engine
+
+def _sqlite_path(url: str) -> Optional[str]:
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or not url.database or url.database == ":memory:":
+        return None
+    return url.database
+
+def _modified_at(path: str) -> float:
+    """Last write to a SQLite database, including its write-ahead log"""
+    return max(
+        (os.path.getmtime(name) for name in (path, f"{path}-wal") if os.path.exists(name)),
+        default=0.0
+    )
+
+class Replica:
+    def __init__(self, url: str, is_async: bool):
+        self.url = url
+        self.engine = create_async_db_engine(url) if is_async else create_db_engine(url)
+        self.session_factory = (
+            async_sessionmaker(bind=self.engine, autoflush=False, expire_on_commit=False)
+            if is_async else
+            sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        )
+        self.is_async = is_async
+        self.lag: Optional[float] = None  # None until checked or when unreachable
+        self.checked_at = 0.0
+
+    def measure_lag(self, connection: Connection, primary_path: Optional[str]) -> float:
+        if connection.dialect.name == "postgresql":
+            return float(connection.execute(text(
+                "SELECT CASE WHEN pg_is_in_recovery() THEN COALESCE("
+                "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                "ELSE 0 END"
+            )).scalar())
+        if connection.dialect.name == "sqlite" and primary_path:
+            copied_at = connection.exec_driver_sql("PRAGMA user_version").scalar()
+            if copied_at:
+                return max(0.0, _modified_at(primary_path) - copied_at)
+        # Nothing to measure against; trust the replica
+        return 0.0
+
+    async def check(self, primary_path: Optional[str]) -> None:
+        self.checked_at = time.monotonic()
+        try:
+            if self.is_async:
+                async with self.engine.connect() as connection:
+                    self.lag = await connection.run_sync(self.measure_lag, primary_path)
+            else:
+                def probe():
+                    with self.engine.connect() as connection:
+                        return self.measure_lag(connection, primary_path)
+                self.lag = await run_in_threadpool(probe)
+        except Exception:
+            self.lag = None
+
+    @property
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= settings.READ_REPLICA_MAX_LAG_SECONDS
+
+class ReplicaRouter:
+    def __init__(self, urls: List[str], primary_url: str, is_async: bool = False):
+        self.replicas = [Replica(url, is_async) for url in urls]
+        self.primary_path = _sqlite_path(primary_url)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        # user id -> True while their reads must see the primary
+        self._recent_writers = TTLCache(
+            maxsize=settings.USER_CACHE_MAX_ENTRIES,
+            ttl=settings.READ_YOUR_WRITES_SECONDS
+        )
+
+    def mark_write(self, user_id: int) -> None:
+        if self.replicas:
+            self._recent_writers.set(user_id, True)
+
+    async def choose(self, user_id: Optional[int]) -> Optional[Callable[[], Session]]:
+        """Session factory of the next usable replica, or None for the primary"""
+        if not self.replicas:
+            return None
+        if user_id is not None and self._recent_writers.get(user_id):
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if now - replica.checked_at >= settings.READ_REPLICA_CHECK_INTERVAL_SECONDS:
+                await replica.check(self.primary_path)
+            if replica.usable:
+                return replica.session_factory
+        return None
+
+def track_writes(router: ReplicaRouter) -> None:
+    """Start read-your-writes stickiness whenever a session that served an
+    authenticated user (see deps.get_current_user) commits"""
+
+    @event.listens_for(Session, "after_commit")
+    def remember_writer(session):
+        user_id = session.info.get("user_id")
+        if user_id is not None:
+            router.mark_write(user_id)
+
+def sync_sqlite_replicas(primary_url: str, replica_urls: List[str]) -> List[str]:
+    """Copy the primary SQLite database into each SQLite replica file"""
+    primary_path = _sqlite_path(primary_url)
+    if primary_path is None:
+        raise ValueError("The primary is not a SQLite file")
+    copied = []
+    source = sqlite3.connect(primary_path)
+    try:
+        for url in replica_urls:
+            path = _sqlite_path(url)
+            if path is None:
+                continue
+            target = sqlite3.connect(path)
+            try:
+                source.backup(target)
+                target.execute(f"PRAGMA user_version={int(time.time())}")
+                target.commit()
+            finally:
+                target.close()
+            copied.append(path)
+    finally:
+        source.close()
+    return copied
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["sync"]:
+        sys.exit("usage: python -m app.db.replicas sync")
+    for path in sync_sqlite_replicas(settings.DATABASE_URL, settings.READ_REPLICA_URLS):
+        print(f"Copied {settings.DATABASE_URL} to {path}")
@@ -0,0 +1,175 @@
+"""Full-text search over incidents and their updates.
+
+Each incident has one search document made of its title, description,
+location description and the content of all its updates. On SQLite the
+documents live in the FTS5 table incident_fts (rowid = incident id); on
+Postgres in incident_search, a weighted tsvector per incident with a GIN
+index. Neither table is a model: the crud write paths call
+`reindex_incidents` in the same transaction as the change they make.
+"""
+import re
+from typing import Iterable, List, Optional
+
+from sqlalchemy import (
+    Column, Float, Integer, MetaData, String, Table, bindparam, event, func,
+    literal_column, text
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import Session
+
+# Postgres text search configuration; SQLite stems with its porter tokenizer
+TEXT_SEARCH_CONFIG = "english"
+
+# Relative weight of a match in the title, description, location
+# description and updates
+FTS_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 16
+
+# Kept out of Base.metadata like the R*Tree tables; created by the DDL below
+search_metadata = MetaData()
+
+incident_fts = Table(
+    "incident_fts", search_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("title", String),
+    Column("description", String),
+    Column("location_description", String),
+    Column("updates_text", String),
+)
+
+incident_search = Table(
+    "incident_search", search_metadata,
+    Column("incident_id", Integer, primary_key=True),
+    Column("document", TSVECTOR),
+)
+
+def search_ddl(dialect: str) -> List[str]:
+    """Statements creating the search table for `dialect`"""
+    if dialect == "sqlite":
+        return [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS incident_fts USING fts5("
+            "title, description, location_description, updates_text, "
+            "tokenize = 'porter unicode61 remove_diacritics 2')"
+        ]
+    if dialect == "postgresql":
+        return [
+            "CREATE TABLE IF NOT EXISTS incident_search ("
+            "incident_id INTEGER PRIMARY KEY REFERENCES incidents (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_incident_search_document "
+            "ON incident_search USING GIN (document)",
+        ]
+    return []
+
+def _install_search(table, connection, **kw):
+    for statement in search_ddl(connection.dialect.name):
+        connection.exec_driver_sql(statement)
+
+def register(table: Table) -> None:
+    """Create the search table whenever metadata.create_all builds `table`"""
+    event.listen(table, "after_create", _install_search)
+
+# Rebuild the documents of the incidents matching {where}, an expression
+# over incidents i; updates are concatenated in creation order
+_REINDEX = {
+    "sqlite": (
+        "DELETE FROM incident_fts WHERE rowid IN (SELECT i.id FROM incidents i WHERE {where})",
+        "INSERT INTO incident_fts "
+        "(rowid, title, description, location_description, updates_text) "
+        "SELECT i.id, i.title, i.description, i.location_description, "
+        "(SELECT group_concat(content, char(10)) FROM ("
+        "SELECT u.content FROM incident_updates u WHERE u.incident_id = i.id "
+        "ORDER BY u.created_at, u.id)) "
+        "FROM incidents i WHERE {where}",
+    ),
+    "postgresql": (
+        "INSERT INTO incident_search (incident_id, document) "
+        "SELECT i.id, "
+        "setweight(to_tsvector(:config, coalesce(i.title, '')), 'A') || "
+        "setweight(to_tsvector(:config, coalesce(i.description, '')), 'B') || "
+        "setweight(to_tsvector(:config, coalesce(i.location_description, '')), 'C') || "
+        "setweight(to_tsvector(:config, coalesce(("
+        "SELECT string_agg(u.content, ' ' ORDER BY u.created_at, u.id) "
+        "FROM incident_updates u WHERE u.incident_id = i.id), '')), 'D') "
+        "FROM incidents i WHERE {where} "
+        "ON CONFLICT (incident_id) DO UPDATE SET document = excluded.document",
+    ),
+}
+
+def reindex_incidents(db: Session, incident_ids: Optional[Iterable[int]] = None) -> None:
+    """Rebuild the search documents of `incident_ids` (default: every
+    incident) from the current rows. Call it before committing a change to
+    an incident's text or updates."""
+    statements = _REINDEX.get(db.get_bind().dialect.name, ())
+    params = {"config": TEXT_SEARCH_CONFIG}
+    if incident_ids is None:
+        where = "1 = 1"
+    else:
+        params["ids"] = list(incident_ids)
+        if not params["ids"]:
+            return
+        where = "i.id IN :ids"
+
+    for statement in statements:
+        clause = text(statement.format(where=where))
+        if "ids" in params:
+            clause = clause.bindparams(bindparam("ids", expanding=True))
+        db.execute(clause, params)
+
+class SearchQuery:
+    """A user's search string compiled for the session's backend.
+
+    Every word must match (in any of the indexed fields); punctuation and
+    search operators are ignored. `score` is higher for better matches,
+    `snippet` is a highlighted excerpt of the best matching text.
+    """
+
+    def __init__(self, db: Session, q: str):
+        self.dialect = db.get_bind().dialect.name
+        self.terms = re.findall(r"\w+", q)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.terms
+
+    def join(self, query, model):
+        """Restrict `query` over `model` (incidents) to matching rows"""
+        if self.dialect == "sqlite":
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in self.terms)
+            return query.join(incident_fts, incident_fts.c.rowid == model.id).filter(
+                literal_column("incident_fts").op("MATCH")(match)
+            )
+        return query.join(incident_search, incident_search.c.incident_id == model.id).filter(
+            incident_search.c.document.op("@@")(self._tsquery())
+        )
+
+    def _tsquery(self):
+        return func.plainto_tsquery(TEXT_SEARCH_CONFIG, " ".join(self.terms))
+
+    def score(self):
+        if self.dialect == "sqlite":
+            # bm25() is lower for better matches
+            return -func.bm25(literal_column("incident_fts"), *FTS_WEIGHTS, type_=Float)
+        return func.ts_rank_cd(incident_search.c.document, self._tsquery(), type_=Float)
+
+    def snippet(self, model):
+        if self.dialect == "sqlite":
+            return func.snippet(
+                literal_column("incident_fts"), -1, SNIPPET_START, SNIPPET_END,
+                SNIPPET_ELLIPSIS, SNIPPET_TOKENS, type_=String
+            )
+        # Highlighted from the incident's own text; update content is
+        # searched but not excerpted
+        return func.ts_headline(
+            TEXT_SEARCH_CONFIG,
+            func.concat_ws(" ", model.title, model.description, model.location_description),
+            self._tsquery(),
+            f"StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, "
+            f"FragmentDelimiter={SNIPPET_ELLIPSIS}, MaxWords={SNIPPET_TOKENS}, MinWords=5, "
+            f"MaxFragments=2",
+            type_=String
+        )
@@ -0,0 +1,214 @@
+import math
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Column, Float, Integer, MetaData, Table, and_, event, or_, select
+from sqlalchemy.orm import Query
+
+EARTH_RADIUS_KM = 6371.0088
+# On the same sphere haversine_km measures, so boxes and distances agree
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+# Added to every side of a bounding box so points on the circle itself are
+# not lost to rounding (a few centimetres)
+BOX_MARGIN_DEGREES = 1e-6
+
+# nearest() first searches this fraction of the requested radius, and
+# widens the search at most this much per round
+FIRST_SEARCH_FRACTION = 1 / 16
+MAX_WIDENING = 4.0
+
+# R*Tree virtual tables live outside Base.metadata so create_all never tries
+# to build them as ordinary tables; they are created by the DDL below.
+rtree_metadata = MetaData()
+
+incidents_rtree = Table(
+    "incidents_rtree", rtree_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("min_lat", Float),
+    Column("max_lat", Float),
+    Column("min_lon", Float),
+    Column("max_lon", Float),
+)
+
+resources_rtree = Table(
+    "resources_rtree", rtree_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("min_lat", Float),
+    Column("max_lat", Float),
+    Column("min_lon", Float),
+    Column("max_lon", Float),
+)
+
+def rtree_ddl(table: str) -> List[str]:
+    """SQLite statements creating the R*Tree index for `table` and the
+    triggers that keep it in sync with every insert, update and delete."""
+    index = f"{table}_rtree"
+    point = "NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude"
+    has_point = "NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} "
+        f"USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table} "
+        f"WHEN {has_point} "
+        f"BEGIN INSERT INTO {index} VALUES ({point}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_update "
+        f"AFTER UPDATE OF latitude, longitude ON {table} "
+        f"BEGIN DELETE FROM {index} WHERE id = OLD.id; "
+        f"INSERT INTO {index} SELECT {point} WHERE {has_point}; END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table} "
+        f"BEGIN DELETE FROM {index} WHERE id = OLD.id; END",
+    ]
+
+def _install_rtree(table, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        for statement in rtree_ddl(table.name):
+            connection.exec_driver_sql(statement)
+
+def register(*tables: Table) -> None:
+    """Create the spatial index whenever metadata.create_all builds `tables`."""
+    for table in tables:
+        event.listen(table, "after_create", _install_rtree)
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(
+    latitude: float,
+    longitude: float,
+    radius_km: float
+) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """Return (min_lat, max_lat, lon_ranges) enclosing the search circle.
+
+    Longitude is returned as a list of ranges because a box crossing the
+    antimeridian has to be split in two.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT + BOX_MARGIN_DEGREES
+    min_lat = max(-90.0, latitude - dlat)
+    max_lat = min(90.0, latitude + dlat)
+
+    # A circle reaching a pole covers every meridian
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+
+    # Exact longitude extent of the spherical cap around the centre
+    sin_extent = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))
+    if sin_extent >= 1.0:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+    dlon = math.degrees(math.asin(sin_extent)) + BOX_MARGIN_DEGREES
+    if dlon >= 180.0:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+
+    min_lon, max_lon = longitude - dlon, longitude + dlon
+    if min_lon < -180.0:
+        return min_lat, max_lat, [(min_lon + 360.0, 180.0), (-180.0, max_lon)]
+    if max_lon > 180.0:
+        return min_lat, max_lat, [(min_lon, 180.0), (-180.0, max_lon - 360.0)]
+    return min_lat, max_lat, [(min_lon, max_lon)]
+
+def not_indexed(column):
+    """`column` in a form no index can serve (SQLite's `+column` idiom).
+    Filters next to filter_within_box use it on columns that lead an index,
+    which the planner would otherwise walk in full instead of the R*Tree."""
+    return column + 0
+
+def filter_within_box(
+    query: Query,
+    model,
+    rtree: Table,
+    latitude: float,
+    longitude: float,
+    radius_km: float
+) -> Query:
+    """Restrict `query` to rows of `model` inside the search bounding box.
+
+    On SQLite the box is resolved through the R*Tree index; other backends
+    fall back to a range filter on the latitude/longitude columns.
+    """
+    min_lat, max_lat, lon_ranges = bounding_box(latitude, longitude, radius_km)
+
+    def in_lon_ranges(lon_min_col, lon_max_col):
+        return or_(*[
+            and_(lon_max_col >= low, lon_min_col <= high)
+            for low, high in lon_ranges
+        ])
+
+    if query.session.get_bind().dialect.name == "sqlite":
+        # Drive the lookup from the R*Tree: as a plain join the planner may
+        # prefer scanning the base table and probing the index per row
+        in_box = select(rtree.c.id).where(
+            rtree.c.max_lat >= min_lat,
+            rtree.c.min_lat <= max_lat,
+            in_lon_ranges(rtree.c.min_lon, rtree.c.max_lon)
+        )
+        return query.filter(model.id.in_(in_box))
+
+    return query.filter(
+        model.latitude.between(min_lat, max_lat),
+        in_lon_ranges(model.longitude, model.longitude)
+    )
+
+def haversine_km_array(
+    latitude: float,
+    longitude: float,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray
+) -> np.ndarray:
+    """haversine_km from one point to many"""
+    phi1, phi2 = math.radians(latitude), np.radians(latitudes)
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * np.cos(phi2) * np.sin(np.radians(longitudes - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def nearest(
+    candidates: Callable[[float], Sequence[Tuple[int, float, float]]],
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    limit: int
+) -> List[Tuple[int, float]]:
+    """(id, distance_km) of the `limit` rows nearest to a point and within
+    `radius_km` of it, nearest first.
+
+    `candidates(search_km)` returns the (id, latitude, longitude) rows in
+    the bounding box of a `search_km` circle (see filter_within_box). The
+    search starts with a small circle and widens it only while that holds
+    fewer than `limit` rows, so a dense area reads a few hundred candidates
+    rather than every row in the full box. Every row within the circle
+    searched last is inside its box, so the rows found are the nearest.
+    """
+    search_km = radius_km * FIRST_SEARCH_FRACTION
+    while True:
+        search_km = min(search_km, radius_km)
+        rows = candidates(search_km)
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        distances = haversine_km_array(
+            latitude, longitude,
+            np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows)),
+            np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+        )
+        within = distances <= search_km
+        found = int(within.sum())
+        if found >= limit or search_km >= radius_km:
+            break
+        # Rows grow with the area, i.e. the square of the radius; with none
+        # found yet there is no density to go by, so only double
+        search_km *= (
+            min(MAX_WIDENING, max(2.0, 1.2 * math.sqrt(limit / found))) if found else 2.0
+        )
+
+    ids, distances = ids[within], distances[within]
+    if limit < len(distances):
+        best = np.argpartition(distances, limit - 1)[:limit]
+    else:
+        best = np.arange(len(distances))
+    best = best[np.argsort(distances[best], kind="stable")]
+    return [(int(ids[i]), float(distances[i])) for i in best]
@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .api.v1.api import api_router
 from .core.config import settings
+from .core.metrics import MetricsMiddleware, registry
+from .core.ratelimit import RateLimitMiddleware
 
 app = FastAPI(
     title="EmRe API",
@@ -9,6 +12,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Innermost, so 429 responses still get CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -19,8 +25,16 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Outermost, so latency includes CORS handling
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: per-route latency, SQL statements, DB time and rows"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
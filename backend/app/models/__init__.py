@@ -1,7 +1,7 @@
 from .user import User
-from .organization import Organization, OrganizationMembership
+from .organization import Organization, OrganizationMembership, OrganizationStats
 from .team import Team, TeamMembership
-from .incident import Incident, IncidentUpdate
+from .incident import Incident, IncidentRollup, IncidentUpdate
 from .resource import Resource, ResourceAssignment
 from .base_class import Base 
 
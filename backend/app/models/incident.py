@@ -1,10 +1,21 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .base_class import Base
+from ..db import search, spatial
 
 class Incident(Base):
     __tablename__ = "incidents"
+    __table_args__ = (
+        # SQLite resolves "nearby" through the incidents_rtree index instead
+        Index("ix_incidents_lat_lon", "latitude", "longitude").ddl_if(dialect="postgresql"),
+        # Keyset pagination on (created_at, id), optionally within an organization
+        Index("ix_incidents_created_id", "created_at", "id"),
+        Index("ix_incidents_org_created_id", "organization_id", "created_at", "id"),
+        # Dashboards: open/in-progress incidents of an organization, newest first
+        Index("ix_incidents_org_status_created_id", "organization_id", "status", "created_at", "id"),
+        Index("ix_incidents_team_created_id", "assigned_team_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -31,6 +42,11 @@ class Incident(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     resolved_at = Column(DateTime(timezone=True))
 
+    # Bumped by every UPDATE, which only matches the version it was loaded
+    # with (see crud.versioning)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     organization = relationship("Organization", back_populates="incidents")
     creator = relationship("User", back_populates="created_incidents")
@@ -39,8 +55,14 @@ class Incident(Base):
                          cascade="all, delete-orphan")
     assigned_resources = relationship("ResourceAssignment", back_populates="incident")
 
+spatial.register(Incident.__table__)
+search.register(Incident.__table__)
+
 class IncidentUpdate(Base):
     __tablename__ = "incident_updates"
+    __table_args__ = (
+        Index("ix_incident_updates_incident_created_id", "incident_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     incident_id = Column(Integer, ForeignKey("incidents.id"), nullable=False)
@@ -53,4 +75,25 @@ class IncidentUpdate(Base):
 
     # Relationships
     incident = relationship("Incident", back_populates="updates")
-    user = relationship("User", back_populates="incident_updates") 
\ No newline at end of file
+    user = relationship("User", back_populates="incident_updates") 
+
+class IncidentRollup(Base):
+    """Incident counts per organization, time bucket and priority/status/type,
+    kept current by the crud write paths (see crud.analytics) so analytics
+    never read the incidents table.
+
+    `created_count` counts incidents created in the bucket; `resolved_count`
+    and `resolve_seconds` (summed time to resolve) count those resolved in
+    it. Both are keyed by the incidents' current priority, status and type.
+    """
+    __tablename__ = "incident_rollups"
+
+    organization_id = Column(Integer, ForeignKey("organizations.id"), primary_key=True)
+    granularity = Column(String(8), primary_key=True)  # 'hour' or 'day'
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    priority = Column(String(20), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    type = Column(String(20), primary_key=True)
+    created_count = Column(Integer, nullable=False, default=0, server_default="0")
+    resolved_count = Column(Integer, nullable=False, default=0, server_default="0")
+    resolve_seconds = Column(Float, nullable=False, default=0, server_default="0")
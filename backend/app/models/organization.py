@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .base_class import Base
 
 class Organization(Base):
     __tablename__ = "organizations"
+    __table_args__ = (
+        Index("ix_organizations_visibility_id", "visibility", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -29,6 +32,11 @@ class Organization(Base):
 
 class OrganizationMembership(Base):
     __tablename__ = "organization_memberships"
+    __table_args__ = (
+        Index("ix_organization_memberships_org_status_user", "organization_id", "status", "user_id"),
+        # A caller's own memberships (auth context, organization listing)
+        Index("ix_organization_memberships_user_org_status", "user_id", "organization_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -42,4 +50,21 @@ class OrganizationMembership(Base):
     # Relationships
     user = relationship("User", back_populates="organizations")
     organization = relationship("Organization", back_populates="members")
+
+class OrganizationStats(Base):
+    """Per-organization counters, kept current by the crud write paths
+    (see crud.stats) so the detail view does not have to count rows"""
+    __tablename__ = "organization_stats"
+
+    organization_id = Column(Integer, ForeignKey("organizations.id"), primary_key=True)
+    member_count = Column(Integer, nullable=False, default=0, server_default="0")
+    team_count = Column(Integer, nullable=False, default=0, server_default="0")
+    resource_count = Column(Integer, nullable=False, default=0, server_default="0")
+    active_incidents = Column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped by every write to the organization's incidents, resources and
+    # teams; the list endpoints derive their ETags from them
+    incident_changes = Column(Integer, nullable=False, default=0, server_default="0")
+    resource_changes = Column(Integer, nullable=False, default=0, server_default="0")
+    team_changes = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
  
\ No newline at end of file
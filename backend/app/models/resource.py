@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Float, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .base_class import Base
+from ..db import spatial
 
 class Resource(Base):
     __tablename__ = "resources"
+    __table_args__ = (
+        # SQLite resolves "nearby" through the resources_rtree index instead
+        Index("ix_resources_lat_lon", "latitude", "longitude").ddl_if(dialect="postgresql"),
+        Index("ix_resources_org_id", "organization_id", "id"),
+        Index("ix_resources_team_id", "team_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -20,6 +27,12 @@ class Resource(Base):
     
     # Quantities and conditions
     quantity = Column(Integer, default=1)
+    # Units not currently assigned out; maintained by conditional UPDATEs in
+    # crud.resource so the availability check is a single-row read
+    available_quantity = Column(
+        Integer,
+        default=lambda context: context.get_current_parameters()["quantity"]
+    )
     condition = Column(Enum('excellent', 'good', 'fair', 'poor', 
                           name='resource_condition'), default='good')
     
@@ -31,13 +44,31 @@ class Resource(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Bumped by every UPDATE, which only matches the version it was loaded
+    # with (see crud.versioning); the ledger UPDATEs in crud.resource bump it
+    # themselves
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     organization = relationship("Organization", back_populates="resources")
     team = relationship("Team", back_populates="resources")
     incident_assignments = relationship("ResourceAssignment", back_populates="resource")
 
+spatial.register(Resource.__table__)
+
 class ResourceAssignment(Base):
     __tablename__ = "resource_assignments"
+    __table_args__ = (
+        Index("ix_resource_assignments_resource_assigned_id", "resource_id", "assigned_at", "id"),
+        Index("ix_resource_assignments_incident_id", "incident_id"),
+        # Only open assignments are looked up by resource on the hot path
+        Index(
+            "ix_resource_assignments_open_resource", "resource_id",
+            sqlite_where=text("returned_at IS NULL"),
+            postgresql_where=text("returned_at IS NULL")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     resource_id = Column(Integer, ForeignKey("resources.id"), nullable=False)
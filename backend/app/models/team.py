@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .base_class import Base
 
 class Team(Base):
     __tablename__ = "teams"
+    __table_args__ = (
+        Index("ix_teams_org_id", "organization_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -17,6 +20,11 @@ class Team(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Bumped by every UPDATE, which only matches the version it was loaded
+    # with (see crud.versioning)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     # Relationships
     organization = relationship("Organization", back_populates="teams")
     members = relationship("TeamMembership", back_populates="team")
@@ -25,6 +33,10 @@ class Team(Base):
 
 class TeamMembership(Base):
     __tablename__ = "team_memberships"
+    __table_args__ = (
+        Index("ix_team_memberships_team_user", "team_id", "user_id"),
+        Index("ix_team_memberships_user_team", "user_id", "team_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from datetime import datetime
+from enum import Enum
+
+class Granularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class IncidentBreakdown(BaseModel):
+    # Incidents created in the period, in total and by their current
+    # priority/status/type
+    created: int = 0
+    by_priority: Dict[str, int] = Field(default_factory=dict)
+    by_status: Dict[str, int] = Field(default_factory=dict)
+    by_type: Dict[str, int] = Field(default_factory=dict)
+    # Incidents resolved in the period and their mean resolved_at - created_at
+    resolved: int = 0
+    mean_time_to_resolve_seconds: Optional[float] = None
+
+class IncidentAnalyticsBucket(IncidentBreakdown):
+    bucket_start: datetime
+
+class IncidentAnalytics(BaseModel):
+    organization_id: int
+    granularity: Granularity
+    since: datetime
+    until: datetime
+    totals: IncidentBreakdown
+    buckets: List[IncidentAnalyticsBucket] = Field(default_factory=list)
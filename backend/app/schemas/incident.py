@@ -64,7 +64,8 @@ class IncidentUpdateRead(IncidentUpdateBase):
     class Config:
         from_attributes = True
 
-class Incident(IncidentBase):
+class IncidentSummary(IncidentBase):
+    """List shape: the incident's own columns, without nested updates"""
     id: int
     status: IncidentStatus
     organization_id: int
@@ -73,12 +74,49 @@ class Incident(IncidentBase):
     created_at: datetime
     updated_at: Optional[datetime]
     resolved_at: Optional[datetime]
+    # Changes on every update; PUT with it in If-Match to avoid lost updates
+    version: int = 1
+
+    class Config:
+        from_attributes = True
+
+class IncidentSearchResult(IncidentSummary):
+    # Relevance, higher is better; only comparable within one search
+    score: float
+    # Matching text with the search terms wrapped in <mark>...</mark>
+    snippet: Optional[str] = None
+
+class Incident(IncidentSummary):
     updates: List[IncidentUpdateRead] = Field(default_factory=list)
 
     class Config:
         from_attributes = True
 
+class IncidentNearby(IncidentBase):
+    id: int
+    status: IncidentStatus
+    organization_id: int
+    assigned_team_id: Optional[int] = None
+    created_at: datetime
+    distance_km: float = 0.0
+
+    class Config:
+        from_attributes = True
+
+class IncidentBulkResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    error: Optional[Any] = None
+
+class IncidentBulkResponse(BaseModel):
+    created: int = 0
+    failed: int = 0
+    results: List[IncidentBulkResult] = Field(default_factory=list)
+
 class IncidentDetail(Incident):
+    # `updates` holds the newest page only; fetch older ones from
+    # /incidents/{id}/updates with this cursor
+    updates_next_cursor: Optional[str] = None
     assigned_resources: List[ResourceAssignment] = Field(default_factory=list)
     organization_name: str
     team_name: Optional[str] = None
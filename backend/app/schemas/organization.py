@@ -4,7 +4,7 @@ from datetime import datetime
 from enum import Enum
 
 from .user import UserWithOrgRole
-from .team import TeamBase
+from .team import Team
 
 class OrganizationType(str, Enum):
     EMERGENCY_RESPONSE = "emergency_response"
@@ -46,7 +46,9 @@ class Organization(OrganizationBase):
 
 class OrganizationDetail(Organization):
     members: List[UserWithOrgRole]
-    teams: List[TeamBase]
+    teams: List[Team]
+    members_next_cursor: Optional[str] = None
+    teams_next_cursor: Optional[str] = None
     member_count: int
     team_count: int
     resource_count: int
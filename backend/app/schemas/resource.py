@@ -22,6 +22,9 @@ class ResourceBase(BaseModel):
     description: Optional[str] = None
     quantity: int = 1
     status: ResourceStatus = ResourceStatus.AVAILABLE
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    location_description: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -37,17 +40,34 @@ class ResourceUpdate(BaseModel):
     quantity: Optional[int] = None
     status: Optional[ResourceStatus] = None
     team_id: Optional[int] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    location_description: Optional[str] = None
 
 class Resource(ResourceBase):
     id: int
     organization_id: int
     team_id: Optional[int]
+    available_quantity: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # Changes on every update and assignment; PUT with it in If-Match to
+    # avoid lost updates
+    version: int = 1
 
     class Config:
         from_attributes = True
 
+class ResourceNearby(Resource):
+    distance_km: float = 0.0
+
+class ResourceRecommendation(Resource):
+    condition: Optional[str] = None
+    # Weighted match for the incident, 0..1; higher is better
+    score: float = 0.0
+    # None when the incident or the resource has no location
+    distance_km: Optional[float] = None
+
 class ResourceAssignmentBase(BaseModel):
     resource_id: int
     incident_id: int
@@ -58,11 +78,18 @@ class ResourceAssignmentCreate(ResourceAssignmentBase):
     """Schema for creating a new resource assignment"""
     pass
 
+class ResourceAssignmentBatchItem(BaseModel):
+    resource_id: int
+    quantity: int = Field(1, gt=0)
+
+class ResourceAssignmentBatch(BaseModel):
+    assignments: List[ResourceAssignmentBatchItem] = Field(..., min_length=1)
+
 class ResourceAssignment(ResourceAssignmentBase):
     id: int
     assigned_at: datetime
     returned_at: Optional[datetime] = None
-    assigned_by_id: int
+    assigned_by_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -40,6 +40,8 @@ class Team(TeamBase):
     organization_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # Changes on every update; PUT with it in If-Match to avoid lost updates
+    version: int = 1
 
     class Config:
         from_attributes = True
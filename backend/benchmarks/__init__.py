@@ -0,0 +1,13 @@
+"""Synthetic data generator and endpoint benchmarks for the EmRe API.
+
+Run from the backend directory:
+
+    python -m benchmarks seed --database bench.db --scale 1
+    python -m benchmarks run --database bench.db --output results.json
+    python -m benchmarks run --database bench.db --baseline results.json
+
+`seed` bulk-loads organizations, users, teams, memberships, incidents,
+updates, resources and assignments into a SQLite file. `run` drives every
+endpoint in-process and reports latency percentiles, queries per request and
+SQLite work per request, optionally comparing against a saved baseline.
+"""
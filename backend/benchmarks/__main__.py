@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import json
+import sys
+
+import benchmarks
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=benchmarks.__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="generate a synthetic database")
+    seed.add_argument("--database", default="bench.db",
+                      help="SQLite file to (re)create; pass ./emre.db to load the app's own file")
+    seed.add_argument("--scale", type=float, default=1.0,
+                      help="multiplier for the row counts in benchmarks.data.BASE_COUNTS")
+    seed.add_argument("--seed", type=int, default=1)
+
+    run = commands.add_parser("run", help="benchmark every endpoint")
+    run.add_argument("--database", default="bench.db")
+    run.add_argument("--iterations", type=int, default=200)
+    run.add_argument("--warmup", type=int, default=10)
+    run.add_argument("--concurrency", type=int, default=1)
+    run.add_argument("--only", nargs="*", help="scenario name prefixes, e.g. incidents. users.me")
+    run.add_argument("--output", help="write results as JSON (use as a later --baseline)")
+    run.add_argument("--baseline", help="JSON results to compare against")
+    run.add_argument("--tolerance", type=float, default=0.2,
+                     help="allowed relative p95 increase before a run counts as a regression")
+    run.add_argument("--seed", type=int, default=1)
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        from .data import generate
+        generate(args.database, scale=args.scale, seed=args.seed)
+        return 0
+
+    from .runner import HEADER, compare, run as run_benchmarks
+    print(HEADER)
+    results = asyncio.run(run_benchmarks(
+        args.database,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        concurrency=args.concurrency,
+        only=args.only,
+        seed=args.seed
+    ))
+
+    if args.output:
+        # A baseline must time real responses, not errors
+        failing = [name for name, result in results["results"].items() if result["errors"]]
+        if failing:
+            print(f"\nNot writing {args.output}: error responses in {', '.join(failing)}")
+            return 1
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        regressions = compare(results, baseline, tolerance=args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
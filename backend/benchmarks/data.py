@@ -0,0 +1,226 @@
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.security import get_password_hash
+from app.crud.analytics import rebuild_incident_rollups
+from app.crud.stats import reconcile_organization_stats
+from app.db import search
+from app.db.engine import create_db_engine
+from app.db.base import Base
+from app.models import (
+    Incident, IncidentUpdate, Organization, OrganizationMembership,
+    Resource, ResourceAssignment, Team, TeamMembership, User
+)
+
+# Every seeded user can log in with this password
+PASSWORD = "benchmark"
+
+# Row counts at --scale 1; everything grows linearly with the scale
+BASE_COUNTS = {
+    "organizations": 20,
+    "users": 2000,
+    "teams_per_org": 10,
+    "incidents": 20000,
+    "updates_per_incident": 3,
+    "resources": 2000,
+    "assignments": 10000,
+}
+
+CHUNK = 5000
+
+# Vocabulary for incident titles, so full-text search has terms to match
+INCIDENT_KINDS = ["Flood", "Fire", "Power outage", "Gas leak", "Road collapse", "Landslide"]
+PLACES = ["river bank", "school", "hospital", "warehouse", "bridge", "market", "station"]
+
+def counts_for(scale: float) -> Dict[str, int]:
+    return {
+        name: value if name.endswith("_per_org") or name.endswith("_per_incident")
+        else max(1, int(value * scale))
+        for name, value in BASE_COUNTS.items()
+    }
+
+def create_bench_engine(path: str) -> Engine:
+    """An engine configured like the app's (WAL, busy_timeout, ...)"""
+    return create_db_engine(f"sqlite:///{path}")
+
+def _chunks(rows: Iterator[dict], size: int = CHUNK) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _bulk_insert(db: Session, model, rows: Iterator[dict]) -> int:
+    total = 0
+    for chunk in _chunks(rows):
+        db.execute(insert(model), chunk)
+        total += len(chunk)
+    return total
+
+def generate(path: str, scale: float = 1.0, seed: int = 1, verbose: bool = True) -> Dict[str, int]:
+    """Create a fresh SQLite database at `path` and bulk-load synthetic data.
+
+    User n (1 <= n <= organizations) is the active admin of organization n
+    and leader of its first team, which is what the benchmark scenarios log
+    in as. Returns the number of rows written per table.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    counts = counts_for(scale)
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    orgs = counts["organizations"]
+    users = max(counts["users"], orgs)
+    teams = orgs * counts["teams_per_org"]
+    incidents = counts["incidents"]
+    resources = counts["resources"]
+    written = {}
+    started = time.perf_counter()
+
+    engine = create_bench_engine(path)
+
+    @event.listens_for(engine, "connect")
+    def fast_load(dbapi_connection, connection_record):
+        # Bulk loading only; the file is rebuilt from scratch on failure
+        dbapi_connection.execute("PRAGMA synchronous=OFF")
+
+    Base.metadata.create_all(engine)
+    password_hash = get_password_hash(PASSWORD)
+
+    with Session(engine) as db:
+        written["users"] = _bulk_insert(db, User, (
+            {"email": f"user{i}@bench.emre", "first_name": "Bench", "last_name": f"User{i}",
+             "hashed_password": password_hash, "is_active": True}
+            for i in range(1, users + 1)
+        ))
+        written["organizations"] = _bulk_insert(db, Organization, (
+            {"name": f"Organization {i}", "type": rng.choice([
+                "emergency_response", "resource_distribution",
+                "volunteer_coordination", "disaster_relief"]),
+             "region": f"region-{i % 7}", "created_by_id": i,
+             "visibility": "public" if i % 4 == 0 else "private"}
+            for i in range(1, orgs + 1)
+        ))
+
+        def org_memberships():
+            for user_id in range(1, users + 1):
+                if user_id <= orgs:
+                    yield {"user_id": user_id, "organization_id": user_id,
+                           "role": "admin", "status": "active"}
+                    continue
+                for org_id in rng.sample(range(1, orgs + 1), min(orgs, rng.randint(1, 3))):
+                    yield {"user_id": user_id, "organization_id": org_id, "role": "member",
+                           "status": "active" if rng.random() < 0.9 else "pending"}
+        written["organization_memberships"] = _bulk_insert(db, OrganizationMembership, org_memberships())
+
+        written["teams"] = _bulk_insert(db, Team, (
+            {"name": f"Team {org_id}-{i}", "organization_id": org_id,
+             "type": rng.choice(["response", "medical", "rescue", "logistics", "support"])}
+            for org_id in range(1, orgs + 1)
+            for i in range(counts["teams_per_org"])
+        ))
+
+        def team_memberships():
+            for user_id in range(1, users + 1):
+                if user_id <= orgs:
+                    team_id = (user_id - 1) * counts["teams_per_org"] + 1
+                    yield {"user_id": user_id, "team_id": team_id,
+                           "role": "leader", "added_by_id": user_id}
+                else:
+                    yield {"user_id": user_id, "team_id": rng.randint(1, teams),
+                           "role": rng.choice(["member", "member", "dispatcher"]),
+                           "added_by_id": 1}
+        written["team_memberships"] = _bulk_insert(db, TeamMembership, team_memberships())
+
+        def incident_rows():
+            for i in range(1, incidents + 1):
+                org_id = rng.randint(1, orgs)
+                status = rng.choice(["open", "in_progress", "resolved", "closed"])
+                created_at = now - timedelta(seconds=i * 37)
+                yield {
+                    "title": f"{rng.choice(INCIDENT_KINDS)} near {rng.choice(PLACES)} #{i}",
+                    "description": "Synthetic incident generated for benchmarking",
+                    "type": rng.choice(["emergency", "resource_request", "status_update"]),
+                    "priority": rng.choice(["critical", "high", "medium", "low"]),
+                    "status": status,
+                    "latitude": rng.uniform(-60, 60),
+                    "longitude": rng.uniform(-170, 170),
+                    "organization_id": org_id,
+                    "created_by_id": rng.randint(1, users),
+                    "assigned_team_id": (org_id - 1) * counts["teams_per_org"]
+                    + rng.randint(1, counts["teams_per_org"]),
+                    "created_at": created_at,
+                    "resolved_at": created_at + timedelta(hours=2)
+                    if status in ("resolved", "closed") else None,
+                }
+        written["incidents"] = _bulk_insert(db, Incident, incident_rows())
+
+        written["incident_updates"] = _bulk_insert(db, IncidentUpdate, (
+            {"incident_id": incident_id, "user_id": rng.randint(1, users),
+             "content": f"Update {n} for incident {incident_id}",
+             "update_type": rng.choice(["status_change", "resource_update", "general_update"]),
+             "created_at": now - timedelta(seconds=incident_id * 37 - n * 60)}
+            for incident_id in range(1, incidents + 1)
+            for n in range(counts["updates_per_incident"])
+        ))
+        search.reindex_incidents(db)
+
+        quantities = [rng.choice([1, 1, 2, 5, 20, 100]) for _ in range(resources)]
+        assigned = [0] * resources
+
+        def assignment_rows():
+            for _ in range(counts["assignments"]):
+                index = rng.randrange(resources)
+                returned = rng.random() < 0.7
+                if not returned and assigned[index] >= quantities[index]:
+                    returned = True
+                if not returned:
+                    assigned[index] += 1
+                assigned_at = now - timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+                yield {"resource_id": index + 1, "incident_id": rng.randint(1, incidents),
+                       "quantity": 1, "assigned_at": assigned_at,
+                       "returned_at": assigned_at + timedelta(hours=3) if returned else None}
+        assignments = list(assignment_rows())
+
+        written["resources"] = _bulk_insert(db, Resource, (
+            {"name": f"Resource {i + 1}",
+             # the model also allows "personnel", which the API schema rejects
+             "type": rng.choice(["equipment", "vehicle", "supply"]),
+             "status": "in_use" if assigned[i] >= quantities[i] else "available",
+             "quantity": quantities[i], "available_quantity": quantities[i] - assigned[i],
+             "condition": rng.choice(["excellent", "good", "fair", "poor"]),
+             "latitude": rng.uniform(-60, 60), "longitude": rng.uniform(-170, 170),
+             "organization_id": org_id,
+             "team_id": (org_id - 1) * counts["teams_per_org"]
+             + rng.randint(1, counts["teams_per_org"])}
+            for i, org_id in ((i, rng.randint(1, orgs)) for i in range(resources))
+        ))
+        written["resource_assignments"] = _bulk_insert(db, ResourceAssignment, iter(assignments))
+
+        rebuild_incident_rollups(db)
+        reconcile_organization_stats(db)
+        db.commit()
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+        connection.commit()
+    engine.dispose()
+
+    if verbose:
+        total = sum(written.values())
+        elapsed = time.perf_counter() - started
+        for table, rows in written.items():
+            print(f"  {table:<26} {rows:>10,}")
+        print(f"Seeded {total:,} rows into {path} in {elapsed:.1f}s")
+    return written
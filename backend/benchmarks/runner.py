@@ -0,0 +1,381 @@
+import asyncio
+import contextvars
+import json
+import math
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db import base
+from app.db.engine import create_async_db_engine
+from app.db.plan_check import FULL_SCAN
+from app.main import app
+
+from .asgi import ASGIClient
+from .data import INCIDENT_KINDS, PASSWORD, create_bench_engine
+
+API = settings.API_V1_STR
+
+# SQLite calls the progress handler every N virtual machine instructions
+VM_STEP_GRANULARITY = 100
+
+class RequestStats:
+    def __init__(self, profile: bool = False):
+        self.profile = profile
+        self.queries = 0
+        self.vm_steps = 0
+        self.statements: List[str] = []
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "benchmark_request_stats", default=None
+)
+
+def instrument(engine: Engine) -> None:
+    """Count statements per request and, while profiling, SQLite VM steps"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            if stats.profile:
+                stats.statements.append(statement)
+
+    def progress():
+        stats = _current.get()
+        if stats is not None:
+            stats.vm_steps += VM_STEP_GRANULARITY
+        return 0
+
+    @event.listens_for(engine, "checkout")
+    def toggle_progress(dbapi_connection, connection_record, connection_proxy):
+        stats = _current.get()
+        raw = getattr(dbapi_connection, "set_progress_handler", None)
+        if raw is None:
+            return
+        if stats is not None and stats.profile:
+            raw(progress, VM_STEP_GRANULARITY)
+        else:
+            raw(None, 0)
+
+def use_database(path: str) -> Engine:
+    """Point the app's get_db dependency at the benchmark database"""
+    engine = create_bench_engine(path)
+    instrument(engine)
+
+    if settings.USE_ASYNC_DB:
+        async_engine = create_async_db_engine(f"sqlite+aiosqlite:///{path}")
+        instrument(async_engine.sync_engine)
+        factory = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+        async def get_bench_db():
+            async with factory() as db:
+                yield db
+    else:
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def get_bench_db():
+            db = factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+    app.dependency_overrides[base.get_db] = get_bench_db
+    return engine
+
+class Scenario:
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        path: Callable[[random.Random], str],
+        params: Optional[Callable[[random.Random], Dict[str, Any]]] = None,
+        body: Optional[Callable[[random.Random], Any]] = None,
+        form: Optional[Callable[[random.Random], Dict[str, str]]] = None,
+        iterations: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.params = params
+        self.body = body
+        self.form = form
+        self.iterations = iterations
+        self.headers = headers
+
+def scenarios(
+    orgs: int,
+    incidents: int,
+    resources: int,
+    org_incidents: Sequence[int] = (1,)
+) -> List[Scenario]:
+    """One or more scenarios per endpoint. Requests are made as user 1, the
+    admin of organization 1; ids are drawn from that organization's range
+    (`org_incidents`) where the endpoint checks membership."""
+    org = lambda rng: 1
+    any_incident = lambda rng: rng.randint(1, incidents)
+    org_incident = lambda rng: rng.choice(org_incidents)
+    any_resource = lambda rng: rng.randint(1, resources)
+    point = lambda rng: {"latitude": rng.uniform(-50, 50), "longitude": rng.uniform(-160, 160),
+                         "radius_km": 250}
+    new_incident = lambda rng: {
+        "title": "Benchmark incident", "type": "emergency", "priority": "high",
+        "organization_id": 1, "latitude": rng.uniform(-50, 50),
+        "longitude": rng.uniform(-160, 160),
+    }
+
+    return [
+        # bcrypt dominates; fewer iterations keep the run short
+        Scenario("auth.login", "POST", lambda rng: f"{API}/auth/login",
+                 form=lambda rng: {"username": "user1@bench.emre", "password": PASSWORD},
+                 iterations=20),
+        Scenario("users.me", "GET", lambda rng: f"{API}/users/me"),
+        Scenario("users.org_members", "GET",
+                 lambda rng: f"{API}/users/organizations/{org(rng)}/members"),
+        Scenario("organizations.list", "GET", lambda rng: f"{API}/organizations/"),
+        Scenario("organizations.detail", "GET", lambda rng: f"{API}/organizations/{org(rng)}"),
+        Scenario("organizations.members", "GET",
+                 lambda rng: f"{API}/organizations/{org(rng)}/members"),
+        Scenario("teams.list", "GET", lambda rng: f"{API}/teams/organization/{org(rng)}"),
+        Scenario("teams.detail", "GET", lambda rng: f"{API}/teams/1"),
+        Scenario("incidents.list", "GET", lambda rng: f"{API}/incidents/",
+                 params=lambda rng: {"limit": 50}),
+        Scenario("incidents.list_org_open", "GET", lambda rng: f"{API}/incidents/",
+                 params=lambda rng: {"organization_id": 1, "status": "open", "limit": 50}),
+        # Revalidating a copy that is still current: the change marker
+        # lookup and an empty 304
+        Scenario("incidents.list_org_open_304", "GET", lambda rng: f"{API}/incidents/",
+                 params=lambda rng: {"organization_id": 1, "status": "open", "limit": 50},
+                 headers={"if-none-match": "*"}),
+        Scenario("incidents.list_map", "GET", lambda rng: f"{API}/incidents/",
+                 params=lambda rng: {"limit": 100,
+                                     "fields": "id,title,priority,status,latitude,longitude"}),
+        Scenario("incidents.search", "GET", lambda rng: f"{API}/incidents/search",
+                 params=lambda rng: {"q": rng.choice(INCIDENT_KINDS), "limit": 20}),
+        Scenario("incidents.nearby", "GET", lambda rng: f"{API}/incidents/nearby", params=point),
+        Scenario("incidents.detail", "GET", lambda rng: f"{API}/incidents/{any_incident(rng)}"),
+        Scenario("incidents.detail_304", "GET", lambda rng: f"{API}/incidents/{any_incident(rng)}",
+                 headers={"if-none-match": "*"}),
+        Scenario("incidents.updates", "GET",
+                 lambda rng: f"{API}/incidents/{any_incident(rng)}/updates"),
+        Scenario("incidents.recommendations", "GET",
+                 lambda rng: f"{API}/incidents/{org_incident(rng)}/recommendations"),
+        Scenario("incidents.create", "POST", lambda rng: f"{API}/incidents/", body=new_incident),
+        Scenario("incidents.bulk_100", "POST", lambda rng: f"{API}/incidents/bulk",
+                 body=lambda rng: [new_incident(rng) for _ in range(100)], iterations=20),
+        Scenario("analytics.incidents", "GET", lambda rng: f"{API}/analytics/incidents",
+                 params=lambda rng: {"organization_id": 1}),
+        Scenario("resources.list", "GET", lambda rng: f"{API}/resources/",
+                 params=lambda rng: {"organization_id": 1, "limit": 50}),
+        Scenario("resources.nearby", "GET", lambda rng: f"{API}/resources/nearby", params=point),
+        Scenario("resources.detail", "GET", lambda rng: f"{API}/resources/{any_resource(rng)}"),
+        Scenario("resources.assignments", "GET",
+                 lambda rng: f"{API}/resources/{any_resource(rng)}/assignments"),
+    ]
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+async def _send(client: ASGIClient, scenario: Scenario, rng: random.Random, stats: RequestStats):
+    path = scenario.path(rng)
+    params = scenario.params(rng) if scenario.params else None
+    body = scenario.body(rng) if scenario.body else None
+    form = scenario.form(rng) if scenario.form else None
+
+    token = _current.set(stats)
+    try:
+        return await client.request(
+            scenario.method, path, params=params, json_body=body, form=form,
+            headers=scenario.headers
+        )
+    finally:
+        _current.reset(token)
+
+async def run_scenario(
+    client: ASGIClient,
+    scenario: Scenario,
+    iterations: int,
+    warmup: int,
+    concurrency: int,
+    seed: int
+) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    iterations = scenario.iterations or iterations
+
+    for _ in range(warmup):
+        await _send(client, scenario, rng, RequestStats())
+
+    # One profiled request: statement list and VM steps
+    profile = RequestStats(profile=True)
+    response = await _send(client, scenario, rng, profile)
+    full_scans = count_full_scans(profile.statements)
+
+    latencies: List[float] = []
+    queries: List[int] = []
+    errors = 0
+    pending = iter(range(iterations))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            stats = RequestStats()
+            started = time.perf_counter()
+            result = await _send(client, scenario, rng, stats)
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(stats.queries)
+            if result.status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "status": response.status,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "queries_per_request": round(statistics.fmean(queries), 2),
+        "vm_steps": profile.vm_steps or None,
+        "full_scans": full_scans,
+    }
+
+_explained: Dict[str, int] = {}
+_explain_engine: Optional[Engine] = None
+
+def count_full_scans(statements: List[str]) -> int:
+    """Statements whose plan reads a whole model table. Parameters are not
+    needed for EXPLAIN QUERY PLAN, so each distinct statement is checked once
+    with NULLs bound."""
+    total = 0
+    for statement in statements:
+        if statement not in _explained:
+            _explained[statement] = 0
+            if _explain_engine is not None and statement.lstrip().upper().startswith(
+                ("SELECT", "UPDATE", "DELETE", "WITH")
+            ):
+                with _explain_engine.connect() as connection:
+                    cursor = connection.connection.cursor()
+                    try:
+                        cursor.execute(
+                            f"EXPLAIN QUERY PLAN {statement}",
+                            [None] * statement.count("?")
+                        )
+                        steps = [row[3] for row in cursor.fetchall()]
+                    finally:
+                        cursor.close()
+                _explained[statement] = sum(
+                    1 for step in steps
+                    if (match := FULL_SCAN.match(step))
+                    and match.group(1) in base.Base.metadata.tables
+                )
+        total += _explained[statement]
+    return total
+
+async def run(
+    path: str,
+    iterations: int = 200,
+    warmup: int = 10,
+    concurrency: int = 1,
+    only: Optional[List[str]] = None,
+    seed: int = 1
+) -> Dict[str, Any]:
+    global _explain_engine
+    # Every scenario is one user hammering one route: measure the endpoints,
+    # not the rate limiter turning them away
+    settings.RATE_LIMIT_ENABLED = False
+    engine = use_database(path)
+    _explain_engine = engine
+
+    with engine.connect() as connection:
+        def count(table: str) -> int:
+            return connection.exec_driver_sql(f"SELECT MAX(id) FROM {table}").scalar() or 1
+        orgs, incidents, resources = count("organizations"), count("incidents"), count("resources")
+        org_incidents = [row[0] for row in connection.exec_driver_sql(
+            "SELECT id FROM incidents WHERE organization_id = 1 LIMIT 1000"
+        )] or [1]
+
+    client = ASGIClient(app, headers={
+        "authorization": f"Bearer {create_access_token(1)}"
+    })
+    results = {}
+    for scenario in scenarios(orgs, incidents, resources, org_incidents):
+        if only and not any(scenario.name.startswith(prefix) for prefix in only):
+            continue
+        results[scenario.name] = await run_scenario(
+            client, scenario, iterations, warmup, concurrency, seed
+        )
+        print(format_row(scenario.name, results[scenario.name]))
+
+    engine.dispose()
+    return {
+        "meta": {
+            "database": path,
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "async_db": settings.USE_ASYNC_DB,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+HEADER = (
+    f"{'scenario':<28}{'status':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    f"{'req/s':>9}{'queries':>9}{'vm steps':>11}{'scans':>7}{'errors':>8}"
+)
+
+def format_row(name: str, result: Dict[str, Any]) -> str:
+    return (
+        f"{name:<28}{result['status']:>7}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+        f"{result['p99_ms']:>10.2f}{result['throughput_rps'] or 0:>9.1f}"
+        f"{result['queries_per_request']:>9.1f}{result['vm_steps'] or 0:>11,}"
+        f"{result['full_scans']:>7}{result['errors']:>8}"
+    )
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.2
+) -> List[str]:
+    """Regressions of `current` against `baseline`: p95 latency worse by more
+    than `tolerance`, more queries per request, or new full table scans"""
+    regressions = []
+    print(f"\n{'scenario':<28}{'p95 ms':>10}{'baseline':>10}{'change':>9}{'queries':>9}{'baseline':>10}")
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        print(
+            f"{name:<28}{result['p95_ms']:>10.2f}{before['p95_ms']:>10.2f}{change:>+9.0%}"
+            f"{result['queries_per_request']:>9.1f}{before['queries_per_request']:>10.1f}"
+        )
+        if change > tolerance:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms")
+        if result["queries_per_request"] > before["queries_per_request"] + 0.5:
+            regressions.append(
+                f"{name}: queries {before['queries_per_request']} -> {result['queries_per_request']}"
+            )
+        if result["full_scans"] > before.get("full_scans", 0):
+            regressions.append(
+                f"{name}: full scans {before.get('full_scans', 0)} -> {result['full_scans']}"
+            )
+    return regressions